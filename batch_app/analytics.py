@@ -0,0 +1,102 @@
+from django.db.models import Count, F, Max, Min, Q, Sum
+
+from pcb_test_result_app.models import MeasurementResult, PcbTestResult, YesNoQuestionResult
+
+
+PARETO_SIZE = 10  # Failing parameters listed in a batch's failure Pareto
+FINISHED_RESULTS = [PcbTestResult.PASSED, PcbTestResult.FAILED]
+
+
+def _percentage(part, whole):
+    return round(100.0 * part / whole, 1) if whole else None
+
+
+def batch_yield(batch):
+    """Return the yield and retest figures of a batch, computed in one query.
+
+    Only finished (passed or failed) test results count. The results of each
+    board are grouped in SQL and the groups summed by an outer aggregate.
+    Result ids follow the order the tests were run in, so a board passed
+    first time when its lowest result id passed, and passed in the end when
+    its highest one did.
+    """
+    per_pcb = (
+        PcbTestResult.objects
+        .filter(pcb__batch=batch, result__in=FINISHED_RESULTS)
+        .values('pcb')
+        .annotate(
+            runs=Count('pk'),
+            first_id=Min('pk'),
+            first_passed_id=Min('pk', filter=Q(result=PcbTestResult.PASSED)),
+            last_id=Max('pk'),
+            last_passed_id=Max('pk', filter=Q(result=PcbTestResult.PASSED)),
+        )
+        .order_by()
+    )
+    totals = per_pcb.aggregate(
+        boards_tested=Count('pcb'),
+        test_runs=Sum('runs'),
+        first_pass=Count('pcb', filter=Q(first_passed_id=F('first_id'))),
+        final_pass=Count('pcb', filter=Q(last_passed_id=F('last_id'))),
+        boards_retested=Count('pcb', filter=Q(runs__gt=1)),
+    )
+    boards_tested = totals['boards_tested']
+    test_runs = totals['test_runs'] or 0
+    return {
+        'boards_tested': boards_tested,
+        'test_runs': test_runs,
+        'retests': test_runs - boards_tested,
+        'boards_retested': totals['boards_retested'],
+        'first_pass': totals['first_pass'],
+        'final_pass': totals['final_pass'],
+        'first_pass_yield': _percentage(totals['first_pass'], boards_tested),
+        'final_yield': _percentage(totals['final_pass'], boards_tested),
+    }
+
+
+def failure_pareto(batch, size=PARETO_SIZE):
+    """Return the parameters and questions failing most often in a batch, most frequent first.
+
+    Each entry has the number of failed rows, the number of boards they
+    were on, the share of all failures and the cumulative share. Failures
+    are grouped and counted by the database, with two queries per result
+    table whatever the size of the batch.
+    """
+    measurement_failures = (
+        MeasurementResult.objects
+        .filter(test_result__pcb__batch=batch, passed=False)
+        .values('kind', 'parameter_name')
+        .annotate(failures=Count('pk'), boards=Count('test_result__pcb', distinct=True))
+        .order_by('-failures', 'kind', 'parameter_name')
+    )
+    question_failures = (
+        YesNoQuestionResult.objects
+        .filter(test_result__pcb__batch=batch, passed=False)
+        .values('question_text')
+        .annotate(failures=Count('pk'), boards=Count('test_result__pcb', distinct=True))
+        .order_by('-failures', 'question_text')
+    )
+    total = (MeasurementResult.objects.filter(test_result__pcb__batch=batch, passed=False).count() +
+             YesNoQuestionResult.objects.filter(test_result__pcb__batch=batch, passed=False).count())
+
+    entries = [
+        {'kind': row['kind'], 'parameter': row['parameter_name'], 'failures': row['failures'], 'boards': row['boards']}
+        for row in measurement_failures[:size]
+    ] + [
+        {'kind': 'QUESTION', 'parameter': row['question_text'], 'failures': row['failures'], 'boards': row['boards']}
+        for row in question_failures[:size]
+    ]
+    entries.sort(key=lambda entry: -entry['failures'])
+    entries = entries[:size]
+
+    cumulative = 0
+    for entry in entries:
+        cumulative += entry['failures']
+        entry['share'] = _percentage(entry['failures'], total)
+        entry['cumulative_share'] = _percentage(cumulative, total)
+    return {'total_failures': total, 'parameters': entries}
+
+
+def get_batch_analytics(batch, pareto_size=PARETO_SIZE):
+    """Yield figures and failure Pareto of a batch"""
+    return {'yield': batch_yield(batch), 'pareto': failure_pareto(batch, pareto_size)}
@@ -0,0 +1,106 @@
+import csv
+import re
+import time
+
+from django.db import transaction
+
+from .models import Pcb
+
+
+IMPORT_CHUNK_SIZE = 500  # PCBs per INSERT statement
+MAX_IMPORT_SERIALS = 20000  # Keeps the duplicate check within one IN (...) query
+SERIAL_MAX_LENGTH = Pcb._meta.get_field('serial_number').max_length
+
+# PREFIX{START..END}SUFFIX, e.g. PNL-{0001..5000}; START sets the zero padding
+RANGE_PATTERN = re.compile(r'^(?P<prefix>[^{}]*)\{(?P<start>\d+)\.\.(?P<end>\d+)\}(?P<suffix>[^{}]*)$')
+HEADER_NAMES = {'serial', 'serial_number', 'serial number'}
+
+
+class SerialImportResult:
+    """Outcome of a bulk serial number import"""
+
+    def __init__(self):
+        self.created = 0
+        self.rejects = []  # (row, serial number, reason)
+        self.elapsed = 0.0
+
+    def reject(self, row, serial_number, reason):
+        self.rejects.append((row, serial_number, reason))
+
+    @property
+    def rate(self):
+        """PCBs created per second"""
+        return self.created / self.elapsed if self.elapsed else 0.0
+
+
+def expand_range(pattern):
+    """Expand a PREFIX{START..END}SUFFIX pattern, or return None if it is not one"""
+    match = RANGE_PATTERN.match(pattern)
+    if not match:
+        return None
+    start, end = int(match['start']), int(match['end'])
+    if end < start:
+        raise ValueError(f'Range "{pattern}" ends before it starts.')
+    if end - start + 1 > MAX_IMPORT_SERIALS:
+        raise ValueError(f'Range "{pattern}" has more than {MAX_IMPORT_SERIALS} serial numbers.')
+    width = len(match['start'])
+    return [f"{match['prefix']}{number:0{width}d}{match['suffix']}" for number in range(start, end + 1)]
+
+
+def parse_serials(text):
+    """Parse a CSV or newline separated serial list into (row, serial number) pairs.
+
+    Every non-empty cell is a serial number or a range pattern. A header row
+    naming the serial column is skipped.
+    """
+    entries = []
+    for row, cells in enumerate(csv.reader(text.splitlines()), start=1):
+        cells = [cell.strip() for cell in cells if cell.strip()]
+        if row == 1 and cells and cells[0].lower() in HEADER_NAMES:
+            continue
+        for cell in cells:
+            expanded = expand_range(cell)
+            entries.extend((row, serial_number) for serial_number in (expanded or [cell]))
+            if len(entries) > MAX_IMPORT_SERIALS:
+                raise ValueError(f'Imports are limited to {MAX_IMPORT_SERIALS} serial numbers.')
+    return entries
+
+
+def import_serials(batch, text, hardware_modified=False, modified_hardware_version=None,
+                   chunk_size=IMPORT_CHUNK_SIZE):
+    """Create PCBs in a batch from a serial list, skipping invalid and duplicate rows.
+
+    Existing serial numbers are found with one query and the new PCBs are
+    inserted in chunks inside a single transaction, so either every accepted
+    row is imported or none is. Raises ValueError for input that cannot be
+    parsed at all.
+    """
+    started = time.monotonic()
+    result = SerialImportResult()
+
+    accepted = {}
+    for row, serial_number in parse_serials(text):
+        if len(serial_number) > SERIAL_MAX_LENGTH:
+            result.reject(row, serial_number, f'longer than {SERIAL_MAX_LENGTH} characters')
+        elif serial_number in accepted:
+            result.reject(row, serial_number, f'duplicate of row {accepted[serial_number]}')
+        else:
+            accepted[serial_number] = row
+
+    with transaction.atomic():
+        existing = set(
+            Pcb.objects.filter(serial_number__in=list(accepted)).order_by().values_list('serial_number', flat=True)
+        )
+        for serial_number in existing:
+            result.reject(accepted.pop(serial_number), serial_number, 'already exists')
+
+        Pcb.objects.bulk_create(
+            (Pcb(serial_number=serial_number, batch=batch, hardware_modified=hardware_modified,
+                 modified_hardware_version=modified_hardware_version if hardware_modified else None)
+             for serial_number in accepted),
+            batch_size=chunk_size,
+        )
+    result.created = len(accepted)
+    result.rejects.sort()
+    result.elapsed = time.monotonic() - started
+    return result
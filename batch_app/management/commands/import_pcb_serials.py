@@ -0,0 +1,46 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from batch_app.importer import IMPORT_CHUNK_SIZE, import_serials
+from batch_app.models import Batch
+
+
+class Command(BaseCommand):
+    help = 'Create PCBs in a batch from a CSV/newline serial list or a range such as PNL-{0001..5000}'
+
+    def add_arguments(self, parser):
+        parser.add_argument('batch', help='Batch id or name')
+        parser.add_argument('source', nargs='?', help='File with serial numbers; reads stdin when omitted')
+        parser.add_argument('--range', dest='serial_range', help='Serial range pattern instead of a file')
+        parser.add_argument('--hardware-modified', help='Mark the PCBs as modified to this hardware version')
+        parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE,
+                            help=f'PCBs per INSERT statement (default {IMPORT_CHUNK_SIZE})')
+
+    def handle(self, *args, **options):
+        batch_ref = options['batch']
+        batch = Batch.objects.filter(pk=batch_ref).first() if batch_ref.isdigit() else None
+        batch = batch or Batch.objects.filter(name=batch_ref).first()
+        if batch is None:
+            raise CommandError(f'Batch "{batch_ref}" does not exist.')
+
+        if options['serial_range']:
+            text = options['serial_range']
+        elif options['source']:
+            with open(options['source'], encoding='utf-8-sig') as source:
+                text = source.read()
+        else:
+            text = sys.stdin.read()
+
+        modified_version = options['hardware_modified']
+        try:
+            result = import_serials(batch, text, bool(modified_version), modified_version,
+                                    chunk_size=options['chunk_size'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        for row, serial_number, reason in result.rejects:
+            self.stdout.write(self.style.WARNING(f'Row {row} "{serial_number}" rejected: {reason}'))
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {result.created} PCBs into "{batch.name}" in {result.elapsed:.2f}s '
+            f'({result.rate:.0f} PCBs/s), {len(result.rejects)} rejected'
+        ))
@@ -7,6 +7,7 @@ from django.contrib.contenttypes.models import ContentType
 
 def create_batch_management_group(apps, schema_editor):
     """Create the mng_batches group and assign permissions"""
+    db_alias = schema_editor.connection.alias
     # Get the Group and Permission models as they exist at the time of this migration
     Group = apps.get_model('auth', 'Group')
     Permission = apps.get_model('auth', 'Permission')
@@ -16,26 +17,26 @@ def create_batch_management_group(apps, schema_editor):
 
     # Get the content type for Batch model
     try:
-        batch_content_type = ContentType.objects.get(app_label='batch_app', model='batch')
+        batch_content_type = ContentType.objects.using(db_alias).get(app_label='batch_app', model='batch')
     except ContentType.DoesNotExist:
         # If ContentType doesn't exist yet, try to get it by looking for the model
-        batch_content_type = ContentType.objects.get_for_model(Batch)
+        batch_content_type = ContentType.objects.db_manager(db_alias).get_for_model(Batch)
 
     # Get the content type for Pcb model
     try:
-        pcb_content_type = ContentType.objects.get(app_label='batch_app', model='pcb')
+        pcb_content_type = ContentType.objects.using(db_alias).get(app_label='batch_app', model='pcb')
     except ContentType.DoesNotExist:
         # If ContentType doesn't exist yet, try to get it by looking for the model
-        pcb_content_type = ContentType.objects.get_for_model(Pcb)
+        pcb_content_type = ContentType.objects.db_manager(db_alias).get_for_model(Pcb)
 
     # Create the group
-    batch_group, created = Group.objects.get_or_create(name='mng_batches')
+    batch_group, created = Group.objects.using(db_alias).get_or_create(name='mng_batches')
 
     # Get all permissions for the Batch model
-    batch_permissions = Permission.objects.filter(content_type=batch_content_type)
+    batch_permissions = Permission.objects.using(db_alias).filter(content_type=batch_content_type)
 
     # Get all permissions for the Pcb model
-    pcb_permissions = Permission.objects.filter(content_type=pcb_content_type)
+    pcb_permissions = Permission.objects.using(db_alias).filter(content_type=pcb_content_type)
 
     # Add all permissions to the group
     for perm in batch_permissions:
@@ -49,8 +50,9 @@ def create_batch_management_group(apps, schema_editor):
 
 def remove_batch_management_group(apps, schema_editor):
     """Remove the mng_batches group"""
+    db_alias = schema_editor.connection.alias
     Group = apps.get_model('auth', 'Group')
-    batch_group = Group.objects.filter(name='mng_batches')
+    batch_group = Group.objects.using(db_alias).filter(name='mng_batches')
     if batch_group.exists():
         batch_group.delete()
 
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:53
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('batch_app', '0002_create_batch_management_group'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pcb',
+            index=models.Index(django.db.models.functions.text.Upper('serial_number'), name='batch_pcb_serial_upper_idx'),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.functions import Upper
 from django.contrib.auth.models import Group
 from pcb_type_app.models import PcbType
 from test_config_type_app.models import TestConfigType
@@ -23,6 +24,21 @@ class Batch(models.Model):
         ordering = ['name']
 
 
+class PcbQuerySet(models.QuerySet):
+    def serial_prefix(self, prefix):
+        """PCBs whose serial number starts with prefix, ignoring case.
+
+        Written as a range on UPPER(serial_number) so SQLite can seek the
+        expression index instead of scanning every PCB with LIKE.
+        """
+        queryset = self.annotate(serial_upper=Upper('serial_number')).order_by('serial_upper', 'pk')
+        prefix = prefix.upper()
+        if prefix:
+            upper_bound = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+            queryset = queryset.filter(serial_upper__gte=prefix, serial_upper__lt=upper_bound)
+        return queryset
+
+
 class Pcb(models.Model):
     """Represents a single PCB with unique serial number"""
     serial_number = models.CharField(max_length=100, unique=True)
@@ -32,6 +48,8 @@ class Pcb(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = PcbQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.serial_number} ({self.batch.name})"
 
@@ -46,6 +64,9 @@ class Pcb(models.Model):
         verbose_name = "PCB"
         verbose_name_plural = "PCBs"
         ordering = ['serial_number']
+        indexes = [
+            models.Index(Upper('serial_number'), name='batch_pcb_serial_upper_idx'),
+        ]
 
 
 # Create the management group for batches
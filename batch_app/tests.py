@@ -1,3 +1,101 @@
+from django.contrib.auth.models import Permission, User
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 
-# Create your tests here.
+from pcb_type_app.models import PcbType
+from test_config_type_app.models import TestConfigType
+from pcb_test_result_app.models import PcbTestResult, VoltageMeasurementResult, YesNoQuestionResult
+from .analytics import get_batch_analytics
+from .importer import expand_range, import_serials
+from .models import Batch, Pcb
+
+
+class SerialImportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.batch = Batch.objects.create(name='Batch', pcb_type=PcbType.objects.create(name='Controller'),
+                                         test_config_type=TestConfigType.objects.create(name='Config'),
+                                         hardware_version='1.0')
+        Pcb.objects.create(serial_number='SN-0002', batch=cls.batch)
+
+    def test_expand_range_keeps_zero_padding(self):
+        self.assertEqual(expand_range('PNL-{0098..0101}-A'), ['PNL-0098-A', 'PNL-0099-A', 'PNL-0100-A', 'PNL-0101-A'])
+        self.assertIsNone(expand_range('PNL-0001'))
+
+    def test_import_rejects_duplicates_and_inserts_in_chunks(self):
+        text = 'serial_number\nSN-{0001..0005}\nSN-0009,SN-0009\n'
+        with CaptureQueriesContext(connection) as queries:
+            result = import_serials(self.batch, text, chunk_size=4)
+        statements = [query['sql'].split()[0] for query in queries if 'SAVEPOINT' not in query['sql']]
+        self.assertEqual(statements, ['SELECT', 'INSERT', 'INSERT'])
+        self.assertEqual(result.created, 5)
+        self.assertEqual(result.rejects, [(2, 'SN-0002', 'already exists'), (3, 'SN-0009', 'duplicate of row 3')])
+        self.assertEqual(self.batch.pcbs.count(), 6)
+
+    def test_import_view(self):
+        user = User.objects.create_user('manager', password='secret')
+        user.user_permissions.add(Permission.objects.get(codename='add_pcb'))
+        self.client.force_login(user)
+        response = self.client.post(reverse('batch_pcb_import', args=[self.batch.id]),
+                                    {'serial_numbers': 'SN-0002\nSN-0100'},
+                                    HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        data = response.json()
+        self.assertEqual(data['created'], 1)
+        self.assertEqual(data['rejects'], [{'row': 1, 'serial_number': 'SN-0002', 'reason': 'already exists'}])
+
+
+class BatchAnalyticsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('engineer', password='secret')
+        cls.user.user_permissions.add(Permission.objects.get(codename='view_batch'))
+        cls.batch = Batch.objects.create(name='Batch', pcb_type=PcbType.objects.create(name='Controller'),
+                                         test_config_type=TestConfigType.objects.create(name='Config'),
+                                         hardware_version='1.0')
+        # SN-1 fails twice on VCC then passes, SN-2 passes, SN-3 is still being tested
+        runs = {'SN-1': ['FAILED', 'FAILED', 'PASSED'], 'SN-2': ['PASSED'], 'SN-3': ['INCOMPLETE']}
+        for serial, outcomes in runs.items():
+            pcb = Pcb.objects.create(serial_number=serial, batch=cls.batch)
+            for outcome in outcomes:
+                test_result = PcbTestResult.objects.create(pcb=pcb, technician=cls.user, result=outcome)
+                VoltageMeasurementResult.objects.create(test_result=test_result, parameter_name='VCC',
+                                                        measured_value=3.3, min_value=3.0, max_value=3.6,
+                                                        passed=outcome != 'FAILED')
+        YesNoQuestionResult.objects.create(test_result=test_result, question_text='LED on?', user_answer=False,
+                                           required_answer=True, passed=False)
+
+    def test_batch_report_export(self):
+        self.user.user_permissions.add(Permission.objects.get(codename='view_pcbtestresult'))
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('batch_test_result_export', args=[self.batch.pk]))
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertTrue(lines[0].endswith('VCC (voltage)'))
+        self.assertEqual([line.split(',')[1] for line in lines[1:]], ['SN-1', 'SN-1', 'SN-1', 'SN-2', 'SN-3'])
+
+    def test_yield_and_pareto(self):
+        analytics = get_batch_analytics(self.batch)
+        self.assertEqual(analytics['yield'], {
+            'boards_tested': 2, 'test_runs': 4, 'retests': 2, 'boards_retested': 1,
+            'first_pass': 1, 'final_pass': 2, 'first_pass_yield': 50.0, 'final_yield': 100.0,
+        })
+        pareto = analytics['pareto']
+        self.assertEqual(pareto['total_failures'], 3)
+        self.assertEqual([(entry['parameter'], entry['failures'], entry['boards']) for entry in pareto['parameters']],
+                         [('VCC', 2, 1), ('LED on?', 1, 1)])
+        self.assertEqual(pareto['parameters'][-1]['cumulative_share'], 100.0)
+
+    def test_json_endpoint_query_count_is_constant(self):
+        self.client.force_login(self.user)
+        url = reverse('batch_analytics_data', args=[self.batch.pk])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.json()['yield']['final_yield'], 100.0)
+        for serial in ('SN-4', 'SN-5'):
+            PcbTestResult.objects.create(pcb=Pcb.objects.create(serial_number=serial, batch=self.batch),
+                                         technician=self.user, result='FAILED')
+        self.assertNumQueries(len(queries), self.client.get, url)
+        self.assertEqual(self.client.get(reverse('batch_analytics', args=[self.batch.pk])).status_code, 200)
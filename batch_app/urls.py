@@ -9,6 +9,10 @@ urlpatterns = [
     path('pcb/create/', views.batch_pcb_create, name='batch_pcb_create'),
     path('pcb/delete/<int:pcb_id>/', views.batch_pcb_delete, name='batch_pcb_delete'),
     path('<int:pk>/', views.batch_detail, name='batch_detail'),
+    path('<int:pk>/analytics/', views.batch_analytics, name='batch_analytics'),
+    path('<int:pk>/analytics/data/', views.batch_analytics_data, name='batch_analytics_data'),
+    path('<int:pk>/export/', views.batch_test_result_export, name='batch_test_result_export'),
+    path('<int:batch_id>/pcb/import/', views.batch_pcb_import, name='batch_pcb_import'),
     path('<int:batch_id>/pcb/update/<int:pcb_id>/', views.batch_pcb_update, name='batch_pcb_update'),
     path('<int:batch_id>/pcb/delete/<int:pcb_id>/', views.batch_pcb_delete, name='batch_pcb_delete'),
     path('<int:batch_id>/pcb/<int:pcb_id>/', views.batch_pcb_detail, name='batch_pcb_detail'),
@@ -4,7 +4,11 @@ from django.contrib import messages
 from django.core.paginator import Paginator
 from django.http import JsonResponse
 from django.db.models import Q
+from .analytics import get_batch_analytics
+from .importer import import_serials
 from .models import Batch, Pcb, create_batch_management_group
+from pcb_test_result_app.models import PcbTestResult
+from pcb_test_result_app.reports import report_response
 from pcb_type_app.models import PcbType
 from test_config_type_app.models import TestConfigType
 
@@ -156,6 +160,37 @@ def batch_detail(request, pk):
     return render(request, 'batch_app/batch_detail.html', context)
 
 
+@login_required
+@permission_required('batch_app.view_batch', raise_exception=True)
+def batch_analytics(request, pk):
+    """Yield and failure Pareto of a Batch"""
+    batch = get_object_or_404(Batch.objects.select_related('pcb_type', 'test_config_type'), pk=pk)
+    context = {
+        'batch': batch,
+        'analytics': get_batch_analytics(batch),
+    }
+    return render(request, 'batch_app/batch_analytics.html', context)
+
+
+@login_required
+@permission_required('batch_app.view_batch', raise_exception=True)
+def batch_analytics_data(request, pk):
+    """Yield and failure Pareto of a Batch as JSON"""
+    batch = get_object_or_404(Batch, pk=pk)
+    return JsonResponse({'batch_id': batch.pk, 'batch': batch.name, **get_batch_analytics(batch)})
+
+
+@login_required
+@permission_required('batch_app.view_batch', raise_exception=True)
+@permission_required('pcb_test_result_app.view_pcbtestresult', raise_exception=True)
+def batch_test_result_export(request, pk):
+    """Download the test results of a Batch as CSV or XLSX, one column per measured parameter"""
+    batch = get_object_or_404(Batch, pk=pk)
+    test_results = PcbTestResult.objects.filter(pcb__batch=batch).order_by('pcb__serial_number', 'pk')
+    file_format = 'xlsx' if request.GET.get('format') == 'xlsx' else 'csv'
+    return report_response(test_results, file_format, f'batch_{batch.pk}_test_results')
+
+
 @login_required
 @permission_required('batch_app.delete_pcb', raise_exception=True)
 def batch_pcb_delete(request, batch_id, pcb_id):
@@ -212,6 +247,53 @@ def batch_pcb_create(request):
     return redirect('batch_list')
 
 
+IMPORT_REJECTS_SHOWN = 20  # Rejected rows listed in the import message
+
+
+@login_required
+@permission_required('batch_app.add_pcb', raise_exception=True)
+def batch_pcb_import(request, batch_id):
+    """Create many PCBs in a batch from a pasted or uploaded serial number list"""
+    batch = get_object_or_404(Batch, pk=batch_id)
+    if request.method != 'POST':
+        return redirect('batch_detail', pk=batch_id)
+    
+    text = request.POST.get('serial_numbers', '')
+    upload = request.FILES.get('serial_file')
+    if upload:
+        text = upload.read().decode('utf-8-sig', errors='replace')
+    hardware_modified = request.POST.get('hardware_modified') == 'on'
+    modified_hardware_version = request.POST.get('modified_hardware_version', '')
+    
+    try:
+        result = import_serials(batch, text, hardware_modified, modified_hardware_version)
+    except Exception as e:
+        if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+            return JsonResponse({'success': False, 'error': str(e)}, status=400)
+        messages.error(request, f'Error importing PCBs: {str(e)}')
+        return redirect('batch_detail', pk=batch_id)
+    
+    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        return JsonResponse({
+            'success': True,
+            'created': result.created,
+            'rejects': [{'row': row, 'serial_number': serial_number, 'reason': reason}
+                        for row, serial_number, reason in result.rejects],
+            'seconds': round(result.elapsed, 3),
+            'pcbs_per_second': round(result.rate, 1),
+        })
+    
+    messages.success(request, f'Imported {result.created} PCBs in {result.elapsed:.2f}s ({result.rate:.0f} PCBs/s).')
+    if result.rejects:
+        shown = '; '.join(f'row {row} "{serial_number}": {reason}'
+                          for row, serial_number, reason in result.rejects[:IMPORT_REJECTS_SHOWN])
+        more = len(result.rejects) - IMPORT_REJECTS_SHOWN
+        if more > 0:
+            shown += f'; and {more} more'
+        messages.warning(request, f'{len(result.rejects)} rows were rejected: {shown}')
+    return redirect('batch_detail', pk=batch_id)
+
+
 @login_required
 @permission_required('batch_app.change_pcb', raise_exception=True)
 def batch_pcb_update(request, batch_id, pcb_id):
@@ -1,6 +1,5 @@
 import os
 import sys
-from datetime import datetime
 import subprocess
 import django
 from django.core.management import execute_from_command_line
@@ -13,27 +12,20 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'moduletrack.settings')
 django.setup()
 
-def create_db_backup():
-    """Create a backup of the database schema and data"""
+from moduletrack.backup import list_backups
+
+def create_db_backup(git_commit=None, full=False):
+    """Create a backup of the database data with the backup_database command.
+
+    Backups are written to BACKUP_DIR as compressed chunk files with a
+    manifest; after the first full backup they are incremental, and old
+    backups are pruned by the command's retention policy.
+    """
     try:
-        # Create timestamped backup filename
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'db_backup')
-        backup_file = os.path.join(backup_dir, f"db_backup_{timestamp}.json")
-        
-        # Ensure the backup directory exists
-        os.makedirs(backup_dir, exist_ok=True)
-        
-        # Run Django's dumpdata command with proper encoding
-        management.call_command('dumpdata', 
-                               '--exclude', 'contenttypes', 
-                               '--exclude', 'auth.permission', 
-                               '--exclude', 'sessions.session',
-                               output=backup_file, 
-                               verbosity=0)
-        
-        print(f"Database backup created: {backup_file}")
-        return backup_file
+        management.call_command('backup_database', git_commit=git_commit, full=full)
+        backup = list_backups()[-1]
+        print(f"Database backup created: {backup['id']} ({backup['kind']})")
+        return backup
     except Exception as e:
         print(f"Error creating database backup: {e}")
         return None
@@ -50,23 +42,9 @@ def get_current_git_commit():
         print(f"Error getting Git commit: {e}")
         return None
 
-def create_backup_with_commit():
-    """Create a database backup with Git commit information"""
-    git_commit = get_current_git_commit()
-    backup_file = create_db_backup()
-    
-    if backup_file and git_commit:
-        # Create a README file with commit info
-        readme_file = backup_file.replace('.json', '_README.txt')
-        with open(readme_file, 'w') as f:
-            f.write(f"Database backup for Git commit: {git_commit}\n")
-            f.write(f"Backup created on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write(f"Original backup file: {os.path.basename(backup_file)}\n")
-        
-        print(f"Backup README created: {readme_file}")
-        return backup_file, readme_file
-    
-    return None, None
+def create_backup_with_commit(full=False):
+    """Create a database backup recording the Git commit in its manifest"""
+    return create_db_backup(get_current_git_commit(), full=full)
 
 if __name__ == "__main__":
-    create_backup_with_commit()
\ No newline at end of file
+    create_backup_with_commit(full='--full' in sys.argv[1:])
\ No newline at end of file
@@ -6,4 +6,5 @@ class ModuletrackConfig(AppConfig):
     name = 'moduletrack'
     
     def ready(self):
-        import moduletrack.signals  # Import the signals module to connect the signal
\ No newline at end of file
+        import moduletrack.signals  # Import the signals module to connect the signal
+        import moduletrack.sqlite  # Import the sqlite module to connect its connection handler
\ No newline at end of file
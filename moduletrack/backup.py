@@ -0,0 +1,324 @@
+import gzip
+import hashlib
+import json
+import os
+import shutil
+from datetime import datetime, timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core import serializers
+from django.db import connection, models, transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+
+
+BACKUP_FORMAT = 1  # Version of the backup layout written to each manifest
+BACKUP_CHUNK_SIZE = 10000  # Rows serialized per compressed chunk file
+FULL_BACKUP_EVERY = 7  # An incremental chain is closed by a full backup after this many backups
+KEEP_FULL_BACKUPS = 4  # Full backups kept, each with the incremental backups built on it
+# How far an incremental backup reaches back before the previous one's high-water mark. A row is
+# stamped before its transaction commits, possibly after waiting out busy_timeout for the write lock.
+BACKUP_OVERLAP = timedelta(minutes=5)
+MANIFEST_NAME = 'manifest.json'
+
+# Rebuilt by migrate, as in the old dumpdata backups
+EXCLUDED_MODELS = {'contenttypes.contenttype', 'auth.permission', 'sessions.session'}
+# Derived data, rebuilt from the test results after a restore
+DERIVED_MODELS = {'pcb_test_result_app.resultrollup', 'pcb_test_result_app.spcstatistics'}
+
+# Timestamps that show a row changed, for models where its own auto_now /
+# auto_now_add field does not tell. Writing a result row refreshes the
+# counters of its test result, which sets the test result's updated_at.
+CHANGE_LOOKUPS = {
+    'admin.logentry': ['action_time'],
+    'pcb_test_result_app.measurementresult': ['test_result__updated_at'],
+    'pcb_test_result_app.yesnoquestionresult': ['test_result__updated_at'],
+    'pcb_test_result_app.instructionresult': ['test_result__updated_at'],
+    'pcb_test_result_app.regraderesult': ['run__created_at'],
+}
+
+
+class BackupError(Exception):
+    """A backup is missing, incomplete or does not match its manifest"""
+
+
+def backup_directory():
+    return str(getattr(settings, 'BACKUP_DIR', os.path.join(settings.BASE_DIR, 'db_backup')))
+
+
+def backup_models():
+    """The concrete models a backup holds, in app registry order"""
+    return [
+        model for model in apps.get_models()
+        if not model._meta.proxy and model._meta.label_lower not in EXCLUDED_MODELS | DERIVED_MODELS
+    ]
+
+
+def restore_order(models_to_restore):
+    """Models ordered so each comes after the models its foreign keys point to"""
+    remaining = list(models_to_restore)
+    ordered = []
+    while remaining:
+        for model in remaining:
+            dependencies = {
+                field.related_model for field in model._meta.concrete_fields
+                if field.is_relation and field.related_model is not model and field.related_model in remaining
+            }
+            if not dependencies:
+                ordered.append(model)
+                remaining.remove(model)
+                break
+        else:
+            # A cycle of foreign keys; constraints are only checked once everything is loaded
+            ordered.extend(remaining)
+            break
+    return ordered
+
+
+def change_lookups(model):
+    """Timestamp lookups that show a row of the model changed, or [] when every row is backed up each time"""
+    if model._meta.label_lower in CHANGE_LOOKUPS:
+        return CHANGE_LOOKUPS[model._meta.label_lower]
+    date_fields = [field for field in model._meta.concrete_fields if isinstance(field, models.DateTimeField)]
+    for stamp in ('auto_now', 'auto_now_add'):
+        for field in date_fields:
+            if getattr(field, stamp):
+                return [field.name]
+    return []
+
+
+def changed_since(model, lookups, since):
+    """Q for the rows of a model whose change timestamps are at or after since.
+
+    A timestamp of a related row becomes an IN subquery on the foreign key,
+    which the foreign key index serves, rather than a join.
+    """
+    changed = Q()
+    for lookup in lookups:
+        if '__' in lookup:
+            field_name, related_lookup = lookup.split('__', 1)
+            related_model = model._meta.get_field(field_name).related_model
+            related = related_model._base_manager.filter(**{f'{related_lookup}__gte': since}).values('pk')
+            changed |= Q(**{f'{field_name}__in': related})
+        else:
+            changed |= Q(**{f'{lookup}__gte': since})
+    return changed
+
+
+def high_water_mark(models_to_back_up):
+    """The latest change timestamp of the models' rows, read in the caller's transaction, or None"""
+    stamps = []
+    for model in models_to_back_up:
+        for lookup in change_lookups(model) if _has_integer_pk(model) else []:
+            # A related timestamp is the own timestamp of another backed up model
+            if '__' not in lookup:
+                stamps.append(model._base_manager.aggregate(stamp=Max(lookup))['stamp'])
+    return max((stamp for stamp in stamps if stamp is not None), default=None)
+
+
+def last_primary_keys(models_to_back_up):
+    """The largest primary key of each model with integer keys, 0 for an empty table"""
+    return {
+        model: model._base_manager.aggregate(last=Max('pk'))['last'] or 0
+        for model in models_to_back_up if _has_integer_pk(model)
+    }
+
+
+def incremental_since(base, overlap=BACKUP_OVERLAP):
+    """Start of the window of an incremental backup on base, or None to copy every row"""
+    # Backups written before high-water marks were recorded start from when they began
+    high_water = base.get('high_water', base['started_at'])
+    if high_water is None:
+        return None
+    return datetime.fromisoformat(high_water) - overlap
+
+
+def _has_integer_pk(model):
+    return model._meta.pk.get_internal_type() in ('AutoField', 'BigAutoField', 'SmallAutoField')
+
+
+def live_id_ranges(model):
+    """The primary keys of a model's rows as [[first, last], ...] runs of consecutive ids.
+
+    The runs are found by the database (consecutive ids share id minus row
+    number), so the result is as small as the number of gaps.
+    """
+    table = connection.ops.quote_name(model._meta.db_table)
+    pk = connection.ops.quote_name(model._meta.pk.column)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT MIN({pk}), MAX({pk}) FROM '
+            f'(SELECT {pk}, {pk} - ROW_NUMBER() OVER (ORDER BY {pk}) AS run FROM {table}) AS runs '
+            f'GROUP BY run ORDER BY 1'
+        )
+        return [list(row) for row in cursor.fetchall()]
+
+
+def _write_file(directory, name, data):
+    """Write gzip-compressed data and return its manifest entry"""
+    compressed = gzip.compress(data.encode(), compresslevel=6)
+    with open(os.path.join(directory, name), 'wb') as f:
+        f.write(compressed)
+    return {'file': name, 'sha256': hashlib.sha256(compressed).hexdigest()}
+
+
+def _backup_model(model, directory, since, chunk_size, last_pk=None):
+    """Serialize the changed rows of a model up to primary key last_pk into chunk files and return its manifest entry"""
+    label = model._meta.label_lower
+    rows = model._base_manager.order_by('pk')
+    if last_pk is not None:
+        rows = rows.filter(pk__lte=last_pk)
+    lookups = change_lookups(model) if _has_integer_pk(model) else []
+    if since is not None and lookups:
+        rows = rows.filter(changed_since(model, lookups, since))
+
+    entry = {'model': label, 'rows': 0, 'incremental': since is not None and bool(lookups), 'chunks': []}
+    previous_pk = None
+    while True:
+        chunk = rows.filter(pk__gt=previous_pk) if previous_pk is not None else rows
+        chunk = list(chunk[:chunk_size])
+        if not chunk:
+            break
+        previous_pk = chunk[-1].pk
+        data = serializers.serialize('json', chunk, use_natural_foreign_keys=True)
+        chunk_entry = _write_file(directory, f'{label}.{len(entry["chunks"]):05d}.json.gz', data)
+        chunk_entry['rows'] = len(chunk)
+        entry['chunks'].append(chunk_entry)
+        entry['rows'] += len(chunk)
+
+    if entry['incremental']:
+        # Rows deleted since the previous backup are the ones missing from these
+        entry['live_ids'] = _write_file(directory, f'{label}.ids.json.gz', json.dumps(live_id_ranges(model)))
+    return entry
+
+
+def read_manifest(path):
+    with open(os.path.join(path, MANIFEST_NAME)) as f:
+        return json.load(f)
+
+
+def list_backups(directory=None):
+    """Manifests of the complete backups in a directory, oldest first.
+
+    A backup is complete once its manifest has been written, which is the
+    last step of creating it.
+    """
+    directory = directory or backup_directory()
+    if not os.path.isdir(directory):
+        return []
+    manifests = []
+    for name in sorted(os.listdir(directory)):
+        if os.path.isfile(os.path.join(directory, name, MANIFEST_NAME)):
+            manifests.append(read_manifest(os.path.join(directory, name)))
+    return manifests
+
+
+def backup_chain(backups, backup_id=None):
+    """The full backup and the incremental backups on it needed to restore a backup, in order"""
+    if backup_id is None:
+        if not backups:
+            raise BackupError('There are no backups.')
+        backup_id = backups[-1]['id']
+    by_id = {backup['id']: backup for backup in backups}
+    chain = []
+    while backup_id is not None:
+        if backup_id not in by_id:
+            raise BackupError(f'Backup "{backup_id}" does not exist or is incomplete.')
+        chain.append(by_id[backup_id])
+        backup_id = by_id[backup_id]['base']
+    chain.reverse()
+    return chain
+
+
+def create_backup(directory=None, full=False, full_every=FULL_BACKUP_EVERY, chunk_size=BACKUP_CHUNK_SIZE,
+                  git_commit=None, overlap=BACKUP_OVERLAP):
+    """Write a backup and return its manifest.
+
+    Each model is serialized table by table, in primary key chunks, to
+    gzip-compressed JSON files that loaddata also reads. Every chunk is
+    read on its own rather than in one long read transaction, which in
+    SQLite's rollback-journal mode would keep writers waiting for the
+    whole backup. The high-water mark and each table's last primary key
+    are read first, so rows added meanwhile are left to the next backup,
+    and parents are backed up before their children. An incremental
+    backup holds only the rows whose timestamps (see change_lookups) are at
+    or after the previous backup's high-water mark, the latest timestamp
+    its snapshot held, less overlap; rows backed up twice are upserted on
+    restore. It also holds the id ranges of the rows still there so a
+    restore can drop deleted ones; models without timestamps are copied
+    whole. A full backup is made when asked, when
+    there is no previous backup, or when the chain since the last full
+    backup has reached full_every backups.
+    """
+    directory = directory or backup_directory()
+    backups = list_backups(directory)
+    chain_length = len(backup_chain(backups)) if backups else 0
+    full = full or not backups or chain_length >= full_every
+    base = None if full else backups[-1]
+
+    started_at = timezone.now()
+    backup_id = started_at.strftime('%Y%m%d_%H%M%S_%f')
+    path = os.path.join(directory, backup_id)
+    os.makedirs(path)
+    try:
+        since = incremental_since(base, overlap) if base else None
+        models_to_back_up = restore_order(backup_models())
+        with transaction.atomic():
+            high_water = high_water_mark(models_to_back_up)
+            last_pks = last_primary_keys(models_to_back_up)
+        entries = [
+            _backup_model(model, path, since, chunk_size, last_pks.get(model)) for model in models_to_back_up
+        ]
+        manifest = {
+            'format': BACKUP_FORMAT,
+            'id': backup_id,
+            'kind': 'incremental' if base else 'full',
+            'base': base['id'] if base else None,
+            'since': since.isoformat() if since else None,
+            'started_at': started_at.isoformat(),
+            'high_water': high_water.isoformat() if high_water else None,
+            'finished_at': timezone.now().isoformat(),
+            'git_commit': git_commit,
+            'models': entries,
+        }
+        with open(os.path.join(path, f'{MANIFEST_NAME}.partial'), 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(os.path.join(path, f'{MANIFEST_NAME}.partial'), os.path.join(path, MANIFEST_NAME))
+    except BaseException:
+        shutil.rmtree(path, ignore_errors=True)
+        raise
+    return manifest
+
+
+def verify_backup(directory, manifest):
+    """Raise BackupError unless every file of a backup is present and matches its checksum"""
+    path = os.path.join(directory, manifest['id'])
+    for entry in manifest['models']:
+        for file_entry in entry['chunks'] + ([entry['live_ids']] if 'live_ids' in entry else []):
+            try:
+                with open(os.path.join(path, file_entry['file']), 'rb') as f:
+                    checksum = hashlib.sha256(f.read()).hexdigest()
+            except FileNotFoundError:
+                raise BackupError(f'{file_entry["file"]} of backup {manifest["id"]} is missing.')
+            if checksum != file_entry['sha256']:
+                raise BackupError(f'{file_entry["file"]} of backup {manifest["id"]} does not match its checksum.')
+
+
+def apply_retention(directory=None, keep_full=KEEP_FULL_BACKUPS):
+    """Delete the backups older than the last keep_full full backups and return their ids.
+
+    Incremental backups go together with the full backup they build on,
+    so every kept backup can still be restored.
+    """
+    directory = directory or backup_directory()
+    full_ids = [backup['id'] for backup in list_backups(directory) if backup['kind'] == 'full']
+    if len(full_ids) <= keep_full:
+        return []
+    oldest_kept = full_ids[-keep_full] if keep_full else None
+    deleted = []
+    for backup in list_backups(directory):
+        if oldest_kept is None or backup['id'] < oldest_kept:
+            shutil.rmtree(os.path.join(directory, backup['id']))
+            deleted.append(backup['id'])
+    return deleted
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+from moduletrack.backup import (
+    BACKUP_CHUNK_SIZE,
+    FULL_BACKUP_EVERY,
+    KEEP_FULL_BACKUPS,
+    apply_retention,
+    backup_directory,
+    create_backup,
+)
+
+
+class Command(BaseCommand):
+    help = ('Back up the database into compressed chunk files with a checksummed manifest; '
+            'backups are incremental after the first full one')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', help='Backup directory (default BACKUP_DIR)')
+        parser.add_argument('--full', action='store_true', help='Make a full backup even if an incremental one would do')
+        parser.add_argument('--full-every', type=int, default=FULL_BACKUP_EVERY,
+                            help=f'Make a full backup once a chain has this many backups (default {FULL_BACKUP_EVERY})')
+        parser.add_argument('--keep-full', type=int, default=KEEP_FULL_BACKUPS,
+                            help=f'Full backups kept along with their incremental backups (default {KEEP_FULL_BACKUPS})')
+        parser.add_argument('--chunk-size', type=int, default=BACKUP_CHUNK_SIZE,
+                            help=f'Rows per compressed chunk file (default {BACKUP_CHUNK_SIZE})')
+        parser.add_argument('--git-commit', help='Commit of the code the backup was made with, kept in the manifest')
+
+    def handle(self, *args, **options):
+        if options['keep_full'] < 1 or options['full_every'] < 1:
+            raise CommandError('--keep-full and --full-every must be at least 1.')
+        directory = options['dir'] or backup_directory()
+
+        manifest = create_backup(directory, full=options['full'], full_every=options['full_every'],
+                                 chunk_size=options['chunk_size'], git_commit=options['git_commit'])
+        rows = sum(entry['rows'] for entry in manifest['models'])
+        files = sum(len(entry['chunks']) for entry in manifest['models'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {manifest["kind"]} backup {manifest["id"]}: {rows} row(s) in {files} chunk file(s)'
+        ))
+
+        for backup_id in apply_retention(directory, options['keep_full']):
+            self.stdout.write(f'Deleted old backup {backup_id}')
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from moduletrack.backup import BackupError
+from moduletrack.restore import restore_backup
+
+
+class Command(BaseCommand):
+    help = ('Restore a backup made by backup_database, the latest by default, into a staging database '
+            'file and swap it in for the current database')
+
+    def add_arguments(self, parser):
+        parser.add_argument('backup_id', nargs='?', help='Backup to restore (default: the latest)')
+        parser.add_argument('--dir', help='Backup directory (default BACKUP_DIR)')
+        parser.add_argument('--database', metavar='PATH',
+                            help='SQLite file to restore into instead of the project database')
+        parser.add_argument('--noinput', '--no-input', action='store_false', dest='interactive',
+                            help='Do not ask for confirmation')
+
+    def handle(self, *args, **options):
+        if options['interactive']:
+            answer = input('This replaces all data in the database with the backup. Type "yes" to continue: ')
+            if answer != 'yes':
+                raise CommandError('Restore cancelled.')
+
+        try:
+            chain, rows = restore_backup(options['backup_id'], options['dir'], options['database'])
+        except BackupError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            f'Restored backup {chain[-1]["id"]} ({len(chain)} backup(s) in its chain, {rows} row(s))'
+        ))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+from moduletrack.sqlite import JOURNAL_MODES, set_journal_mode
+
+
+class Command(BaseCommand):
+    help = ('Show the journal mode of the SQLite database, or switch it. The mode is stored in the database '
+            'file, so it only needs setting once; leaving WAL mode needs the site stopped.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('mode', nargs='?', choices=JOURNAL_MODES, help='Journal mode to switch to')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help='Database alias (default "default")')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if connection.vendor != 'sqlite':
+            raise CommandError('The journal mode can only be set on an SQLite database.')
+
+        mode = options['mode']
+        if mode is None:
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode')
+                self.stdout.write(f'Journal mode: {cursor.fetchone()[0]}')
+            return
+
+        try:
+            current = set_journal_mode(connection, mode)
+        except OperationalError as e:
+            raise CommandError(f'Could not switch to {mode} ({e}); stop the site and try again.')
+        if current != mode:
+            raise CommandError(f'The database stayed in {current} mode.')
+        self.stdout.write(self.style.SUCCESS(f'Switched the journal mode to {mode}'))
@@ -0,0 +1,309 @@
+import gzip
+import json
+import os
+import shutil
+import sqlite3
+import time
+from contextlib import closing, contextmanager
+
+from django.apps import apps
+from django.core import serializers
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connections, models, transaction
+from django.db.utils import load_backend
+
+from .backup import (
+    BackupError,
+    backup_chain,
+    backup_directory,
+    backup_models,
+    list_backups,
+    restore_order,
+    verify_backup,
+)
+
+
+STAGING_ALIAS = 'restore_staging'
+DELETE_BATCH_SIZE = 200  # Id gaps removed per DELETE statement
+SWAP_LOCK_TIMEOUT = 30  # Seconds the swap waits for other connections to let go of the database file
+
+
+@contextmanager
+def keep_timestamps(models_to_restore):
+    """Make bulk_create() keep the backed up auto_now / auto_now_add values instead of stamping the current time"""
+    fields = [
+        field for model in models_to_restore for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+@contextmanager
+def staging_database(path):
+    """A connection to a new SQLite file at path, under the STAGING_ALIAS alias"""
+    for stale_path in (path, f'{path}-journal', f'{path}-wal', f'{path}-shm'):
+        if os.path.exists(stale_path):
+            os.remove(stale_path)
+    settings_dict = {**connections[DEFAULT_DB_ALIAS].settings_dict, 'NAME': path}
+    # Attached to the connection handler only, so it never shows up in settings.DATABASES
+    connection = load_backend(settings_dict['ENGINE']).DatabaseWrapper(settings_dict, STAGING_ALIAS)
+    connections[STAGING_ALIAS] = connection
+    try:
+        yield connection
+    finally:
+        connection.close()
+        del connections[STAGING_ALIAS]
+
+
+def create_schema(connection):
+    """Run every migration on the staging database and empty the tables a backup restores.
+
+    migrate also creates the content types and permissions, which backups
+    leave out. Rows seeded by data migrations, such as the permission
+    groups, are removed since the backup holds them as they were.
+    """
+    call_command('migrate', database=connection.alias, interactive=False, verbosity=0, skip_checks=True)
+    with transaction.atomic(using=connection.alias):
+        for model in reversed(restore_order(backup_models())):
+            _delete_rows(model, connection)
+
+
+def _read_chunk(path, using):
+    with gzip.open(path, 'rt') as f:
+        return list(serializers.deserialize('json', f.read(), using=using))
+
+
+def _many_to_many_fields(model):
+    return [field for field in model._meta.local_many_to_many if field.remote_field.through._meta.auto_created]
+
+
+def _execute_in_batches(cursor, statement, conditions):
+    """Run statement with a WHERE clause ORing batches of (sql, params) conditions"""
+    for start in range(0, len(conditions), DELETE_BATCH_SIZE):
+        batch = conditions[start:start + DELETE_BATCH_SIZE]
+        cursor.execute(f'{statement} WHERE ' + ' OR '.join(sql for sql, params in batch),
+                       [param for sql, params in batch for param in params])
+
+
+def _delete_rows(model, connection, live_ids=None):
+    """Delete the rows of a model outside the live id ranges, or all of them when there are none"""
+    quote = connection.ops.quote_name
+    table, pk = quote(model._meta.db_table), quote(model._meta.pk.column)
+    with connection.cursor() as cursor:
+        if not live_ids:
+            cursor.execute(f'DELETE FROM {table}')
+        else:
+            gaps = [(f'{pk} < %s', [live_ids[0][0]]), (f'{pk} > %s', [live_ids[-1][1]])]
+            gaps += [
+                (f'{pk} BETWEEN %s AND %s', [last + 1, next_first - 1])
+                for (first, last), (next_first, next_last) in zip(live_ids, live_ids[1:])
+                if next_first > last + 1
+            ]
+            _execute_in_batches(cursor, f'DELETE FROM {table}', gaps)
+        for field in _many_to_many_fields(model):
+            through = field.remote_field.through
+            source = quote(through._meta.get_field(field.m2m_field_name()).column)
+            cursor.execute(f'DELETE FROM {quote(through._meta.db_table)} '
+                           f'WHERE {source} NOT IN (SELECT {pk} FROM {table})')
+
+
+def _clear_dangling_references(model, connection):
+    """Null the SET_NULL foreign keys whose target row is gone, as deleting it did in the source database"""
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    with connection.cursor() as cursor:
+        for field in model._meta.concrete_fields:
+            if field.is_relation and field.db_constraint and field.remote_field.on_delete is models.SET_NULL:
+                column = quote(field.column)
+                target = field.related_model
+                cursor.execute(
+                    f'UPDATE {table} SET {column} = NULL WHERE {column} IS NOT NULL AND {column} NOT IN '
+                    f'(SELECT {quote(target._meta.pk.column)} FROM {quote(target._meta.db_table)})'
+                )
+
+
+def _load_rows(model, deserialized, using, upsert):
+    """bulk_create one chunk of deserialized rows with their many-to-many rows"""
+    manager = model._base_manager.db_manager(using)
+    objects = [item.object for item in deserialized]
+    if upsert:
+        manager.bulk_create(objects, update_conflicts=True, unique_fields=[model._meta.pk.name],
+                            update_fields=[field.name for field in model._meta.concrete_fields if not field.primary_key])
+    else:
+        manager.bulk_create(objects)
+
+    for field in _many_to_many_fields(model):
+        through = field.remote_field.through
+        source, target = field.m2m_field_name(), field.m2m_reverse_field_name()
+        if upsert:
+            through._base_manager.db_manager(using).filter(**{f'{source}__in': [obj.pk for obj in objects]}).delete()
+        through._base_manager.db_manager(using).bulk_create([
+            through(**{f'{source}_id': item.object.pk, f'{target}_id': target_id})
+            for item in deserialized for target_id in item.m2m_data.get(field.name, [])
+        ])
+
+
+def apply_backup(directory, manifest, connection):
+    """Apply one backup of a chain to the staging database and return the number of rows loaded.
+
+    A full backup is loaded into empty tables. An incremental one first
+    deletes the rows missing from its id ranges, children first, and then
+    upserts its changed rows, parents first; models it copied whole are
+    replaced.
+    """
+    entries = {entry['model']: entry for entry in manifest['models']}
+    try:
+        ordered = restore_order([apps.get_model(label) for label in entries])
+    except LookupError as e:
+        raise BackupError(f'Backup {manifest["id"]} holds a model that no longer exists: {e}')
+    path = os.path.join(directory, manifest['id'])
+    incremental = manifest['kind'] == 'incremental'
+
+    if incremental:
+        for model in reversed(ordered):
+            entry = entries[model._meta.label_lower]
+            if entry['incremental']:
+                with gzip.open(os.path.join(path, entry['live_ids']['file']), 'rt') as f:
+                    _delete_rows(model, connection, json.load(f))
+            else:
+                _delete_rows(model, connection)
+
+    rows = 0
+    for model in ordered:
+        entry = entries[model._meta.label_lower]
+        for chunk in entry['chunks']:
+            deserialized = _read_chunk(os.path.join(path, chunk['file']), connection.alias)
+            _load_rows(model, deserialized, connection.alias, upsert=incremental and entry['incremental'])
+            rows += len(deserialized)
+
+    if incremental:
+        for model in ordered:
+            _clear_dangling_references(model, connection)
+    return rows
+
+
+def _lock_for_swap(database, target_path):
+    """Take the old database file out of WAL mode and hold it with BEGIN EXCLUSIVE; returns its journal mode.
+
+    Leaving WAL mode folds the log into the file and only succeeds while no
+    other connection has the file open, so it is retried for up to
+    SWAP_LOCK_TIMEOUT seconds.
+    """
+    deadline = time.monotonic() + SWAP_LOCK_TIMEOUT
+    journal_mode = database.execute('PRAGMA journal_mode').fetchone()[0]
+    while True:
+        try:
+            if database.execute('PRAGMA journal_mode = DELETE').fetchone()[0] != 'delete':
+                raise sqlite3.OperationalError('the journal mode cannot be changed')
+            database.execute('BEGIN EXCLUSIVE')
+            return journal_mode
+        except sqlite3.OperationalError as e:
+            if time.monotonic() >= deadline:
+                raise BackupError(f'Could not lock {target_path} to swap in the restored database ({e}); '
+                                  f'stop the site and try again.')
+            time.sleep(0.05)
+
+
+def _swap_in(staging_path, target_path):
+    """Move the staging file over the database file in one rename, keeping the old file as <name>.pre-restore.
+
+    The old file is locked until the rename is done, so no other connection
+    writes to it in between, and its log and shared-memory files are removed
+    so they are never read against the new one. The new file gets the old
+    file's journal mode. Raises BackupError, leaving the database as it
+    was, when the old file cannot be locked.
+    """
+    if not os.path.exists(target_path):
+        os.replace(staging_path, target_path)
+        return
+    with closing(sqlite3.connect(target_path, timeout=SWAP_LOCK_TIMEOUT, isolation_level=None)) as database:
+        journal_mode = _lock_for_swap(database, target_path)
+        if journal_mode == 'wal':
+            # Closing the only connection leaves no log behind, just the mode in the file header
+            with closing(sqlite3.connect(staging_path)) as staging:
+                staging.execute('PRAGMA journal_mode = WAL')
+        previous_path = f'{target_path}.pre-restore'
+        if os.path.exists(previous_path):
+            os.remove(previous_path)
+        try:
+            os.link(target_path, previous_path)
+        except OSError:
+            shutil.copy2(target_path, previous_path)
+        for stale_path in (f'{target_path}-wal', f'{target_path}-shm'):
+            if os.path.exists(stale_path):
+                os.remove(stale_path)
+        os.replace(staging_path, target_path)
+        database.execute('ROLLBACK')
+
+
+def restore_backup(backup_id=None, directory=None, database_path=None):
+    """Restore a backup, the latest by default, and return (restored chain, rows loaded).
+
+    The chain of backups is verified against the manifest checksums and
+    loaded with bulk_create in one transaction into a new SQLite file next
+    to the database, migrated like any other, with constraints checked at
+    the end. The file then replaces the database in one rename, so the site
+    serves the old data until the restored data is complete; the rename
+    waits until no other connection has the database open, so the site
+    should be stopped first. Restoring the project's own database also
+    rebuilds the result rollups and drops cached configs.
+    """
+    default = connections[DEFAULT_DB_ALIAS]
+    if default.vendor != 'sqlite':
+        raise BackupError('Restoring through a staging file needs an SQLite database.')
+    directory = directory or backup_directory()
+    restoring_default = database_path is None
+    database_path = str(database_path or default.settings_dict['NAME'])
+
+    chain = backup_chain(list_backups(directory), backup_id)
+    for manifest in chain:
+        verify_backup(directory, manifest)
+
+    staging_path = f'{database_path}.restore'
+    rows = 0
+    try:
+        with staging_database(staging_path) as staging:
+            create_schema(staging)
+            models_to_restore = {apps.get_model(entry['model']) for manifest in chain for entry in manifest['models']}
+            staging.disable_constraint_checking()
+            try:
+                with keep_timestamps(models_to_restore), transaction.atomic(using=STAGING_ALIAS):
+                    for manifest in chain:
+                        rows += apply_backup(directory, manifest, staging)
+                    try:
+                        staging.check_constraints()
+                    except IntegrityError as e:
+                        raise BackupError(f'The restored data is inconsistent: {e}')
+            finally:
+                staging.enable_constraint_checking()
+            with staging.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode=DELETE')
+    except BaseException:
+        if os.path.exists(staging_path):
+            os.remove(staging_path)
+        raise
+
+    if restoring_default:
+        default.close()
+    try:
+        _swap_in(staging_path, database_path)
+    except BaseException:
+        os.remove(staging_path)
+        raise
+
+    if restoring_default:
+        from pcb_test_result_app.rollups import rebuild_rollups
+        from test_config_type_app.config_cache import config_cache
+        from test_config_type_app.models import TestConfigType
+
+        rebuild_rollups()
+        for config_id in TestConfigType.objects.values_list('pk', flat=True):
+            config_cache.invalidate(config_id)
+    return chain, rows
@@ -143,6 +143,29 @@ DB_PATH = BASE_DIR / 'db'
 if not os.path.exists(DB_PATH):
     os.makedirs(DB_PATH)
 
+# Test configs whose current version is kept compiled in each worker process,
+# and the alias of a cache in CACHES shared by all workers that keeps those
+# copies coherent. None invalidates only the process that made the change.
+TEST_CONFIG_CACHE_SIZE = 128
+TEST_CONFIG_CACHE_BACKEND = None
+
+# Pragmas run on every new SQLite connection by moduletrack.sqlite.
+# busy_timeout (ms) makes a writer wait for the lock instead of failing with
+# "database is locked". mmap_size is in bytes, a negative cache_size in KiB.
+# The journal mode is kept in the database file instead: switch it once, with
+# the site stopped, by running "manage.py sqlite_journal_mode wal" so pages
+# can be read while a test step is written. Unless set here, synchronous
+# follows that mode: NORMAL in WAL mode, FULL in rollback journal mode, where
+# NORMAL could corrupt the database on power loss.
+SQLITE_PRAGMAS = {
+    'busy_timeout': 20000,
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -32000,
+}
+
+# Directory the backup_database command writes its backups to
+BACKUP_DIR = BASE_DIR / 'db_backup'
+
 # Redirect after login
 LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/'
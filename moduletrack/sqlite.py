@@ -0,0 +1,77 @@
+import re
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+# Used when settings.SQLITE_PRAGMAS is not set
+DEFAULT_PRAGMAS = {
+    'busy_timeout': 20000,
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -32000,
+}
+
+PRAGMA_NAME = re.compile(r'^[a-z_]+$')
+PRAGMA_VALUE = re.compile(r'^-?[A-Za-z0-9_]+$')
+# Stored in the database file rather than set per connection; see set_journal_mode()
+PERSISTENT_PRAGMAS = {'journal_mode'}
+JOURNAL_MODES = ['wal', 'delete', 'truncate', 'persist']
+
+
+def sqlite_pragmas():
+    """The pragmas to run on new SQLite connections, checked to be plain names and values"""
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', DEFAULT_PRAGMAS)
+    for name, value in pragmas.items():
+        if name in PERSISTENT_PRAGMAS:
+            raise ImproperlyConfigured(f'{name} is stored in the database file; set it once with the '
+                                       f'sqlite_journal_mode command rather than in SQLITE_PRAGMAS.')
+        if not PRAGMA_NAME.match(name) or not PRAGMA_VALUE.match(str(value)):
+            raise ImproperlyConfigured(f'Invalid SQLite pragma in SQLITE_PRAGMAS: {name} = {value!r}')
+    return pragmas
+
+
+def default_synchronous(journal_mode):
+    """The synchronous setting that is safe against power loss in a journal mode.
+
+    NORMAL skips the sync at each commit, which only WAL mode can afford;
+    a rollback journal needs FULL.
+    """
+    return 'NORMAL' if journal_mode == 'wal' else 'FULL'
+
+
+def configure_connection(connection):
+    """Run the configured pragmas on an open SQLite connection, with synchronous following the journal mode unless set"""
+    pragmas = sqlite_pragmas()
+    with connection.cursor() as cursor:
+        if 'synchronous' not in pragmas:
+            cursor.execute('PRAGMA journal_mode')
+            pragmas = {'synchronous': default_synchronous(cursor.fetchone()[0]), **pragmas}
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+@receiver(connection_created, dispatch_uid='configure_sqlite_connection')
+def configure_sqlite_connection(sender, connection, **kwargs):
+    """Tune each new SQLite connection with the per-connection pragmas of SQLITE_PRAGMAS"""
+    if connection.vendor == 'sqlite':
+        configure_connection(connection)
+
+
+def set_journal_mode(connection, mode):
+    """Switch the database file of an SQLite connection to a journal mode and return the mode it is left in.
+
+    The journal mode is stored in the file, so it is set once rather than on
+    every connection. Leaving WAL mode needs every other connection to the
+    file closed, and raises OperationalError otherwise. Connections opened
+    afterwards pick the synchronous setting of the new mode.
+    """
+    if mode not in JOURNAL_MODES:
+        raise ValueError(f'Unknown journal mode "{mode}".')
+    with connection.cursor() as cursor:
+        cursor.execute(f'PRAGMA journal_mode = {mode}')
+        mode = cursor.fetchone()[0]
+        if 'synchronous' not in sqlite_pragmas():
+            cursor.execute(f'PRAGMA synchronous = {default_synchronous(mode)}')
+        return mode
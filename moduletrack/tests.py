@@ -0,0 +1,312 @@
+import gzip
+import io
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import closing
+from datetime import datetime, timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core import serializers
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.db.utils import load_backend
+from django.test import TestCase, override_settings
+
+from batch_app.models import Batch, Pcb
+from pcb_test_result_app.models import MeasurementResult, PcbTestResult, VoltageMeasurementResult
+from pcb_type_app.models import PcbType
+from test_config_type_app.models import TestConfigType
+from .backup import BackupError, apply_retention, create_backup, last_primary_keys, list_backups, verify_backup
+from .restore import restore_backup
+from .sqlite import configure_connection, set_journal_mode
+
+
+class BackupTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('technician', password='secret')
+        cls.batch = Batch.objects.create(name='Batch', pcb_type=PcbType.objects.create(name='Controller'),
+                                         test_config_type=TestConfigType.objects.create(name='Config'),
+                                         hardware_version='1.0')
+        cls.test_results = [
+            PcbTestResult.objects.create(pcb=Pcb.objects.create(serial_number=f'SN-{index}', batch=cls.batch),
+                                         technician=cls.user)
+            for index in range(3)
+        ]
+        for test_result in cls.test_results:
+            for value in (1.0, 2.0):
+                VoltageMeasurementResult.objects.create(test_result=test_result, parameter_name='V1',
+                                                        measured_value=value, min_value=0.0, max_value=5.0)
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def model_entry(self, manifest, label):
+        return next(entry for entry in manifest['models'] if entry['model'] == label)
+
+    def read_file(self, manifest, name):
+        with gzip.open(os.path.join(self.directory, manifest['id'], name), 'rt') as f:
+            return f.read()
+
+    def test_full_backup_chunks_load_with_their_checksums(self):
+        manifest = create_backup(self.directory, chunk_size=4)
+        self.assertEqual(manifest['kind'], 'full')
+        verify_backup(self.directory, manifest)
+        measurements = self.model_entry(manifest, 'pcb_test_result_app.measurementresult')
+        self.assertEqual((measurements['rows'], len(measurements['chunks'])), (6, 2))
+        objects = list(serializers.deserialize('json', self.read_file(manifest, measurements['chunks'][0]['file'])))
+        self.assertEqual(len(objects), 4)
+        self.assertNotIn('pcb_test_result_app.resultrollup', [entry['model'] for entry in manifest['models']])
+
+    def test_incremental_backup_holds_only_changes(self):
+        full = create_backup(self.directory)
+        VoltageMeasurementResult.objects.create(test_result=self.test_results[1], parameter_name='V2',
+                                                measured_value=3.0, min_value=0.0, max_value=5.0)
+        MeasurementResult.objects.filter(test_result=self.test_results[2]).first().delete()
+
+        # Without overlap, as every row here was written moments ago
+        incremental = create_backup(self.directory, overlap=timedelta(0))
+        self.assertEqual((incremental['kind'], incremental['base']), ('incremental', full['id']))
+        verify_backup(self.directory, incremental)
+        # The test results whose rows changed, with all of their rows
+        self.assertEqual(self.model_entry(incremental, 'pcb_test_result_app.pcbtestresult')['rows'], 2)
+        measurements = self.model_entry(incremental, 'pcb_test_result_app.measurementresult')
+        self.assertEqual(measurements['rows'], 4)
+        self.assertEqual(self.model_entry(incremental, 'batch_app.pcb')['rows'], 0)
+        live_ids = json.loads(self.read_file(incremental, measurements['live_ids']['file']))
+        self.assertEqual(sum(last - first + 1 for first, last in live_ids), MeasurementResult.objects.count())
+
+    def test_rows_committed_after_the_snapshot_are_in_the_next_backup(self):
+        full = create_backup(self.directory)
+        self.assertEqual(full['high_water'], PcbTestResult.objects.latest('updated_at').updated_at.isoformat())
+        # Stamped before the latest change the snapshot held but committed after it, like a write
+        # kept waiting for the lock
+        late = PcbTestResult.objects.create(pcb=Pcb.objects.create(serial_number='SN-late', batch=self.batch),
+                                            technician=self.user)
+        stamp = datetime.fromisoformat(full['high_water']) - timedelta(seconds=30)
+        PcbTestResult.objects.filter(pk=late.pk).update(updated_at=stamp)
+        Pcb.objects.filter(pk=late.pcb_id).update(updated_at=stamp)
+
+        incremental = create_backup(self.directory)
+        self.assertEqual(incremental['high_water'], full['high_water'])
+        test_results = self.model_entry(incremental, 'pcb_test_result_app.pcbtestresult')
+        rows = serializers.deserialize('json', self.read_file(incremental, test_results['chunks'][0]['file']))
+        self.assertIn(late.pk, [row.object.pk for row in rows])
+
+    def test_rows_added_during_a_backup_are_left_to_the_next_one(self):
+        added = []
+
+        def add_during_backup(models):
+            last_pks = last_primary_keys(models)
+            # Written once the bounds are read, while the tables are still being copied
+            test_result = PcbTestResult.objects.create(
+                pcb=Pcb.objects.create(serial_number='SN-during', batch=self.batch), technician=self.user)
+            added.append(VoltageMeasurementResult.objects.create(
+                test_result=test_result, parameter_name='V1', measured_value=1.0, min_value=0.0, max_value=5.0))
+            return last_pks
+
+        with mock.patch('moduletrack.backup.last_primary_keys', side_effect=add_during_backup):
+            full = create_backup(self.directory)
+        self.assertEqual(self.model_entry(full, 'batch_app.pcb')['rows'], 3)
+        self.assertEqual(self.model_entry(full, 'pcb_test_result_app.measurementresult')['rows'], 6)
+
+        incremental = create_backup(self.directory)
+        measurements = self.model_entry(incremental, 'pcb_test_result_app.measurementresult')
+        rows = serializers.deserialize('json', self.read_file(incremental, measurements['chunks'][0]['file']))
+        self.assertIn(added[0].pk, [row.object.pk for row in rows])
+
+    def test_corrupt_chunk_fails_verification(self):
+        manifest = create_backup(self.directory)
+        chunk = self.model_entry(manifest, 'batch_app.pcb')['chunks'][0]['file']
+        with open(os.path.join(self.directory, manifest['id'], chunk), 'ab') as f:
+            f.write(b'x')
+        with self.assertRaises(BackupError):
+            verify_backup(self.directory, manifest)
+
+    def test_retention_keeps_whole_chains(self):
+        ids = [create_backup(self.directory, full_every=2)['id'] for index in range(5)]
+        self.assertEqual([backup['kind'] for backup in list_backups(self.directory)],
+                         ['full', 'incremental', 'full', 'incremental', 'full'])
+        self.assertEqual(apply_retention(self.directory, keep_full=2), ids[:2])
+        self.assertEqual([backup['id'] for backup in list_backups(self.directory)], ids[2:])
+
+    def test_backup_command(self):
+        stdout = io.StringIO()
+        call_command('backup_database', dir=self.directory, git_commit='abc123', stdout=stdout)
+        self.assertIn('Created full backup', stdout.getvalue())
+        self.assertEqual(list_backups(self.directory)[0]['git_commit'], 'abc123')
+
+
+class RestoreTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('technician', password='secret')
+        cls.batch = Batch.objects.create(name='Batch', pcb_type=PcbType.objects.create(name='Controller'),
+                                         test_config_type=TestConfigType.objects.create(name='Config'),
+                                         hardware_version='1.0')
+        cls.test_results = [
+            PcbTestResult.objects.create(pcb=Pcb.objects.create(serial_number=f'SN-{index}', batch=cls.batch),
+                                         technician=cls.user)
+            for index in range(3)
+        ]
+        for test_result in cls.test_results:
+            VoltageMeasurementResult.objects.create(test_result=test_result, parameter_name='V1',
+                                                    measured_value=1.0, min_value=0.0, max_value=5.0)
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.database_path = os.path.join(self.directory, 'restored.sqlite3')
+
+    def query(self, sql):
+        with closing(sqlite3.connect(self.database_path)) as database:
+            return database.execute(sql).fetchall()
+
+    def test_restore_applies_the_incremental_chain(self):
+        create_backup(self.directory)
+        self.test_results[0].delete()
+        self.test_results[1].notes = 'Retested'
+        self.test_results[1].save()
+        User.objects.create_user('engineer')
+        create_backup(self.directory)
+
+        chain, rows = restore_backup(directory=self.directory, database_path=self.database_path)
+        self.assertEqual([manifest['kind'] for manifest in chain], ['full', 'incremental'])
+        self.assertEqual(self.query('SELECT COUNT(*) FROM pcb_test_result_app_pcbtestresult'), [(2,)])
+        self.assertEqual(self.query('SELECT COUNT(*) FROM pcb_test_result_app_measurementresult'), [(2,)])
+        self.assertEqual(self.query('SELECT COUNT(*) FROM auth_user'), [(2,)])
+        notes = self.query(f'SELECT notes FROM pcb_test_result_app_pcbtestresult WHERE id = {self.test_results[1].pk}')
+        self.assertEqual(notes, [('Retested',)])
+        # Timestamps are restored as backed up, not stamped with the restore time
+        created_at = self.query(f'SELECT created_at FROM batch_app_batch WHERE id = {self.batch.pk}')[0][0]
+        self.assertEqual(created_at[:19], self.batch.created_at.strftime('%Y-%m-%d %H:%M:%S'))
+        self.assertFalse(os.path.exists(f'{self.database_path}.restore'))
+
+    def test_restore_keeps_the_previous_database(self):
+        create_backup(self.directory)
+        with closing(sqlite3.connect(self.database_path)) as database:
+            database.execute('CREATE TABLE marker (id integer)')
+        restore_backup(directory=self.directory, database_path=self.database_path)
+        self.assertEqual(self.query("SELECT name FROM sqlite_master WHERE name = 'marker'"), [])
+        with closing(sqlite3.connect(f'{self.database_path}.pre-restore')) as database:
+            self.assertTrue(database.execute("SELECT name FROM sqlite_master WHERE name = 'marker'").fetchall())
+
+    def test_swap_waits_for_a_writer_and_leaves_no_stale_log(self):
+        create_backup(self.directory)
+        with closing(sqlite3.connect(self.database_path)) as database:
+            database.execute('PRAGMA journal_mode=WAL')
+            database.execute('CREATE TABLE marker (id integer)')
+        writer = sqlite3.connect(self.database_path, isolation_level=None, check_same_thread=False)
+        writer.execute('BEGIN IMMEDIATE')
+        writer.execute('INSERT INTO marker VALUES (1)')
+
+        finished = threading.Event()
+
+        def finish_writing():
+            time.sleep(0.3)
+            writer.execute('COMMIT')
+            writer.close()
+            finished.set()
+
+        thread = threading.Thread(target=finish_writing)
+        thread.start()
+        restore_backup(directory=self.directory, database_path=self.database_path)
+        self.assertTrue(finished.is_set())
+        thread.join()
+
+        # The write went into the old file before the swap, not into the log of the new one
+        with closing(sqlite3.connect(f'{self.database_path}.pre-restore')) as database:
+            self.assertEqual(database.execute('SELECT id FROM marker').fetchall(), [(1,)])
+        self.assertFalse(os.path.exists(f'{self.database_path}-wal'))
+        self.assertEqual(self.query('PRAGMA journal_mode'), [('wal',)])
+        self.assertEqual(self.query('PRAGMA integrity_check'), [('ok',)])
+        self.assertEqual(self.query("SELECT name FROM sqlite_master WHERE name = 'marker'"), [])
+        self.assertEqual(self.query('SELECT COUNT(*) FROM pcb_test_result_app_pcbtestresult'), [(3,)])
+
+    @mock.patch('moduletrack.restore.SWAP_LOCK_TIMEOUT', 0.2)
+    def test_database_in_use_is_not_swapped(self):
+        create_backup(self.directory)
+        with closing(sqlite3.connect(self.database_path)) as database:
+            database.execute('PRAGMA journal_mode=WAL')
+            database.execute('CREATE TABLE marker (id integer)')
+            with self.assertRaises(BackupError):
+                restore_backup(directory=self.directory, database_path=self.database_path)
+        self.assertTrue(self.query("SELECT name FROM sqlite_master WHERE name = 'marker'"))
+        self.assertFalse(os.path.exists(f'{self.database_path}.restore'))
+
+    def test_corrupt_backup_is_not_restored(self):
+        manifest = create_backup(self.directory)
+        pcbs = next(entry for entry in manifest['models'] if entry['model'] == 'batch_app.pcb')
+        chunk = pcbs['chunks'][0]['file']
+        with open(os.path.join(self.directory, manifest['id'], chunk), 'ab') as f:
+            f.write(b'x')
+        with self.assertRaises(BackupError):
+            restore_backup(directory=self.directory, database_path=self.database_path)
+        self.assertFalse(os.path.exists(self.database_path))
+
+
+class SqlitePragmaTests(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.settings_dict = {**connection.settings_dict, 'NAME': os.path.join(directory.name, 'tuned.sqlite3')}
+
+    def open_database(self, alias):
+        database = load_backend(self.settings_dict['ENGINE']).DatabaseWrapper(self.settings_dict, alias)
+        self.addCleanup(database.close)
+        return database
+
+    def test_new_connections_are_tuned_but_keep_the_journal_mode(self):
+        database = self.open_database('tuned')
+        with override_settings(SQLITE_PRAGMAS={'synchronous': 'NORMAL', 'busy_timeout': 1234}):
+            with database.cursor() as cursor:
+                self.assertEqual(cursor.execute('PRAGMA busy_timeout').fetchone(), (1234,))
+                self.assertEqual(cursor.execute('PRAGMA synchronous').fetchone(), (1,))
+                self.assertEqual(cursor.execute('PRAGMA journal_mode').fetchone(), ('delete',))
+
+    @override_settings(SQLITE_PRAGMAS={'busy_timeout': 100})
+    def test_synchronous_follows_the_journal_mode(self):
+        database = self.open_database('synchronous')
+        with database.cursor() as cursor:
+            # FULL is 2, NORMAL is 1
+            self.assertEqual(cursor.execute('PRAGMA synchronous').fetchone(), (2,))
+        set_journal_mode(database, 'wal')
+        database.close()
+        with database.cursor() as cursor:
+            self.assertEqual(cursor.execute('PRAGMA synchronous').fetchone(), (1,))
+
+    def test_invalid_pragma_is_rejected(self):
+        with override_settings(SQLITE_PRAGMAS={'busy_timeout': '1; DROP TABLE auth_user'}):
+            with self.assertRaises(ImproperlyConfigured):
+                configure_connection(connection)
+        with override_settings(SQLITE_PRAGMAS={'journal_mode': 'WAL'}):
+            with self.assertRaises(ImproperlyConfigured):
+                configure_connection(connection)
+
+    @override_settings(SQLITE_PRAGMAS={'busy_timeout': 100})
+    def test_journal_mode_command(self):
+        database = self.open_database('journal')
+        connections['journal'] = database
+        self.addCleanup(connections.__delitem__, 'journal')
+        stdout = io.StringIO()
+        call_command('sqlite_journal_mode', 'wal', database='journal', stdout=stdout)
+        self.assertIn('Switched the journal mode to wal', stdout.getvalue())
+        with closing(sqlite3.connect(self.settings_dict['NAME'])) as other:
+            # Leaving WAL mode needs the other connections closed
+            other.execute('SELECT 1 FROM sqlite_master').fetchall()
+            with self.assertRaises(CommandError):
+                call_command('sqlite_journal_mode', 'delete', database='journal', stdout=io.StringIO())
+        call_command('sqlite_journal_mode', database='journal', stdout=stdout)
+        self.assertIn('Journal mode: wal', stdout.getvalue())
@@ -7,11 +7,37 @@ from django.db import transaction
 from django.contrib import messages
 from django.contrib.admin.utils import NestedObjects
 from django.db import connection
+from django.utils import timezone
 import operator
 
+from batch_app.models import Batch
+from pcb_test_result_app.models import ResultRollup
+from pcb_test_result_app.rollups import bucket_start, daily_rollups
+
+
+DASHBOARD_DAYS = 7  # Days of test results summarised on the home page
+DASHBOARD_BATCHES = 10  # Busiest batches of the day listed on the home page
+
 
 def home(request):
-    return render(request, 'home.html')
+    context = {}
+    if request.user.has_perm('pcb_test_result_app.view_pcbtestresult'):
+        # Read from the rollup tables, so the cost does not grow with the number of results
+        days = list(daily_rollups(days=DASHBOARD_DAYS))
+        today = bucket_start(timezone.now(), ResultRollup.DAY)
+        batch_rollups = list(
+            daily_rollups(ResultRollup.BATCH, days=1).filter(tested__gt=0).order_by('-tested')[:DASHBOARD_BATCHES]
+        )
+        batch_names = dict(Batch.objects.filter(pk__in=[rollup.key_id for rollup in batch_rollups]).values_list('pk', 'name'))
+        for rollup in batch_rollups:
+            rollup.batch_name = batch_names.get(rollup.key_id, f'Batch {rollup.key_id}')
+        context = {
+            'dashboard': True,
+            'today': next((rollup for rollup in days if rollup.bucket_start == today), None),
+            'days': days,
+            'batch_rollups': batch_rollups,
+        }
+    return render(request, 'home.html', context)
 
 def register(request):
     if request.method == 'POST':
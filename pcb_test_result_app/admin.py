@@ -1,6 +1,7 @@
 from django.contrib import admin
 from .models import (
     PcbTestResult, 
+    MeasurementResult, 
     VoltageMeasurementResult, 
     CurrentMeasurementResult, 
     ResistanceMeasurementResult, 
@@ -15,7 +16,14 @@ class PcbTestResultAdmin(admin.ModelAdmin):
     list_display = ('pcb', 'technician', 'result', 'test_date', 'created_at')
     list_filter = ('result', 'test_date', 'technician')
     search_fields = ('pcb__serial_number', 'technician__username', 'notes')
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('total_steps', 'passed_steps', 'failed_steps', 'first_failed_step', 'created_at', 'updated_at')
+
+@admin.register(MeasurementResult)
+class MeasurementResultAdmin(admin.ModelAdmin):
+    list_display = ('test_result', 'kind', 'parameter_name', 'measured_value', 'unit', 'passed', 'created_at')
+    list_filter = ('kind', 'passed', 'created_at')
+    search_fields = ('parameter_name', 'test_result__pcb__serial_number')
+    readonly_fields = ('created_at',)
 
 @admin.register(VoltageMeasurementResult)
 class VoltageMeasurementResultAdmin(admin.ModelAdmin):
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class PcbTestResultAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'pcb_test_result_app'
+    
+    def ready(self):
+        import pcb_test_result_app.signals  # Keep the result summary counters up to date
@@ -0,0 +1,142 @@
+from django.db import transaction
+
+from .models import InstructionResult, MeasurementResult, YesNoQuestionResult
+from .signals import suspend_counter_refresh
+from .spc import reset_spc_statistics
+from .summary import refresh_result_counters
+
+
+# Form field prefix of each measurement kind on the update page
+MEASUREMENT_PREFIXES = {
+    'voltage': MeasurementResult.VOLTAGE,
+    'current': MeasurementResult.CURRENT,
+    'resistance': MeasurementResult.RESISTANCE,
+    'frequency': MeasurementResult.FREQUENCY,
+}
+TRUE_STRINGS = {'true', 'True', '1', 'on'}
+
+
+def _number(post_data, name):
+    value = post_data.get(name, '')
+    try:
+        return float(value)
+    except ValueError:
+        raise ValueError(f'"{value}" is not a valid number.')
+
+
+def _measurement_values(post_data, prefix, i):
+    measured_value = _number(post_data, f'{prefix}_measured_{i}')
+    min_value = _number(post_data, f'{prefix}_min_{i}')
+    max_value = _number(post_data, f'{prefix}_max_{i}')
+    return {
+        'parameter_name': post_data.get(f'{prefix}_param_name_{i}', ''),
+        'measured_value': measured_value,
+        'unit': post_data.get(f'{prefix}_unit_{i}') or MeasurementResult.DEFAULT_UNITS[MEASUREMENT_PREFIXES[prefix]],
+        'min_value': min_value,
+        'max_value': max_value,
+        'passed': min_value <= measured_value <= max_value,
+    }
+
+
+def _question_values(post_data, prefix, i):
+    user_answer = post_data.get(f'{prefix}_user_answer_{i}') in TRUE_STRINGS
+    required_answer = post_data.get(f'{prefix}_required_{i}') in TRUE_STRINGS
+    return {
+        'question_text': post_data.get(f'{prefix}_text_{i}', ''),
+        'user_answer': user_answer,
+        'required_answer': required_answer,
+        'passed': user_answer == required_answer,
+    }
+
+
+def _instruction_values(post_data, prefix, i):
+    return {
+        'instruction_text': post_data.get(f'{prefix}_text_{i}', ''),
+        'acknowledged': post_data.get(f'{prefix}_acknowledged_{i}') in TRUE_STRINGS,
+    }
+
+
+class _TableChanges:
+    """Rows of one result table to create, update and delete"""
+
+    def __init__(self, model, fields):
+        self.model = model
+        self.fields = fields
+        self.created = []
+        self.updated = []
+        self.deleted = []
+
+    def stage(self, existing, post_data, prefix, read_values, test_result, **new_values):
+        """Diff the submitted rows of one form category against the stored ones"""
+        if f'{prefix}_count' not in post_data:
+            # Category not on the form: leave its rows alone
+            return
+        count = int(post_data[f'{prefix}_count'])
+        kept = set()
+        for i in range(count):
+            if post_data.get(f'{prefix}_delete_{i}'):
+                continue
+            values = read_values(post_data, prefix, i)
+            row_id = post_data.get(f'{prefix}_id_{i}')
+            if not row_id:
+                self.created.append(self.model(test_result=test_result, **new_values, **values))
+                continue
+            row = existing.get(int(row_id))
+            if row is None:
+                raise ValueError(f'Result row {row_id} does not belong to this test result.')
+            kept.add(row.pk)
+            if any(getattr(row, field) != value for field, value in values.items()):
+                for field, value in values.items():
+                    setattr(row, field, value)
+                self.updated.append(row)
+        self.deleted.extend(pk for pk in existing if pk not in kept)
+
+    def save(self):
+        if self.deleted:
+            self.model.objects.filter(pk__in=self.deleted).delete()
+        if self.updated:
+            self.model.objects.bulk_update(self.updated, self.fields)
+        if self.created:
+            self.model.objects.bulk_create(self.created)
+
+
+def apply_result_edits(test_result, post_data):
+    """Apply the result rows submitted on the update page to a test result.
+
+    Each submitted row carries the id of the stored row it edits; rows without
+    an id are added and stored rows missing from a submitted category, or
+    marked for deletion, are removed. Only changed rows are written, with one
+    statement per table and kind of change, inside a single transaction.
+    Raises ValueError for a row that cannot be read, leaving everything as it was.
+    """
+    measurements = MeasurementResult.objects.filter(test_result=test_result)
+    existing_measurements = {}
+    for row in measurements:
+        existing_measurements.setdefault(row.kind, {})[row.pk] = row
+
+    measurement_changes = _TableChanges(
+        MeasurementResult, ['parameter_name', 'measured_value', 'unit', 'min_value', 'max_value', 'passed']
+    )
+    for prefix, kind in MEASUREMENT_PREFIXES.items():
+        measurement_changes.stage(existing_measurements.get(kind, {}), post_data, prefix,
+                                  _measurement_values, test_result, kind=kind)
+
+    question_changes = _TableChanges(YesNoQuestionResult, ['question_text', 'user_answer', 'required_answer', 'passed'])
+    question_changes.stage({row.pk: row for row in test_result.yes_no_questions.all()},
+                           post_data, 'question', _question_values, test_result)
+
+    instruction_changes = _TableChanges(InstructionResult, ['instruction_text', 'acknowledged'])
+    instruction_changes.stage({row.pk: row for row in test_result.instructions.all()},
+                              post_data, 'instruction', _instruction_values, test_result)
+
+    changes = [measurement_changes, question_changes, instruction_changes]
+    if not any(change.created or change.updated or change.deleted for change in changes):
+        return
+
+    with transaction.atomic(), suspend_counter_refresh():
+        for change in changes:
+            change.save()
+        refresh_result_counters(test_result.pk)
+        if measurement_changes.updated:
+            # bulk_update sends no signals; changed values must be recounted
+            reset_spc_statistics(test_result.pk)
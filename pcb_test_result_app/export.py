@@ -0,0 +1,158 @@
+import itertools
+import os
+from datetime import datetime
+
+from django.db import transaction
+from django.db.models import Max
+
+from moduletrack.backup import live_id_ranges
+from .models import MeasurementResult, PcbTestResult
+
+
+EXPORT_CHUNK_SIZE = 100000  # Measurements per row group / record batch
+EXPORT_FORMATS = {'.parquet': 'parquet', '.arrow': 'arrow', '.feather': 'arrow', '.ipc': 'arrow'}
+
+# (column name, lookup from MeasurementResult, Arrow type name)
+EXPORT_COLUMNS = [
+    ('measurement_id', 'pk', 'int64'),
+    ('test_result_id', 'test_result_id', 'int64'),
+    ('serial_number', 'test_result__pcb__serial_number', 'string'),
+    ('batch', 'test_result__pcb__batch__name', 'string'),
+    ('pcb_type', 'test_result__pcb__batch__pcb_type__name', 'string'),
+    ('test_config', 'test_result__pcb__batch__test_config_type__name', 'string'),
+    ('hardware_version', 'test_result__pcb__batch__hardware_version', 'string'),
+    ('test_date', 'test_result__test_date', 'timestamp'),
+    ('result', 'test_result__result', 'string'),
+    ('kind', 'kind', 'string'),
+    ('parameter_name', 'parameter_name', 'string'),
+    ('measured_value', 'measured_value', 'float64'),
+    ('unit', 'unit', 'string'),
+    ('min_value', 'min_value', 'float64'),
+    ('max_value', 'max_value', 'float64'),
+    ('passed', 'passed', 'bool'),
+    ('created_at', 'created_at', 'timestamp'),
+    ('deleted', None, 'bool'),  # Set on the rows standing for measurements deleted since the previous export
+]
+EXPORT_LOOKUPS = [lookup for name, lookup, type_name in EXPORT_COLUMNS if lookup]
+
+
+def export_format(path, requested=None):
+    """The export format named, or implied by the file extension of path"""
+    if requested:
+        return requested
+    return EXPORT_FORMATS.get(os.path.splitext(path)[1].lower())
+
+
+def export_schema():
+    import pyarrow as pa
+
+    types = {
+        'int64': pa.int64(),
+        'string': pa.string(),
+        'float64': pa.float64(),
+        'bool': pa.bool_(),
+        'timestamp': pa.timestamp('us', tz='UTC'),
+    }
+    return pa.schema([pa.field(name, types[type_name]) for name, lookup, type_name in EXPORT_COLUMNS])
+
+
+def removed_ids(previous_ranges, current_ranges):
+    """The ids in previous_ranges missing from current_ranges, both sorted [[first, last], ...] runs"""
+    removed = []
+    index = 0
+    for first, last in previous_ranges:
+        while index < len(current_ranges) and current_ranges[index][1] < first:
+            index += 1
+        start = first
+        position = index
+        while start <= last:
+            if position < len(current_ranges) and current_ranges[position][0] <= last:
+                current_first, current_last = current_ranges[position]
+                removed.extend(range(start, min(current_first, last + 1)))
+                start = max(start, current_last + 1)
+                position += 1
+            else:
+                removed.extend(range(start, last + 1))
+                break
+    return removed
+
+
+def measurement_chunks(since=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield lists of export rows of the measurements changed after since, in primary key order.
+
+    Writing, editing or deleting a result row refreshes the counters of its
+    test result, which sets the test result's updated_at, so every
+    measurement of a changed test result is exported again. Each chunk is a
+    separate keyset query on the primary key, so memory is bounded by the
+    chunk size however many measurements there are.
+    """
+    rows = MeasurementResult.objects.order_by('pk').values_list(*EXPORT_LOOKUPS)
+    if since is not None:
+        rows = rows.filter(test_result__in=PcbTestResult.objects.filter(updated_at__gt=since).values('pk'))
+    last_id = 0
+    while True:
+        chunk = list(rows.filter(pk__gt=last_id)[:chunk_size])
+        if not chunk:
+            return
+        last_id = chunk[-1][0]
+        yield [row + (False,) for row in chunk]
+
+
+def tombstone_chunks(measurement_ids, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield lists of export rows holding only the id and the deleted flag of deleted measurements"""
+    blank = (None,) * (len(EXPORT_COLUMNS) - 2)
+    for start in range(0, len(measurement_ids), chunk_size):
+        yield [(measurement_id, *blank, True) for measurement_id in measurement_ids[start:start + chunk_size]]
+
+
+def export_measurements(path, file_format, watermark=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Write the measurements changed since a watermark, joined with their board details, to path.
+
+    Without a watermark every measurement is written. With one, the
+    measurements of test results changed after its time are written
+    again, and each measurement deleted since is written as a row with only
+    its id and deleted set; readers keep the last row of each measurement_id.
+    file_format is 'parquet' (one row group per chunk) or 'arrow' (the
+    Arrow IPC file format, one record batch per chunk). The file is written
+    next to path and moved into place once complete, and nothing is written
+    when nothing changed. Returns (rows written, watermark of the next
+    incremental export).
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    since = datetime.fromisoformat(watermark['since']) if watermark else None
+    schema = export_schema()
+    partial_path = f'{path}.partial'
+    written = 0
+    if file_format == 'parquet':
+        writer = pq.ParquetWriter(partial_path, schema, compression='zstd')
+    else:
+        writer = pa.ipc.new_file(partial_path, schema)
+    try:
+        # One read transaction, so the watermark is read from the same snapshot as the rows written
+        with transaction.atomic():
+            high_water = PcbTestResult.objects.aggregate(high_water=Max('updated_at'))['high_water']
+            live_ids = live_id_ranges(MeasurementResult)
+            chunks = measurement_chunks(since, chunk_size)
+            if watermark:
+                deleted = removed_ids(watermark['live_ids'], live_ids)
+                chunks = itertools.chain(chunks, tombstone_chunks(deleted, chunk_size))
+            for chunk in chunks:
+                columns = [pa.array(values, type=field.type) for values, field in zip(zip(*chunk), schema)]
+                batch = pa.RecordBatch.from_arrays(columns, schema=schema)
+                if file_format == 'parquet':
+                    writer.write_batch(batch, row_group_size=len(chunk))
+                else:
+                    writer.write_batch(batch)
+                written += len(chunk)
+    except BaseException:
+        writer.close()
+        os.remove(partial_path)
+        raise
+    writer.close()
+    if not written:
+        os.remove(partial_path)
+        return 0, watermark
+    os.replace(partial_path, path)
+    return written, {'since': (high_water or since).isoformat(), 'live_ids': live_ids}
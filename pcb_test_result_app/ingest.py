@@ -0,0 +1,162 @@
+from django.db import transaction
+
+from test_config_type_app.config_cache import cached_version
+from .models import InstructionResult, MeasurementResult, PcbTestResult, YesNoQuestionResult
+from .rollups import refresh_result_rollups
+from .spc import refresh_result_spc
+from .summary import refresh_result_counters
+
+
+MAX_READINGS_PER_RUN = 1000  # Readings accepted in one posted test run
+TRUE_STRINGS = {'true', '1', 'yes'}
+
+
+class IngestError(ValueError):
+    """A posted test run or reading that cannot be recorded"""
+
+    def __init__(self, errors):
+        self.errors = errors if isinstance(errors, list) else [errors]
+        super().__init__('; '.join(self.errors))
+
+
+def _is_true(value):
+    """Read a JSON boolean, 0/1 or a "true"/"yes" string"""
+    if isinstance(value, str):
+        return value.lower() in TRUE_STRINGS
+    return value is True or (type(value) is int and value == 1)
+
+
+def _within_limits(value, step):
+    """True when value lies within the step limits; a missing limit is open"""
+    return ((step.min_value is None or value >= step.min_value) and
+            (step.max_value is None or value <= step.max_value))
+
+
+def grade_reading(test_result, step, reading):
+    """Build the unsaved result row for one reading of a compiled version step.
+
+    The pass/fail decision is made in memory from the step limits, the same
+    way pcb_test_execute_steps grades a step submitted by a technician.
+    """
+    if step.step_type in MeasurementResult.DEFAULT_UNITS:
+        try:
+            measured_value = float(reading['value'])
+        except (KeyError, TypeError, ValueError):
+            raise IngestError(f'Step {step.id} needs a numeric "value".')
+        return MeasurementResult(
+            test_result=test_result,
+            test_step_id=step.id,
+            kind=step.step_type,
+            parameter_name=step.parameter_name,
+            measured_value=measured_value,
+            unit=step.unit or MeasurementResult.DEFAULT_UNITS[step.step_type],
+            min_value=step.min_value,
+            max_value=step.max_value,
+            passed=_within_limits(measured_value, step),
+        )
+    if step.step_type == 'QUESTION':
+        if 'answer' not in reading:
+            raise IngestError(f'Step {step.id} needs an "answer".')
+        user_answer = _is_true(reading['answer'])
+        return YesNoQuestionResult(
+            test_result=test_result,
+            test_step_id=step.id,
+            question_text=step.question_text,
+            user_answer=user_answer,
+            required_answer=step.required_answer,
+            passed=user_answer == step.required_answer,
+        )
+    return InstructionResult(
+        test_result=test_result,
+        test_step_id=step.id,
+        instruction_text=step.instruction_text,
+        acknowledged=_is_true(reading.get('acknowledged', True)),
+    )
+
+
+def is_failure(step_result):
+    """True when a graded result row counts as a failed step"""
+    if isinstance(step_result, InstructionResult):
+        return not step_result.acknowledged
+    return not step_result.passed
+
+
+def set_run_outcome(test_result, steps, recorded, failed):
+    """Set the result and step cursor of a run from the step ids it recorded.
+
+    The run is finished once every step has a reading; otherwise it stays
+    incomplete and continues at the first step without one.
+    """
+    missing = sorted(step.order for step in steps.values() if step.id not in recorded)
+    if missing:
+        test_result.result = PcbTestResult.INCOMPLETE
+        test_result.next_step_order = missing[0]
+    else:
+        test_result.result = PcbTestResult.FAILED if failed else PcbTestResult.PASSED
+        test_result.next_step_order = max(step.order for step in steps.values()) + 1
+
+
+def step_id(reading):
+    """The integer step id of a reading, or None"""
+    try:
+        return int(reading['step_id'])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def save_step_results(step_results):
+    """Insert graded result rows with one bulk_create per result table"""
+    for model in (MeasurementResult, YesNoQuestionResult, InstructionResult):
+        rows = [row for row in step_results if type(row) is model]
+        if rows:
+            model.objects.bulk_create(rows)
+
+
+def ingest_test_run(pcb, technician, readings, notes=''):
+    """Record a complete fixture test run for a PCB and return its PcbTestResult.
+
+    readings is a list of {"step_id": ..., "value" | "answer" | "acknowledged": ...}.
+    Every reading is validated and graded before anything is written; the
+    result and its rows are then inserted in one transaction, so a rejected
+    run leaves nothing behind. Raises IngestError listing every problem found.
+    """
+    if not isinstance(readings, list) or not readings:
+        raise IngestError('"readings" must be a non-empty list.')
+    if len(readings) > MAX_READINGS_PER_RUN:
+        raise IngestError(f'A test run is limited to {MAX_READINGS_PER_RUN} readings.')
+
+    # All reads happen before the transaction, so it only ever takes the write lock
+    version, compiled = cached_version(pcb.batch.test_config_type)
+    steps = compiled.by_id
+    test_result = PcbTestResult(pcb=pcb, technician=technician, config_version=version, notes=notes or None)
+
+    errors = []
+    step_results = []
+    recorded = set()
+    for index, reading in enumerate(readings):
+        step = steps.get(step_id(reading))
+        if step is None:
+            errors.append(f'Reading {index}: unknown "step_id" for this PCB\'s test configuration.')
+        elif step.id in recorded:
+            errors.append(f'Reading {index}: step {step.id} was already given.')
+        else:
+            try:
+                step_results.append(grade_reading(test_result, step, reading))
+                recorded.add(step.id)
+            except IngestError as e:
+                errors.append(f'Reading {index}: {e}')
+    if errors:
+        raise IngestError(errors)
+
+    set_run_outcome(test_result, steps, recorded, any(map(is_failure, step_results)))
+
+    with transaction.atomic():
+        test_result.save()
+        save_step_results(step_results)
+        # bulk_create does not send the signals that keep the counters current
+        refresh_result_counters(test_result.pk)
+    test_result.refresh_from_db(fields=PcbTestResult.COUNTER_FIELDS)
+    if test_result.result != PcbTestResult.INCOMPLETE:
+        refresh_result_rollups([test_result])
+    refresh_result_spc([test_result])
+    return test_result
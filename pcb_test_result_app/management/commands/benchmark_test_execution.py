@@ -0,0 +1,278 @@
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import closing, contextmanager
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.models import Permission, User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+from django.db.utils import load_backend
+from django.test import Client
+from django.urls import reverse
+from django.utils.crypto import get_random_string
+
+from batch_app.models import Batch, Pcb
+from moduletrack.sqlite import JOURNAL_MODES, PERSISTENT_PRAGMAS, set_journal_mode
+from pcb_test_result_app.models import PcbTestResult
+from pcb_test_result_app.rollups import refresh_result_rollups
+from pcb_type_app.models import PcbType
+from test_config_type_app.models import TestConfigType, TestStep
+from test_config_type_app.versions import publish_version
+
+
+# Step types cycled through by the benchmark config, with the POST data that passes them
+STEP_TYPES = ['VOLTAGE', 'QUESTION', 'CURRENT', 'INSTRUCTION']
+
+
+def step_data(step):
+    """POST data submitting a passing result for a step"""
+    data = {'step_id': step.id}
+    if step.step_type == 'QUESTION':
+        data['user_answer'] = 'true' if step.required_answer else 'false'
+    elif step.step_type != 'INSTRUCTION':
+        data['measured_value'] = (step.min_value + step.max_value) / 2
+    return data
+
+
+def copy_database(path):
+    """Copy the default SQLite database to a new file at path with SQLite's backup API"""
+    connection = connections[DEFAULT_DB_ALIAS]
+    connection.ensure_connection()
+    with closing(sqlite3.connect(path)) as target:
+        connection.connection.backup(target)
+
+
+@contextmanager
+def database_file(path):
+    """Point the default database at another SQLite file, in this thread and in the threads it starts"""
+    settings_dict = connections.settings[DEFAULT_DB_ALIAS]
+    original = connections[DEFAULT_DB_ALIAS]
+    # New threads open their connections from these settings
+    connections.settings[DEFAULT_DB_ALIAS] = {**settings_dict, 'NAME': path}
+    connection = load_backend(settings_dict['ENGINE']).DatabaseWrapper(
+        connections.settings[DEFAULT_DB_ALIAS], DEFAULT_DB_ALIAS
+    )
+    connections[DEFAULT_DB_ALIAS] = connection
+    try:
+        yield connection
+    finally:
+        connection.close()
+        connections[DEFAULT_DB_ALIAS] = original
+        connections.settings[DEFAULT_DB_ALIAS] = settings_dict
+
+
+class Technician(threading.Thread):
+    """Tests a list of boards through the execute and complete views, timing each request"""
+
+    def __init__(self, client, pcbs, steps, start_barrier):
+        super().__init__()
+        self.client = client
+        self.pcbs = pcbs
+        self.steps = steps
+        self.start_barrier = start_barrier
+        self.latencies = {'start': [], 'step': [], 'complete': []}
+        self.lock_errors = 0
+        self.errors = []
+
+    def record_error(self, error):
+        if isinstance(error, OperationalError) and 'locked' in str(error):
+            self.lock_errors += 1
+        else:
+            self.errors.append(f'{type(error).__name__}: {error}')
+
+    def request(self, kind, path, data=None):
+        """Time one request; returns False when it failed"""
+        started = time.perf_counter()
+        try:
+            if data is None:
+                response = self.client.get(path)
+            else:
+                response = self.client.post(path, data)
+        except Exception as e:
+            self.record_error(e)
+            return False
+        self.latencies[kind].append(time.perf_counter() - started)
+        if response.status_code >= 400:
+            self.errors.append(f'{path} returned {response.status_code}')
+            return False
+        return True
+
+    def test_board(self, pcb):
+        execute_url = reverse('pcb_test_execute_steps', args=[pcb.pk])
+        if not self.request('start', execute_url):
+            return
+        test_result_id = self.client.session['current_test_result_id']
+        for step in self.steps:
+            if not self.request('step', execute_url, step_data(step)):
+                return
+        self.request('complete', reverse('pcb_test_result_complete', args=[test_result_id]), {})
+
+    def run(self):
+        self.start_barrier.wait()
+        try:
+            for pcb in self.pcbs:
+                self.test_board(pcb)
+                if 'current_test_result_id' in self.client.session:
+                    # A request failed part way; start the next board afresh
+                    session = self.client.session
+                    del session['current_test_result_id']
+                    session.save()
+        except Exception as e:
+            # Failed while resetting the session; this technician gives up
+            self.record_error(e)
+        finally:
+            connections.close_all()
+
+
+class Command(BaseCommand):
+    help = (
+        'Simulate technicians testing boards at the same time through the test execution views, and report '
+        'request latencies and "database is locked" errors. Runs against a scratch copy of the database, '
+        'or against the SQLite file given with --database, from which the boards, results and users it '
+        'created are removed unless --keep is given.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--technicians', type=int, default=8, help='Technicians testing at the same time')
+        parser.add_argument('--boards', type=int, default=5, help='Boards each technician tests')
+        parser.add_argument('--steps', type=int, default=20, help='Steps in the benchmark test config')
+        parser.add_argument('--pragma', action='append', default=[], metavar='NAME=VALUE',
+                            help='Override one of the SQLITE_PRAGMAS for this run; may be repeated')
+        parser.add_argument('--journal-mode', choices=JOURNAL_MODES,
+                            help='Switch the database file to this journal mode first (default: as copied)')
+        parser.add_argument('--database', metavar='PATH',
+                            help='SQLite file to run against instead of a scratch copy of the database')
+        parser.add_argument('--keep', action='store_true',
+                            help='With --database, keep the created boards, results and users')
+
+    def handle(self, *args, **options):
+        if min(options['technicians'], options['boards'], options['steps']) < 1:
+            raise CommandError('--technicians, --boards and --steps must be at least 1.')
+        if connections[DEFAULT_DB_ALIAS].vendor != 'sqlite':
+            raise CommandError('The benchmark runs against SQLite databases only.')
+        if options['database'] and not os.path.isfile(options['database']):
+            raise CommandError(f'"{options["database"]}" is not an SQLite database file.')
+        if options['pragma']:
+            pragmas = dict(getattr(settings, 'SQLITE_PRAGMAS', {}))
+            for pragma in options['pragma']:
+                name, separator, value = pragma.partition('=')
+                if not separator:
+                    raise CommandError(f'Invalid pragma "{pragma}", expected NAME=VALUE.')
+                if name.strip() in PERSISTENT_PRAGMAS:
+                    raise CommandError(f'Use --journal-mode rather than --pragma {name.strip()}.')
+                pragmas[name.strip()] = value.strip()
+            settings.SQLITE_PRAGMAS = pragmas
+        # The test client sends requests for this host
+        if 'testserver' not in settings.ALLOWED_HOSTS:
+            settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, 'testserver']
+
+        if options['database']:
+            self.benchmark(options['database'], options, cleanup=not options['keep'])
+            return
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'benchmark.sqlite3')
+            self.stdout.write('Copying the database to a scratch file')
+            copy_database(path)
+            # The scratch file is thrown away, fixture and all
+            self.benchmark(path, options, cleanup=False)
+
+    def benchmark(self, path, options, cleanup):
+        with database_file(path) as connection:
+            if options['journal_mode']:
+                try:
+                    set_journal_mode(connection, options['journal_mode'])
+                except OperationalError as e:
+                    raise CommandError(f'Could not switch to {options["journal_mode"]} ({e}).')
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode')
+                journal_mode = cursor.fetchone()[0]
+            self.stdout.write(f'Journal mode: {journal_mode}')
+
+            fixture = self.create_fixture(options['technicians'], options['boards'], options['steps'])
+            try:
+                technicians, elapsed = self.run_technicians(*fixture)
+            finally:
+                if cleanup:
+                    self.delete_fixture(*fixture)
+        self.report(technicians, elapsed)
+
+    def create_fixture(self, technician_count, board_count, step_count):
+        """A config with step_count steps, a batch of boards and technician_count users allowed to test"""
+        label = f'Benchmark {get_random_string(8)}'
+        test_config = TestConfigType.objects.create(name=label)
+        TestStep.objects.bulk_create([
+            TestStep(test_config=test_config, step_type=step_type, order=(index + 1) * TestStep.ORDER_GAP,
+                     parameter_name=f'P{index}', min_value=1.0, max_value=2.0, unit='V',
+                     question_text=f'Question {index}?', instruction_text=f'Instruction {index}')
+            for index, step_type in enumerate(STEP_TYPES[index % len(STEP_TYPES)] for index in range(step_count))
+        ])
+        publish_version(test_config)
+        steps = list(test_config.steps.order_by('order'))
+
+        pcb_type = PcbType.objects.create(name=label)
+        batch = Batch.objects.create(name=label, pcb_type=pcb_type, test_config_type=test_config,
+                                     hardware_version='1.0')
+        pcbs = Pcb.objects.bulk_create([
+            Pcb(serial_number=f'{label}-{index:05d}', batch=batch)
+            for index in range(technician_count * board_count)
+        ])
+        permission = Permission.objects.get(content_type__app_label='pcb_test_result_app', codename='add_pcbtestresult')
+        users = []
+        for index in range(technician_count):
+            user = User.objects.create_user(f'{label.lower().replace(" ", "_")}_{index}')
+            user.user_permissions.add(permission)
+            users.append(user)
+        return test_config, pcb_type, users, [pcbs[index::technician_count] for index in range(technician_count)], steps
+
+    def run_technicians(self, test_config, pcb_type, users, boards, steps):
+        clients = []
+        for user in users:
+            clients.append(Client())
+            clients[-1].force_login(user)
+        # Each thread opens its own connection; this one would otherwise hold a read snapshot open
+        connections.close_all()
+        start_barrier = threading.Barrier(len(users))
+        technicians = [Technician(client, pcbs, steps, start_barrier) for client, pcbs in zip(clients, boards)]
+        # Failed requests are counted in the report rather than logged with a traceback each
+        request_logger = logging.getLogger('django.request')
+        level = request_logger.level
+        request_logger.setLevel(logging.CRITICAL)
+        started = time.perf_counter()
+        try:
+            for technician in technicians:
+                technician.start()
+            for technician in technicians:
+                technician.join()
+        finally:
+            request_logger.setLevel(level)
+        return technicians, time.perf_counter() - started
+
+    def delete_fixture(self, test_config, pcb_type, users, boards, steps):
+        test_results = list(PcbTestResult.objects.filter(technician__in=users).select_related('pcb__batch'))
+        for user in users:
+            user.delete()
+        pcb_type.delete()
+        test_config.delete()
+        # Recount the dashboard rollups the deleted results were counted in
+        refresh_result_rollups(test_results)
+
+    def report(self, technicians, elapsed):
+        for kind in ('start', 'step', 'complete'):
+            latencies = np.array([latency for technician in technicians for latency in technician.latencies[kind]])
+            if len(latencies):
+                p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+                self.stdout.write(f'{kind:>8}: {len(latencies)} requests, p50 {p50:.1f} ms, p99 {p99:.1f} ms, '
+                                  f'max {latencies.max() * 1000:.1f} ms')
+        requests = sum(len(latencies) for technician in technicians for latencies in technician.latencies.values())
+        lock_errors = sum(technician.lock_errors for technician in technicians)
+        errors = [error for technician in technicians for error in technician.errors]
+        self.stdout.write(f'{requests} requests in {elapsed:.2f} s ({requests / elapsed:.0f} requests/s)')
+        for error in errors[:10]:
+            self.stdout.write(self.style.WARNING(error))
+        style = self.style.SUCCESS if not lock_errors and not errors else self.style.ERROR
+        self.stdout.write(style(f'{lock_errors} "database is locked" error(s), {len(errors)} other error(s)'))
@@ -0,0 +1,69 @@
+import json
+import os
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from pcb_test_result_app.export import EXPORT_CHUNK_SIZE, export_format, export_measurements
+
+
+def read_watermark(path):
+    """The watermark stored by the previous export, None when there is none yet"""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            watermark = json.load(f)
+        datetime.fromisoformat(watermark['since'])
+        if not all(len(ids) == 2 for ids in watermark['live_ids']):
+            raise ValueError
+    except (ValueError, KeyError, TypeError):
+        raise CommandError(f'Invalid watermark file "{path}".')
+    return watermark
+
+
+def write_watermark(path, watermark):
+    with open(f'{path}.partial', 'w') as f:
+        json.dump(watermark, f)
+    os.replace(f'{path}.partial', path)
+
+
+class Command(BaseCommand):
+    help = ('Export measurements with their serial number, batch, PCB type, test config and hardware '
+            'version to a Parquet or Arrow IPC file for analysis')
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='File to write; .parquet, .arrow, .feather or .ipc')
+        parser.add_argument('--format', choices=['parquet', 'arrow'],
+                            help='File format, when not implied by the file extension')
+        parser.add_argument('--watermark', metavar='FILE',
+                            help='File kept by the previous export: only measurements added or changed since, '
+                                 'and rows marking the ones deleted since, are exported and the file is '
+                                 'updated afterwards')
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE,
+                            help=f'Measurements per row group (default {EXPORT_CHUNK_SIZE})')
+
+    def handle(self, *args, **options):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise CommandError('Exporting measurements requires pyarrow: pip install pyarrow')
+
+        output = options['output']
+        file_format = export_format(output, options['format'])
+        if file_format is None:
+            raise CommandError(f'Cannot tell the format of "{output}"; use --format parquet or --format arrow.')
+        watermark = read_watermark(options['watermark']) if options['watermark'] else None
+
+        started = time.monotonic()
+        written, watermark = export_measurements(output, file_format, watermark, chunk_size=options['chunk_size'])
+        elapsed = time.monotonic() - started
+        if not written:
+            self.stdout.write('No measurements changed since the previous export; nothing written.')
+            return
+
+        if options['watermark']:
+            write_watermark(options['watermark'], watermark)
+        self.stdout.write(self.style.SUCCESS(
+            f'Exported {written} row(s), changed up to {watermark["since"]}, to {output} in {elapsed:.2f}s'
+        ))
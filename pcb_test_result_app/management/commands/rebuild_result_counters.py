@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from pcb_test_result_app.models import PcbTestResult
+from pcb_test_result_app.summary import refresh_result_counters
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the summary counters (total, passed, failed, first failed step) of PCB test results'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of test results updated per UPDATE statement')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        result_ids = PcbTestResult.objects.order_by('pk').values_list('pk', flat=True)
+        
+        updated = 0
+        last_id = 0
+        while True:
+            # Walk the results in primary key ranges so each UPDATE stays bounded
+            chunk = list(result_ids.filter(pk__gt=last_id)[:batch_size])
+            if not chunk:
+                break
+            with transaction.atomic():
+                updated += refresh_result_counters(PcbTestResult.objects.filter(pk__gte=chunk[0], pk__lte=chunk[-1]))
+            last_id = chunk[-1]
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully rebuilt summary counters for {updated} test result(s)')
+        )
@@ -0,0 +1,25 @@
+from datetime import date, datetime, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from pcb_test_result_app.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the hourly and daily test result rollups read by the dashboards'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='Only rebuild rollups from this date (YYYY-MM-DD) on')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = timezone.make_aware(datetime.combine(date.fromisoformat(options['since']), time.min))
+            except ValueError:
+                raise CommandError(f'Invalid date "{options["since"]}", expected YYYY-MM-DD.')
+
+        hourly, daily = rebuild_rollups(since)
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully rebuilt {hourly} hourly and {daily} daily result rollup(s)')
+        )
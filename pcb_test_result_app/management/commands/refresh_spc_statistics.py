@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from batch_app.models import Batch
+from pcb_test_result_app.models import SpcStatistics
+from pcb_test_result_app.spc import refresh_spc_statistics
+
+
+class Command(BaseCommand):
+    help = 'Refresh the SPC statistics of every batch, or rebuild them from all measurements with --rebuild'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch', type=int, action='append', dest='batches', metavar='BATCH_ID',
+                            help='Only refresh this batch; may be repeated')
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Drop the stored statistics first and recount them from every measurement')
+
+    def handle(self, *args, **options):
+        batches = Batch.objects.select_related('test_config_type').order_by('pk')
+        if options['batches']:
+            batches = batches.filter(pk__in=options['batches'])
+
+        refreshed = 0
+        for batch in batches:
+            if options['rebuild']:
+                SpcStatistics.objects.filter(batch=batch).delete()
+            refreshed += len(refresh_spc_statistics(batch.test_config_type, batch))
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully refreshed the SPC statistics of {refreshed} parameter(s)')
+        )
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+from pcb_test_result_app.regrade import REGRADE_CHUNK_SIZE, measurement_steps, newly_failing_results, regrade_measurements
+from test_config_type_app.models import TestConfigType
+
+
+def parse_limit(value):
+    """Parse STEP_ID=MIN:MAX, where an empty MIN or MAX is an open limit"""
+    try:
+        step_id, bounds = value.split('=', 1)
+        low, high = bounds.split(':', 1)
+        return int(step_id), (float(low) if low else None, float(high) if high else None)
+    except ValueError:
+        raise CommandError(f'Invalid limit "{value}", expected STEP_ID=MIN:MAX.')
+
+
+class Command(BaseCommand):
+    help = ('Grade the stored measurements of a test config against new limits and report which '
+            'test results would now fail, without changing the results')
+
+    def add_arguments(self, parser):
+        parser.add_argument('config', help='Test config id or name')
+        parser.add_argument('--limit', action='append', default=[], metavar='STEP_ID=MIN:MAX',
+                            help='Limits to grade a step against instead of its current ones; repeatable')
+        parser.add_argument('--chunk-size', type=int, default=REGRADE_CHUNK_SIZE,
+                            help=f'Measurements graded per chunk (default {REGRADE_CHUNK_SIZE})')
+        parser.add_argument('--show', type=int, default=20, help='Newly failing serial numbers listed (default 20)')
+
+    def handle(self, *args, **options):
+        config_ref = options['config']
+        test_config = TestConfigType.objects.filter(pk=config_ref).first() if config_ref.isdigit() else None
+        test_config = test_config or TestConfigType.objects.filter(name=config_ref).first()
+        if test_config is None:
+            raise CommandError(f'Test config "{config_ref}" does not exist.')
+
+        limits = dict(parse_limit(value) for value in options['limit'])
+        step_ids = {step.id for step in measurement_steps(test_config)}
+        unknown = sorted(set(limits) - step_ids)
+        if unknown:
+            raise CommandError(f'Step {unknown[0]} is not a measurement step of "{test_config.name}".')
+
+        run = regrade_measurements(test_config, limits, chunk_size=options['chunk_size'])
+
+        rate = run.measurements / run.elapsed if run.elapsed else 0
+        self.stdout.write(
+            f'Graded {run.measurements} measurements in {run.elapsed:.2f}s ({rate:.0f}/s): '
+            f'{run.failed_measurements} fail the new limits, {run.newly_failed_measurements} of them passed before.'
+        )
+        for test_result in newly_failing_results(run)[:options['show']]:
+            self.stdout.write(f'  {test_result.pcb.serial_number} (test result {test_result.pk})')
+        self.stdout.write(self.style.SUCCESS(
+            f'{run.newly_failed_results} passed test result(s) would now fail; saved as regrade run {run.pk}.'
+        ))
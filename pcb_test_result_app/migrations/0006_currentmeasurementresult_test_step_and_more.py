@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pcb_test_result_app', '0005_alter_qasignoff_signed_off_at'),
+        ('test_config_type_app', '0006_teststep_test_config_test_co_d85a07_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='currentmeasurementresult',
+            name='test_step',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='current_results', to='test_config_type_app.teststep'),
+        ),
+        migrations.AddField(
+            model_name='frequencymeasurementresult',
+            name='test_step',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='frequency_results', to='test_config_type_app.teststep'),
+        ),
+        migrations.AddField(
+            model_name='instructionresult',
+            name='test_step',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='instruction_results', to='test_config_type_app.teststep'),
+        ),
+        migrations.AddField(
+            model_name='pcbtestresult',
+            name='next_step_order',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='resistancemeasurementresult',
+            name='test_step',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='resistance_results', to='test_config_type_app.teststep'),
+        ),
+        migrations.AddField(
+            model_name='voltagemeasurementresult',
+            name='test_step',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='voltage_results', to='test_config_type_app.teststep'),
+        ),
+        migrations.AddField(
+            model_name='yesnoquestionresult',
+            name='test_step',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='question_results', to='test_config_type_app.teststep'),
+        ),
+    ]
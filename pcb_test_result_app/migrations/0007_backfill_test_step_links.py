@@ -0,0 +1,64 @@
+from django.db import migrations
+
+
+RESULT_MODELS = [
+    ('VoltageMeasurementResult', 'VOLTAGE', 'parameter_name'),
+    ('CurrentMeasurementResult', 'CURRENT', 'parameter_name'),
+    ('ResistanceMeasurementResult', 'RESISTANCE', 'parameter_name'),
+    ('FrequencyMeasurementResult', 'FREQUENCY', 'parameter_name'),
+    ('YesNoQuestionResult', 'QUESTION', 'question_text'),
+    ('InstructionResult', 'INSTRUCTION', 'instruction_text'),
+]
+
+
+def step_text(step):
+    if step.step_type == 'QUESTION':
+        return step.question_text
+    if step.step_type == 'INSTRUCTION':
+        return step.instruction_text
+    return step.parameter_name
+
+
+def backfill_test_step_links(apps, schema_editor):
+    """Link existing result rows to the test step they answer and set the step cursor"""
+    db_alias = schema_editor.connection.alias
+    PcbTestResult = apps.get_model('pcb_test_result_app', 'PcbTestResult')
+    TestStep = apps.get_model('test_config_type_app', 'TestStep')
+
+    steps_by_config = {}
+    for step in TestStep.objects.using(db_alias).order_by('test_config_id', 'order'):
+        steps_by_config.setdefault(step.test_config_id, []).append(step)
+
+    for test_result in PcbTestResult.objects.using(db_alias).select_related('pcb__batch').iterator():
+        steps = steps_by_config.get(test_result.pcb.batch.test_config_type_id, [])
+        completed_ids = set()
+
+        for model_name, step_type, text_field in RESULT_MODELS:
+            Model = apps.get_model('pcb_test_result_app', model_name)
+            for row in Model.objects.using(db_alias).filter(test_result=test_result).order_by('id'):
+                # Match each row to the first unclaimed step with the same text
+                for step in steps:
+                    if (step.id not in completed_ids and step.step_type == step_type
+                            and step_text(step) == getattr(row, text_field)):
+                        completed_ids.add(step.id)
+                        row.test_step_id = step.id
+                        row.save(update_fields=['test_step'])
+                        break
+
+        next_step = next((step for step in steps if step.id not in completed_ids), None)
+        if next_step is not None:
+            test_result.next_step_order = next_step.order
+        elif steps:
+            test_result.next_step_order = steps[-1].order + 1
+        test_result.save(update_fields=['next_step_order'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pcb_test_result_app', '0006_currentmeasurementresult_test_step_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_test_step_links, migrations.RunPython.noop),
+    ]
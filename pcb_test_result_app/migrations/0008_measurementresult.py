@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pcb_test_result_app', '0007_backfill_test_step_links'),
+        ('test_config_type_app', '0006_teststep_test_config_test_co_d85a07_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MeasurementResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('VOLTAGE', 'Voltage'), ('CURRENT', 'Current'), ('RESISTANCE', 'Resistance'), ('FREQUENCY', 'Frequency')], max_length=20)),
+                ('parameter_name', models.CharField(max_length=100)),
+                ('measured_value', models.FloatField()),
+                ('unit', models.CharField(blank=True, max_length=10)),
+                ('min_value', models.FloatField()),
+                ('max_value', models.FloatField()),
+                ('passed', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('test_result', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='measurements', to='pcb_test_result_app.pcbtestresult')),
+                ('test_step', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='measurement_results', to='test_config_type_app.teststep')),
+            ],
+            options={
+                'verbose_name': 'Measurement Result',
+                'verbose_name_plural': 'Measurement Results',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='measurementresult',
+            index=models.Index(fields=['test_result', 'kind', 'passed'], name='pcb_test_re_test_re_d9793f_idx'),
+        ),
+    ]
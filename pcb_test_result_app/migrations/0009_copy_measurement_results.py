@@ -0,0 +1,54 @@
+from django.db import migrations
+
+
+LEGACY_MODELS = [
+    ('VoltageMeasurementResult', 'VOLTAGE'),
+    ('CurrentMeasurementResult', 'CURRENT'),
+    ('ResistanceMeasurementResult', 'RESISTANCE'),
+    ('FrequencyMeasurementResult', 'FREQUENCY'),
+]
+
+COLUMNS = ['test_result_id', 'test_step_id', 'parameter_name', 'measured_value', 'unit',
+           'min_value', 'max_value', 'passed', 'created_at']
+
+
+def copy_measurement_results(apps, schema_editor):
+    """Copy the four per-kind measurement tables into the measurements table.
+
+    Rows are copied with INSERT ... SELECT so created_at is kept as recorded.
+    """
+    quote = schema_editor.quote_name
+    columns = ', '.join(quote(column) for column in COLUMNS)
+    target = apps.get_model('pcb_test_result_app', 'MeasurementResult')._meta.db_table
+    for model_name, kind in LEGACY_MODELS:
+        source = apps.get_model('pcb_test_result_app', model_name)._meta.db_table
+        schema_editor.execute(
+            f'INSERT INTO {quote(target)} ({quote("kind")}, {columns}) '
+            f'SELECT %s, {columns} FROM {quote(source)} ORDER BY {quote("id")}',
+            [kind],
+        )
+
+
+def copy_measurement_results_back(apps, schema_editor):
+    """Copy the measurements table back into the four per-kind tables"""
+    quote = schema_editor.quote_name
+    columns = ', '.join(quote(column) for column in COLUMNS)
+    source = apps.get_model('pcb_test_result_app', 'MeasurementResult')._meta.db_table
+    for model_name, kind in LEGACY_MODELS:
+        target = apps.get_model('pcb_test_result_app', model_name)._meta.db_table
+        schema_editor.execute(
+            f'INSERT INTO {quote(target)} ({columns}) '
+            f'SELECT {columns} FROM {quote(source)} WHERE {quote("kind")} = %s ORDER BY {quote("id")}',
+            [kind],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pcb_test_result_app', '0008_measurementresult'),
+    ]
+
+    operations = [
+        migrations.RunPython(copy_measurement_results, copy_measurement_results_back),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:48
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pcb_test_result_app', '0009_copy_measurement_results'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='CurrentMeasurementResult',
+        ),
+        migrations.DeleteModel(
+            name='FrequencyMeasurementResult',
+        ),
+        migrations.DeleteModel(
+            name='ResistanceMeasurementResult',
+        ),
+        migrations.DeleteModel(
+            name='VoltageMeasurementResult',
+        ),
+        migrations.CreateModel(
+            name='CurrentMeasurementResult',
+            fields=[
+            ],
+            options={
+                'verbose_name': 'Current Measurement Result',
+                'verbose_name_plural': 'Current Measurement Results',
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('pcb_test_result_app.measurementresult',),
+        ),
+        migrations.CreateModel(
+            name='FrequencyMeasurementResult',
+            fields=[
+            ],
+            options={
+                'verbose_name': 'Frequency Measurement Result',
+                'verbose_name_plural': 'Frequency Measurement Results',
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('pcb_test_result_app.measurementresult',),
+        ),
+        migrations.CreateModel(
+            name='ResistanceMeasurementResult',
+            fields=[
+            ],
+            options={
+                'verbose_name': 'Resistance Measurement Result',
+                'verbose_name_plural': 'Resistance Measurement Results',
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('pcb_test_result_app.measurementresult',),
+        ),
+        migrations.CreateModel(
+            name='VoltageMeasurementResult',
+            fields=[
+            ],
+            options={
+                'verbose_name': 'Voltage Measurement Result',
+                'verbose_name_plural': 'Voltage Measurement Results',
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('pcb_test_result_app.measurementresult',),
+        ),
+    ]
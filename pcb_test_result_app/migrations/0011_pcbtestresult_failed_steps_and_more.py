@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pcb_test_result_app', '0010_measurement_proxy_models'),
+        ('test_config_type_app', '0006_teststep_test_config_test_co_d85a07_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pcbtestresult',
+            name='failed_steps',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='pcbtestresult',
+            name='first_failed_step',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='test_config_type_app.teststep'),
+        ),
+        migrations.AddField(
+            model_name='pcbtestresult',
+            name='passed_steps',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='pcbtestresult',
+            name='total_steps',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,50 @@
+from django.db import migrations
+from django.db.models import Count, Exists, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_result_counters(apps, schema_editor):
+    """Fill the summary counters of existing test results with one UPDATE"""
+    db_alias = schema_editor.connection.alias
+    PcbTestResult = apps.get_model('pcb_test_result_app', 'PcbTestResult')
+    TestStep = apps.get_model('test_config_type_app', 'TestStep')
+    step_result_models = [
+        (apps.get_model('pcb_test_result_app', 'MeasurementResult'), Q(passed=True)),
+        (apps.get_model('pcb_test_result_app', 'YesNoQuestionResult'), Q(passed=True)),
+        (apps.get_model('pcb_test_result_app', 'InstructionResult'), Q(acknowledged=True)),
+    ]
+
+    def count(model, condition):
+        counts = (
+            model.objects.filter(condition, test_result=OuterRef('pk'))
+            .order_by().values('test_result').annotate(count=Count('pk')).values('count')
+        )
+        return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+    def total(conditions):
+        expressions = [count(model, condition) for (model, passed), condition in zip(step_result_models, conditions)]
+        return expressions[0] + expressions[1] + expressions[2]
+
+    failing = [
+        Exists(model.objects.filter(~passed, test_step=OuterRef('pk'), test_result=OuterRef(OuterRef('pk'))))
+        for model, passed in step_result_models
+    ]
+    PcbTestResult.objects.using(db_alias).update(
+        total_steps=total([Q(), Q(), Q()]),
+        passed_steps=total([passed for model, passed in step_result_models]),
+        failed_steps=total([~passed for model, passed in step_result_models]),
+        first_failed_step=Subquery(
+            TestStep.objects.filter(failing[0] | failing[1] | failing[2]).order_by('order').values('pk')[:1]
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pcb_test_result_app', '0011_pcbtestresult_failed_steps_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_result_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:52
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('batch_app', '0002_create_batch_management_group'),
+        ('pcb_test_result_app', '0012_backfill_result_counters'),
+        ('test_config_type_app', '0006_teststep_test_config_test_co_d85a07_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pcbtestresult',
+            index=models.Index(fields=['test_date', 'id'], name='pcb_test_re_test_da_70e9c8_idx'),
+        ),
+    ]
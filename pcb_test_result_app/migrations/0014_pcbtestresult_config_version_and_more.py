@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pcb_test_result_app', '0013_pcbtestresult_pcb_test_re_test_da_70e9c8_idx'),
+        ('test_config_type_app', '0009_testconfigversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pcbtestresult',
+            name='config_version',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='test_results', to='test_config_type_app.testconfigversion'),
+        ),
+        migrations.AlterField(
+            model_name='instructionresult',
+            name='test_step',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='instruction_results', to='test_config_type_app.teststep'),
+        ),
+        migrations.AlterField(
+            model_name='measurementresult',
+            name='test_step',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='measurement_results', to='test_config_type_app.teststep'),
+        ),
+        migrations.AlterField(
+            model_name='yesnoquestionresult',
+            name='test_step',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='question_results', to='test_config_type_app.teststep'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pcb_test_result_app', '0014_pcbtestresult_config_version_and_more'),
+        ('test_config_type_app', '0009_testconfigversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegradeRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('limits', models.JSONField()),
+                ('measurements', models.PositiveIntegerField(default=0)),
+                ('failed_measurements', models.PositiveIntegerField(default=0)),
+                ('newly_failed_measurements', models.PositiveIntegerField(default=0)),
+                ('newly_failed_results', models.PositiveIntegerField(default=0)),
+                ('elapsed', models.FloatField(default=0.0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('test_config', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='regrade_runs', to='test_config_type_app.testconfigtype')),
+            ],
+            options={
+                'verbose_name': 'Regrade Run',
+                'verbose_name_plural': 'Regrade Runs',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='RegradeResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('failed_measurements', models.PositiveIntegerField()),
+                ('newly_failed_measurements', models.PositiveIntegerField()),
+                ('test_result', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='regrade_results', to='pcb_test_result_app.pcbtestresult')),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='results', to='pcb_test_result_app.regraderun')),
+            ],
+            options={
+                'verbose_name': 'Regrade Result',
+                'verbose_name_plural': 'Regrade Results',
+                'constraints': [models.UniqueConstraint(fields=('run', 'test_result'), name='unique_regrade_result_per_run')],
+            },
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('batch_app', '0003_pcb_batch_pcb_serial_upper_idx'),
+        ('pcb_test_result_app', '0015_regraderun'),
+        ('test_config_type_app', '0009_testconfigversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpcStatistics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('VOLTAGE', 'Voltage'), ('CURRENT', 'Current'), ('RESISTANCE', 'Resistance'), ('FREQUENCY', 'Frequency')], max_length=20)),
+                ('parameter_name', models.CharField(max_length=100)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('mean', models.FloatField(default=0.0)),
+                ('sum_squares', models.FloatField(default=0.0)),
+                ('moving_range_sum', models.FloatField(default=0.0)),
+                ('last_value', models.FloatField(blank=True, null=True)),
+                ('last_measurement_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'SPC Statistics',
+                'verbose_name_plural': 'SPC Statistics',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='measurementresult',
+            index=models.Index(fields=['kind', 'parameter_name', 'id'], name='pcb_test_re_kind_394700_idx'),
+        ),
+        migrations.AddField(
+            model_name='spcstatistics',
+            name='batch',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='spc_statistics', to='batch_app.batch'),
+        ),
+        migrations.AddField(
+            model_name='spcstatistics',
+            name='test_config',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='spc_statistics', to='test_config_type_app.testconfigtype'),
+        ),
+        migrations.AddConstraint(
+            model_name='spcstatistics',
+            constraint=models.UniqueConstraint(fields=('test_config', 'batch', 'kind', 'parameter_name'), name='unique_spc_statistics_per_parameter'),
+        ),
+    ]
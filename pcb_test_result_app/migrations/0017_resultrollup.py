@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pcb_test_result_app', '0016_spcstatistics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResultRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('HOUR', 'Hour'), ('DAY', 'Day')], max_length=4)),
+                ('bucket_start', models.DateTimeField()),
+                ('dimension', models.CharField(choices=[('ALL', 'All results'), ('BATCH', 'Batch'), ('PCB_TYPE', 'PCB type'), ('TECHNICIAN', 'Technician'), ('CONFIG', 'Test config')], max_length=20)),
+                ('key_id', models.BigIntegerField(default=0)),
+                ('tested', models.PositiveIntegerField(default=0)),
+                ('passed', models.PositiveIntegerField(default=0)),
+                ('failed', models.PositiveIntegerField(default=0)),
+                ('signed_off', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Result Rollup',
+                'verbose_name_plural': 'Result Rollups',
+                'ordering': ['period', 'bucket_start'],
+                'constraints': [models.UniqueConstraint(fields=('period', 'dimension', 'key_id', 'bucket_start'), name='unique_result_rollup_bucket')],
+            },
+        ),
+    ]
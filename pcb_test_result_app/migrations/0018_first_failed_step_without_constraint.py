@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pcb_test_result_app', '0017_resultrollup'),
+        ('test_config_type_app', '0009_testconfigversion'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='pcbtestresult',
+            name='first_failed_step',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='test_config_type_app.teststep'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pcb_test_result_app', '0018_first_failed_step_without_constraint'),
+        ('test_config_type_app', '0009_testconfigversion'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='pcbtestresult',
+            name='failed_steps',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='pcbtestresult',
+            name='first_failed_step',
+            field=models.ForeignKey(blank=True, db_constraint=False, editable=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='test_config_type_app.teststep'),
+        ),
+        migrations.AlterField(
+            model_name='pcbtestresult',
+            name='passed_steps',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='pcbtestresult',
+            name='total_steps',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -1,13 +1,16 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
-from batch_app.models import Pcb
+from batch_app.models import Batch, Pcb
+from test_config_type_app.models import TestConfigType, TestConfigVersion, TestStep
 
 
 class PcbTestResult(models.Model):
     """Represents a test result for a specific PCB"""
     pcb = models.ForeignKey(Pcb, on_delete=models.CASCADE, related_name='test_results')
     technician = models.ForeignKey(User, on_delete=models.CASCADE, related_name='test_results')
+    # Published config version the test runs against; its steps and limits do not change
+    config_version = models.ForeignKey(TestConfigVersion, on_delete=models.SET_NULL, null=True, blank=True, related_name='test_results')
     test_date = models.DateTimeField(auto_now_add=True)
     notes = models.TextField(blank=True, null=True)
     
@@ -22,24 +25,80 @@ class PcbTestResult(models.Model):
     ]
     result = models.CharField(max_length=20, choices=TEST_RESULT_CHOICES, default=INCOMPLETE)
     
+    # Order of the next step to execute; steps with a lower order are completed
+    next_step_order = models.PositiveIntegerField(default=0)
+    
+    # Summary counters, maintained by summary.refresh_result_counters; saves of
+    # a loaded result name their update_fields so they do not overwrite them
+    total_steps = models.PositiveIntegerField(default=0, editable=False)
+    passed_steps = models.PositiveIntegerField(default=0, editable=False)
+    failed_steps = models.PositiveIntegerField(default=0, editable=False)
+    # Like the result rows' test_step, kept when the step is later removed from the config
+    first_failed_step = models.ForeignKey(TestStep, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, editable=False, related_name='+')
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"Test Result for {self.pcb.serial_number} by {self.technician.username} on {self.test_date.strftime('%Y-%m-%d')}"
 
+    COUNTER_FIELDS = ['total_steps', 'passed_steps', 'failed_steps', 'first_failed_step']
+
+    # Per-kind views of the measurements table, kept for existing callers
+    @property
+    def voltage_measurements(self):
+        return VoltageMeasurementResult.objects.filter(test_result=self)
+
+    @property
+    def current_measurements(self):
+        return CurrentMeasurementResult.objects.filter(test_result=self)
+
+    @property
+    def resistance_measurements(self):
+        return ResistanceMeasurementResult.objects.filter(test_result=self)
+
+    @property
+    def frequency_measurements(self):
+        return FrequencyMeasurementResult.objects.filter(test_result=self)
+
     class Meta:
         verbose_name = "PCB Test Result"
         verbose_name_plural = "PCB Test Results"
         ordering = ['-test_date']
-
-
-class VoltageMeasurementResult(models.Model):
-    """Represents a voltage measurement result"""
-    test_result = models.ForeignKey(PcbTestResult, on_delete=models.CASCADE, related_name='voltage_measurements')
+        indexes = [
+            models.Index(fields=['test_date', 'id']),
+        ]
+
+
+class MeasurementResult(models.Model):
+    """Represents a voltage, current, resistance or frequency measurement result"""
+    VOLTAGE = 'VOLTAGE'
+    CURRENT = 'CURRENT'
+    RESISTANCE = 'RESISTANCE'
+    FREQUENCY = 'FREQUENCY'
+    KIND_CHOICES = [
+        (VOLTAGE, 'Voltage'),
+        (CURRENT, 'Current'),
+        (RESISTANCE, 'Resistance'),
+        (FREQUENCY, 'Frequency'),
+    ]
+    DEFAULT_UNITS = {
+        VOLTAGE: 'V',
+        CURRENT: 'A',
+        RESISTANCE: 'Ω',
+        FREQUENCY: 'Hz',
+    }
+    
+    # Set by the per-kind proxy models below
+    KIND = None
+    
+    test_result = models.ForeignKey(PcbTestResult, on_delete=models.CASCADE, related_name='measurements')
+    # Step of the result's config version, which may since have been removed from the config
+    test_step = models.ForeignKey(TestStep, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='measurement_results')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
     parameter_name = models.CharField(max_length=100)
     measured_value = models.FloatField()
-    unit = models.CharField(max_length=10, default='V')
+    unit = models.CharField(max_length=10, blank=True)
     min_value = models.FloatField()  # Reference from test config
     max_value = models.FloatField()  # Reference from test config
     passed = models.BooleanField(default=False)
@@ -49,67 +108,74 @@ class VoltageMeasurementResult(models.Model):
     def __str__(self):
         return f"{self.parameter_name}: {self.measured_value}{self.unit}"
 
+    def save(self, *args, **kwargs):
+        if self.KIND:
+            self.kind = self.KIND
+        if not self.unit:
+            self.unit = self.DEFAULT_UNITS.get(self.kind, '')
+        super().save(*args, **kwargs)
+
+    class Meta:
+        verbose_name = "Measurement Result"
+        verbose_name_plural = "Measurement Results"
+        indexes = [
+            models.Index(fields=['test_result', 'kind', 'passed']),
+            # Walks one parameter's history in recording order, e.g. for SPC
+            models.Index(fields=['kind', 'parameter_name', 'id']),
+        ]
+
+
+class MeasurementKindManager(models.Manager):
+    """Manager limiting a measurement proxy model to its own kind"""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(kind=self.model.KIND)
+
+
+class VoltageMeasurementResult(MeasurementResult):
+    """Represents a voltage measurement result"""
+    KIND = MeasurementResult.VOLTAGE
+    
+    objects = MeasurementKindManager()
+
     class Meta:
+        proxy = True
         verbose_name = "Voltage Measurement Result"
         verbose_name_plural = "Voltage Measurement Results"
 
 
-class CurrentMeasurementResult(models.Model):
+class CurrentMeasurementResult(MeasurementResult):
     """Represents a current measurement result"""
-    test_result = models.ForeignKey(PcbTestResult, on_delete=models.CASCADE, related_name='current_measurements')
-    parameter_name = models.CharField(max_length=100)
-    measured_value = models.FloatField()
-    unit = models.CharField(max_length=10, default='A')
-    min_value = models.FloatField()  # Reference from test config
-    max_value = models.FloatField()  # Reference from test config
-    passed = models.BooleanField(default=False)
+    KIND = MeasurementResult.CURRENT
     
-    created_at = models.DateTimeField(auto_now_add=True)
-
-    def __str__(self):
-        return f"{self.parameter_name}: {self.measured_value}{self.unit}"
+    objects = MeasurementKindManager()
 
     class Meta:
+        proxy = True
         verbose_name = "Current Measurement Result"
         verbose_name_plural = "Current Measurement Results"
 
 
-class ResistanceMeasurementResult(models.Model):
+class ResistanceMeasurementResult(MeasurementResult):
     """Represents a resistance measurement result"""
-    test_result = models.ForeignKey(PcbTestResult, on_delete=models.CASCADE, related_name='resistance_measurements')
-    parameter_name = models.CharField(max_length=100)
-    measured_value = models.FloatField()
-    unit = models.CharField(max_length=10, default='Ω')
-    min_value = models.FloatField()  # Reference from test config
-    max_value = models.FloatField()  # Reference from test config
-    passed = models.BooleanField(default=False)
+    KIND = MeasurementResult.RESISTANCE
     
-    created_at = models.DateTimeField(auto_now_add=True)
-
-    def __str__(self):
-        return f"{self.parameter_name}: {self.measured_value}{self.unit}"
+    objects = MeasurementKindManager()
 
     class Meta:
+        proxy = True
         verbose_name = "Resistance Measurement Result"
         verbose_name_plural = "Resistance Measurement Results"
 
 
-class FrequencyMeasurementResult(models.Model):
+class FrequencyMeasurementResult(MeasurementResult):
     """Represents a frequency measurement result"""
-    test_result = models.ForeignKey(PcbTestResult, on_delete=models.CASCADE, related_name='frequency_measurements')
-    parameter_name = models.CharField(max_length=100)
-    measured_value = models.FloatField()
-    unit = models.CharField(max_length=10, default='Hz')
-    min_value = models.FloatField()  # Reference from test config
-    max_value = models.FloatField()  # Reference from test config
-    passed = models.BooleanField(default=False)
+    KIND = MeasurementResult.FREQUENCY
     
-    created_at = models.DateTimeField(auto_now_add=True)
-
-    def __str__(self):
-        return f"{self.parameter_name}: {self.measured_value}{self.unit}"
+    objects = MeasurementKindManager()
 
     class Meta:
+        proxy = True
         verbose_name = "Frequency Measurement Result"
         verbose_name_plural = "Frequency Measurement Results"
 
@@ -117,6 +183,7 @@ class FrequencyMeasurementResult(models.Model):
 class YesNoQuestionResult(models.Model):
     """Represents a yes/no question result"""
     test_result = models.ForeignKey(PcbTestResult, on_delete=models.CASCADE, related_name='yes_no_questions')
+    test_step = models.ForeignKey(TestStep, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='question_results')
     question_text = models.CharField(max_length=500)
     user_answer = models.BooleanField()  # True for 'Yes', False for 'No'
     required_answer = models.BooleanField()  # True for 'Yes', False for 'No' (reference from test config)
@@ -137,6 +204,7 @@ class YesNoQuestionResult(models.Model):
 class InstructionResult(models.Model):
     """Represents an instruction result (acknowledged by technician)"""
     test_result = models.ForeignKey(PcbTestResult, on_delete=models.CASCADE, related_name='instructions')
+    test_step = models.ForeignKey(TestStep, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='instruction_results')
     instruction_text = models.TextField()
     acknowledged = models.BooleanField(default=False)
     
@@ -173,4 +241,126 @@ class QaSignoff(models.Model):
     class Meta:
         verbose_name = "QA Signoff"
         verbose_name_plural = "QA Signoffs"
-        ordering = ['-signed_off_at']
\ No newline at end of file
+        ordering = ['-signed_off_at']
+
+class RegradeRun(models.Model):
+    """A what-if grading of a config's stored measurements against new limits.
+
+    The original result rows are never changed; the outcome is kept in
+    RegradeResult rows, one per test result with a failing measurement.
+    """
+    test_config = models.ForeignKey(TestConfigType, on_delete=models.CASCADE, related_name='regrade_runs')
+    # {step id: [min, max]} graded against; None is an open limit
+    limits = models.JSONField()
+    measurements = models.PositiveIntegerField(default=0)
+    failed_measurements = models.PositiveIntegerField(default=0)
+    newly_failed_measurements = models.PositiveIntegerField(default=0)
+    newly_failed_results = models.PositiveIntegerField(default=0)
+    elapsed = models.FloatField(default=0.0)  # Seconds
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Regrade of {self.test_config.name} on {self.created_at.strftime('%Y-%m-%d %H:%M')}"
+
+    class Meta:
+        verbose_name = "Regrade Run"
+        verbose_name_plural = "Regrade Runs"
+        ordering = ['-created_at']
+
+
+class RegradeResult(models.Model):
+    """How one test result grades under the limits of a RegradeRun"""
+    run = models.ForeignKey(RegradeRun, on_delete=models.CASCADE, related_name='results')
+    test_result = models.ForeignKey(PcbTestResult, on_delete=models.CASCADE, related_name='regrade_results')
+    failed_measurements = models.PositiveIntegerField()
+    # Measurements that passed when tested but fail the new limits
+    newly_failed_measurements = models.PositiveIntegerField()
+
+    def __str__(self):
+        return f"{self.test_result} under {self.run}"
+
+    class Meta:
+        verbose_name = "Regrade Result"
+        verbose_name_plural = "Regrade Results"
+        constraints = [
+            models.UniqueConstraint(fields=['run', 'test_result'], name='unique_regrade_result_per_run'),
+        ]
+
+
+class SpcStatistics(models.Model):
+    """Running statistics of one measured parameter of a test config within a batch.
+
+    Maintained incrementally by spc.refresh_spc_statistics: measurements up
+    to last_measurement_id are already folded in, so a refresh only reads
+    the rows recorded since. Editing or deleting a measurement drops the
+    statistics (spc.reset_spc_statistics) so they are rebuilt.
+    """
+    test_config = models.ForeignKey(TestConfigType, on_delete=models.CASCADE, related_name='spc_statistics')
+    batch = models.ForeignKey(Batch, on_delete=models.CASCADE, related_name='spc_statistics')
+    kind = models.CharField(max_length=20, choices=MeasurementResult.KIND_CHOICES)
+    parameter_name = models.CharField(max_length=100)
+    count = models.PositiveIntegerField(default=0)
+    mean = models.FloatField(default=0.0)
+    sum_squares = models.FloatField(default=0.0)  # Sum of squared deviations from the mean
+    moving_range_sum = models.FloatField(default=0.0)  # Sum of |x[i] - x[i-1]| in measurement order
+    last_value = models.FloatField(null=True, blank=True)
+    last_measurement_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.parameter_name} ({self.kind}) in {self.batch.name}: n={self.count}"
+
+    class Meta:
+        verbose_name = "SPC Statistics"
+        verbose_name_plural = "SPC Statistics"
+        constraints = [
+            models.UniqueConstraint(fields=['test_config', 'batch', 'kind', 'parameter_name'],
+                                    name='unique_spc_statistics_per_parameter'),
+        ]
+
+
+class ResultRollup(models.Model):
+    """Finished test result counts of one hour or day, overall or for one batch, PCB type, technician or config.
+
+    Kept current by rollups.refresh_result_rollups whenever a result is
+    completed, edited, signed off or deleted, so dashboards read a handful
+    of rows instead of scanning PcbTestResult.
+    """
+    HOUR = 'HOUR'
+    DAY = 'DAY'
+    PERIOD_CHOICES = [
+        (HOUR, 'Hour'),
+        (DAY, 'Day'),
+    ]
+    ALL = 'ALL'
+    BATCH = 'BATCH'
+    PCB_TYPE = 'PCB_TYPE'
+    TECHNICIAN = 'TECHNICIAN'
+    CONFIG = 'CONFIG'
+    DIMENSION_CHOICES = [
+        (ALL, 'All results'),
+        (BATCH, 'Batch'),
+        (PCB_TYPE, 'PCB type'),
+        (TECHNICIAN, 'Technician'),
+        (CONFIG, 'Test config'),
+    ]
+
+    period = models.CharField(max_length=4, choices=PERIOD_CHOICES)
+    bucket_start = models.DateTimeField()
+    dimension = models.CharField(max_length=20, choices=DIMENSION_CHOICES)
+    key_id = models.BigIntegerField(default=0)  # Id of the batch, PCB type, user or config; 0 for ALL
+    tested = models.PositiveIntegerField(default=0)
+    passed = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    signed_off = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.get_dimension_display()} {self.key_id} {self.period} {self.bucket_start:%Y-%m-%d %H:%M}: {self.tested} tested"
+
+    class Meta:
+        verbose_name = "Result Rollup"
+        verbose_name_plural = "Result Rollups"
+        ordering = ['period', 'bucket_start']
+        constraints = [
+            models.UniqueConstraint(fields=['period', 'dimension', 'key_id', 'bucket_start'], name='unique_result_rollup_bucket'),
+        ]
@@ -0,0 +1,79 @@
+from datetime import datetime
+
+from django.db.models import Q
+
+
+def encode_cursor(test_result):
+    """Return the keyset cursor (test_date and id) of a test result"""
+    return f'{test_result.test_date.isoformat()},{test_result.pk}'
+
+
+def decode_cursor(value):
+    """Parse a keyset cursor, returning (test_date, id) or None if it is invalid"""
+    try:
+        test_date, pk = value.rsplit(',', 1)
+        return datetime.fromisoformat(test_date), int(pk)
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+class KeysetPage:
+    """A page of test results located by a (test_date, id) cursor.
+
+    Unlike offset pagination the database seeks straight to the cursor using
+    the (test_date, id) index, so a deep page costs the same as the first one.
+    """
+
+    def __init__(self, object_list, has_next, has_previous):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    @property
+    def next_cursor(self):
+        return encode_cursor(self.object_list[-1]) if self.has_next else ''
+
+    @property
+    def previous_cursor(self):
+        return encode_cursor(self.object_list[0]) if self.has_previous else ''
+
+
+def keyset_page(queryset, page_size, after=None, before=None, descending=True):
+    """Return the KeysetPage of queryset after or before the given cursor.
+
+    Results are ordered by test_date and id, newest first when descending.
+    """
+    forward = not (before and decode_cursor(before))
+    cursor = decode_cursor(after) if forward else decode_cursor(before)
+
+    # Seeking forward in a descending list, or backward in an ascending one, means going down
+    going_down = descending == forward
+    if going_down:
+        queryset = queryset.order_by('-test_date', '-pk')
+    else:
+        queryset = queryset.order_by('test_date', 'pk')
+
+    if cursor:
+        test_date, pk = cursor
+        if going_down:
+            queryset = queryset.filter(Q(test_date__lt=test_date) | Q(test_date=test_date, pk__lt=pk))
+        else:
+            queryset = queryset.filter(Q(test_date__gt=test_date) | Q(test_date=test_date, pk__gt=pk))
+
+    rows = list(queryset[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+
+    if forward:
+        return KeysetPage(rows, has_next=has_more, has_previous=cursor is not None)
+    rows.reverse()
+    return KeysetPage(rows, has_next=True, has_previous=has_more)
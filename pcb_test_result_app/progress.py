@@ -0,0 +1,77 @@
+from bisect import bisect_left
+
+from django.http import Http404
+from django.utils import timezone
+
+
+class StepAlreadyRecorded(Exception):
+    """Another submission moved the cursor past the step first"""
+
+
+class StepProgress:
+    """Progress of a test result through the ordered steps of its test config.
+
+    Takes the steps of the result's config version in order, as compiled by
+    test_config_type_app.versions. Which steps are completed is read from the
+    result's ``next_step_order`` cursor, so next step, counts and percentage
+    are worked out in memory without looking at result rows.
+    """
+
+    def __init__(self, steps):
+        self.steps = list(steps)
+        self.orders = [step.order for step in self.steps]
+        self.cursor = 0
+
+    def load(self, test_result):
+        """Position the progress at the cursor of a test result"""
+        self.cursor = test_result.next_step_order
+        return self
+
+    def advance(self, test_result, step):
+        """Move the cursor of a test result past a step that was just recorded.
+
+        The cursor is only moved if it is still where it was loaded from, so
+        of two submissions of the same step only one gets through; the other
+        raises StepAlreadyRecorded, which should roll back its result row.
+        """
+        cursor = step.order + 1
+        updated = type(test_result)._base_manager.filter(pk=test_result.pk, next_step_order=self.cursor).update(
+            next_step_order=cursor, updated_at=timezone.now()
+        )
+        if not updated:
+            raise StepAlreadyRecorded(f'Step {step.id} was already recorded.')
+        self.cursor = test_result.next_step_order = cursor
+
+    def get_step(self, step_id):
+        """Return the loaded step with the given id, or raise Http404"""
+        try:
+            step_id = int(step_id)
+        except (TypeError, ValueError):
+            raise Http404('Invalid test step.')
+        for step in self.steps:
+            if step.id == step_id:
+                return step
+        raise Http404('No TestStep matches the given query.')
+
+    @property
+    def completed_steps(self):
+        return bisect_left(self.orders, self.cursor)
+
+    @property
+    def next_step(self):
+        index = self.completed_steps
+        return self.steps[index] if index < len(self.steps) else None
+
+    @property
+    def total_steps(self):
+        return len(self.steps)
+
+    @property
+    def is_last_step(self):
+        return self.completed_steps + 1 == self.total_steps
+
+    @property
+    def progress_percentage(self):
+        if not self.total_steps:
+            return 0
+        return int(((self.completed_steps + 1) / self.total_steps) * 100)
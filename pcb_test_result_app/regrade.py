@@ -0,0 +1,118 @@
+import time
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Case, IntegerField, Value, When
+
+from .models import MeasurementResult, PcbTestResult, RegradeResult, RegradeRun
+
+
+REGRADE_CHUNK_SIZE = 50000  # Measurement rows read and graded per chunk
+REGRADE_WRITE_SIZE = 1000  # RegradeResult rows per INSERT statement
+
+
+def _limit_bounds(limits):
+    """Lower and upper bound arrays of the limits; a missing limit is open"""
+    lower = np.array([-np.inf if low is None else low for low, high in limits], dtype=np.float64)
+    upper = np.array([np.inf if high is None else high for low, high in limits], dtype=np.float64)
+    return lower, upper
+
+
+def measurement_steps(test_config):
+    """The measurement steps of a config, in order"""
+    return [step for step in test_config.steps.order_by('order') if step.step_type in MeasurementResult.DEFAULT_UNITS]
+
+
+def _limit_index(steps):
+    """Annotation giving the position in steps of the step each measurement was taken for.
+
+    Rows are matched on their step id first and otherwise on kind and
+    parameter name. The fallback covers rows recorded before results were
+    linked to steps, and rows of a step that was removed from the config
+    and later added back as a new step.
+    """
+    by_id = [When(test_step_id=step.id, then=Value(index)) for index, step in enumerate(steps)]
+    by_name = [
+        When(kind=step.step_type, parameter_name=step.parameter_name, then=Value(index))
+        for index, step in enumerate(steps)
+    ]
+    return Case(*by_id, *by_name, default=None, output_field=IntegerField())
+
+
+def regrade_measurements(test_config, limits=None, chunk_size=REGRADE_CHUNK_SIZE):
+    """Grade every stored measurement of a config against new limits and return a RegradeRun.
+
+    limits maps step ids to (min, max) and defaults to the limits the
+    config's steps have now. The measurements are read in primary key
+    chunks of numeric columns only and graded with NumPy array comparisons;
+    the original rows are left as they were.
+    """
+    started = time.monotonic()
+    steps = measurement_steps(test_config)
+    limits = limits or {}
+    step_limits = [limits.get(step.id, (step.min_value, step.max_value)) for step in steps]
+    lower, upper = _limit_bounds(step_limits)
+
+    rows = (
+        MeasurementResult.objects
+        .filter(test_result__pcb__batch__test_config_type=test_config)
+        .annotate(limit_index=_limit_index(steps))
+        .filter(limit_index__isnull=False)
+        .order_by('pk')
+        .values_list('pk', 'test_result_id', 'limit_index', 'measured_value', 'passed')
+    )
+
+    failed_by_result = {}  # test result id -> [failed, newly failed]
+    run = RegradeRun(test_config=test_config,
+                     limits={str(step.id): list(step_limit) for step, step_limit in zip(steps, step_limits)})
+    last_id = 0
+    while steps:
+        chunk = list(rows.filter(pk__gt=last_id)[:chunk_size])
+        if not chunk:
+            break
+        last_id = chunk[-1][0]
+        columns = np.array(chunk, dtype=np.float64)
+        result_ids = columns[:, 1].astype(np.int64)
+        limit_index = columns[:, 2].astype(np.int64)
+        values = columns[:, 3]
+        was_passed = columns[:, 4].astype(bool)
+
+        failed = (values < lower[limit_index]) | (values > upper[limit_index])
+        newly_failed = failed & was_passed
+        run.measurements += len(chunk)
+        run.failed_measurements += int(failed.sum())
+        run.newly_failed_measurements += int(newly_failed.sum())
+
+        # Per result counts of this chunk, merged once per failing result
+        failing_ids, inverse = np.unique(result_ids[failed], return_inverse=True)
+        failed_counts = np.bincount(inverse, minlength=len(failing_ids))
+        newly_counts = np.bincount(inverse, weights=newly_failed[failed], minlength=len(failing_ids))
+        for result_id, failed_count, newly_count in zip(failing_ids.tolist(), failed_counts.tolist(),
+                                                        newly_counts.tolist()):
+            counts = failed_by_result.setdefault(result_id, [0, 0])
+            counts[0] += failed_count
+            counts[1] += int(newly_count)
+
+    with transaction.atomic():
+        run.save()
+        RegradeResult.objects.bulk_create(
+            (RegradeResult(run=run, test_result_id=result_id, failed_measurements=failed,
+                           newly_failed_measurements=newly)
+             for result_id, (failed, newly) in failed_by_result.items()),
+            batch_size=REGRADE_WRITE_SIZE,
+        )
+        run.newly_failed_results = newly_failing_results(run).count()
+        run.elapsed = time.monotonic() - started
+        run.save(update_fields=['newly_failed_results', 'elapsed'])
+    return run
+
+
+def newly_failing_results(run):
+    """Test results that passed but fail under the limits of a regrade run"""
+    return (
+        PcbTestResult.objects
+        .filter(regrade_results__run=run, regrade_results__newly_failed_measurements__gt=0,
+                result=PcbTestResult.PASSED)
+        .select_related('pcb')
+        .order_by('pcb__serial_number')
+    )
@@ -0,0 +1,151 @@
+import csv
+import itertools
+import tempfile
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+from .models import MeasurementResult
+
+
+REPORT_CHUNK_SIZE = 2000  # Test results fetched, and pivoted, per chunk of an export
+XLSX_READ_SIZE = 64 * 1024  # Bytes of the finished workbook sent per chunk
+
+# (column heading, lookup from PcbTestResult)
+RESULT_COLUMNS = [
+    ('Test result', 'pk'),
+    ('Serial number', 'pcb__serial_number'),
+    ('Batch', 'pcb__batch__name'),
+    ('PCB type', 'pcb__batch__pcb_type__name'),
+    ('Hardware version', 'pcb__batch__hardware_version'),
+    ('Test config', 'pcb__batch__test_config_type__name'),
+    ('Technician', 'technician__username'),
+    ('Test date', 'test_date'),
+    ('Result', 'result'),
+    ('Total steps', 'total_steps'),
+    ('Failed steps', 'failed_steps'),
+    ('Signed off', 'qa_signoff__is_signed_off'),
+]
+TEST_DATE_INDEX = [lookup for heading, lookup in RESULT_COLUMNS].index('test_date')
+# Leading characters that make a spreadsheet read a cell as a formula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+REPORT_CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+class Echo:
+    """File-like object handing each written line back to the csv writer's caller"""
+
+    def write(self, value):
+        return value
+
+
+def escape_formula(value):
+    """Quote a CSV text cell that a spreadsheet would otherwise run as a formula"""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return f"'{value}"
+    return value
+
+
+def measurement_columns(test_results):
+    """The (kind, parameter name) pairs measured in a set of test results, sorted.
+
+    Found with one DISTINCT query, so the header is known before the first
+    row is streamed.
+    """
+    return list(
+        MeasurementResult.objects
+        .filter(test_result__in=test_results.values('pk'))
+        .values_list('kind', 'parameter_name')
+        .distinct()
+        .order_by('kind', 'parameter_name')
+    )
+
+
+def report_header(columns):
+    return [heading for heading, lookup in RESULT_COLUMNS] + [
+        f'{parameter_name} ({kind.lower()})' for kind, parameter_name in columns
+    ]
+
+
+def report_rows(test_results, columns, chunk_size=REPORT_CHUNK_SIZE):
+    """Yield the header, then one row per test result, its measured values pivoted into one column per parameter.
+
+    The results are read with a chunked iterator over values() rows; the
+    measurements of each chunk of results are then fetched with a single
+    query. A parameter measured twice in a result shows its latest value.
+    """
+    yield report_header(columns)
+    column_index = {column: index for index, column in enumerate(columns)}
+    rows = test_results.values_list(*[lookup for heading, lookup in RESULT_COLUMNS]).iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+        if not chunk:
+            return
+        values = {row[0]: [None] * len(columns) for row in chunk}
+        measurements = (
+            MeasurementResult.objects
+            .filter(test_result_id__in=values)
+            .order_by('pk')
+            .values_list('test_result_id', 'kind', 'parameter_name', 'measured_value')
+        )
+        for test_result_id, kind, parameter_name, measured_value in measurements:
+            index = column_index.get((kind, parameter_name))
+            if index is not None:
+                values[test_result_id][index] = measured_value
+        for row in chunk:
+            row = list(row)
+            # Local time without an offset, which spreadsheets cannot store
+            if row[TEST_DATE_INDEX]:
+                row[TEST_DATE_INDEX] = timezone.localtime(row[TEST_DATE_INDEX]).replace(tzinfo=None)
+            yield row + values[row[0]]
+
+
+def csv_report(test_results, chunk_size=REPORT_CHUNK_SIZE):
+    """Yield the lines of a CSV report of the test results, text a spreadsheet would take for a formula quoted"""
+    writer = csv.writer(Echo())
+    for row in report_rows(test_results, measurement_columns(test_results), chunk_size):
+        yield writer.writerow([escape_formula(value) for value in row])
+
+
+def xlsx_cell(worksheet, value):
+    """A cell for value; text is stored as text, never read as a formula"""
+    if not isinstance(value, str):
+        return value
+    cell = WriteOnlyCell(worksheet, ILLEGAL_CHARACTERS_RE.sub('', value))
+    cell.data_type = 's'
+    return cell
+
+
+def xlsx_report(test_results, chunk_size=REPORT_CHUNK_SIZE):
+    """Yield the bytes of an XLSX report of the test results.
+
+    openpyxl's write-only mode spools the rows to a temporary file as they
+    are appended and zips them on save, so memory stays flat however many
+    results there are. The finished workbook is then sent in chunks.
+    """
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet('Test results')
+    for row in report_rows(test_results, measurement_columns(test_results), chunk_size):
+        worksheet.append([xlsx_cell(worksheet, value) for value in row])
+    with tempfile.TemporaryFile() as f:
+        workbook.save(f)
+        f.seek(0)
+        while chunk := f.read(XLSX_READ_SIZE):
+            yield chunk
+
+
+REPORTS = {'csv': csv_report, 'xlsx': xlsx_report}
+
+
+def report_response(test_results, file_format, filename):
+    """Download response streaming a CSV or XLSX report of the test results as it is generated"""
+    response = StreamingHttpResponse(REPORTS[file_format](test_results),
+                                     content_type=REPORT_CONTENT_TYPES[file_format])
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{file_format}"'
+    return response
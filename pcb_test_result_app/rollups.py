@@ -0,0 +1,169 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+
+from .models import PcbTestResult, ResultRollup
+
+
+# Field of PcbTestResult each dimension is grouped by; ALL has no key
+DIMENSION_LOOKUPS = {
+    ResultRollup.BATCH: 'pcb__batch_id',
+    ResultRollup.PCB_TYPE: 'pcb__batch__pcb_type_id',
+    ResultRollup.TECHNICIAN: 'technician_id',
+    ResultRollup.CONFIG: 'pcb__batch__test_config_type_id',
+}
+FINISHED = Q(result__in=[PcbTestResult.PASSED, PcbTestResult.FAILED])
+COUNT_FIELDS = ['tested', 'passed', 'failed', 'signed_off']
+UNIQUE_FIELDS = ['period', 'dimension', 'key_id', 'bucket_start']
+PERIOD_LENGTHS = {ResultRollup.HOUR: timedelta(hours=1), ResultRollup.DAY: timedelta(days=1)}
+
+
+def _counts():
+    """The rollup counts of a group of test results, as aggregates"""
+    return {
+        'tested': Count('pk', filter=FINISHED),
+        'passed': Count('pk', filter=Q(result=PcbTestResult.PASSED)),
+        'failed': Count('pk', filter=Q(result=PcbTestResult.FAILED)),
+        'signed_off': Count('pk', filter=FINISHED & Q(qa_signoff__is_signed_off=True)),
+    }
+
+
+def bucket_start(moment, period):
+    """Start of the hour or day, in the current time zone, that a moment falls in"""
+    moment = timezone.localtime(moment).replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0) if period == ResultRollup.DAY else moment
+
+
+def rollup_keys(test_result):
+    """{dimension: key id} a test result is counted under"""
+    batch = test_result.pcb.batch
+    return {
+        ResultRollup.ALL: 0,
+        ResultRollup.BATCH: batch.pk,
+        ResultRollup.PCB_TYPE: batch.pcb_type_id,
+        ResultRollup.TECHNICIAN: test_result.technician_id,
+        ResultRollup.CONFIG: batch.test_config_type_id,
+    }
+
+
+def _save(rollups):
+    ResultRollup.objects.bulk_create(rollups, update_conflicts=True, unique_fields=UNIQUE_FIELDS,
+                                     update_fields=COUNT_FIELDS)
+
+
+def refresh_rollups(hour, keys):
+    """Recount the hourly rollups of the given keys for one hour, then their daily rollups.
+
+    keys is {dimension: set of key ids}, with {0} for ALL. The hour is
+    recounted from the test results of that hour with one GROUP BY per
+    dimension and the day is then summed from its hourly rollups, so a
+    refresh is always correct however often it runs. Counting and saving
+    happen in one transaction, so concurrent refreshes of an hour cannot
+    overwrite a newer count with an older one.
+    """
+    start = bucket_start(hour, ResultRollup.HOUR)
+    results = PcbTestResult.objects.filter(test_date__gte=start, test_date__lt=start + PERIOD_LENGTHS[ResultRollup.HOUR])
+    day = bucket_start(start, ResultRollup.DAY)
+    selected = Q()
+    for dimension, key_ids in keys.items():
+        selected |= Q(dimension=dimension, key_id__in=key_ids)
+    with transaction.atomic():
+        # Write before counting, so the transaction takes the write lock (waiting for it if need be)
+        # and no other refresh can commit an older count of the hour after this one
+        ResultRollup.objects.bulk_create([
+            ResultRollup(period=ResultRollup.HOUR, bucket_start=start, dimension=dimension, key_id=key_id)
+            for dimension, key_ids in keys.items() for key_id in key_ids
+        ], ignore_conflicts=True)
+        counted = {}
+        for dimension, key_ids in keys.items():
+            if dimension == ResultRollup.ALL:
+                counted[dimension, 0] = results.aggregate(**_counts())
+                continue
+            lookup = DIMENSION_LOOKUPS[dimension]
+            for row in results.filter(**{f'{lookup}__in': key_ids}).values(lookup).annotate(**_counts()).order_by():
+                counted[dimension, row.pop(lookup)] = row
+        _save([
+            ResultRollup(period=ResultRollup.HOUR, bucket_start=start, dimension=dimension, key_id=key_id,
+                         **counted.get((dimension, key_id), dict.fromkeys(COUNT_FIELDS, 0)))
+            for dimension, key_ids in keys.items() for key_id in key_ids
+        ])
+        daily = (
+            ResultRollup.objects
+            .filter(selected, period=ResultRollup.HOUR, bucket_start__gte=day,
+                    bucket_start__lt=day + PERIOD_LENGTHS[ResultRollup.DAY])
+            .values('dimension', 'key_id')
+            .annotate(**{field: Sum(field) for field in COUNT_FIELDS})
+            .order_by()
+        )
+        _save([ResultRollup(period=ResultRollup.DAY, bucket_start=day, **row) for row in daily])
+
+
+def refresh_result_rollups(test_results):
+    """Bring the rollups that count the given test results up to date.
+
+    Results of the same hour are recounted together, so a micro-batch of
+    results costs a few queries per hour it spans rather than per result.
+    """
+    hours = {}
+    for test_result in test_results:
+        keys = hours.setdefault(bucket_start(test_result.test_date, ResultRollup.HOUR), {})
+        for dimension, key_id in rollup_keys(test_result).items():
+            keys.setdefault(dimension, set()).add(key_id)
+    for hour, keys in hours.items():
+        refresh_rollups(hour, keys)
+
+
+def rebuild_rollups(since=None):
+    """Recount every rollup from the test results, optionally only from a moment on.
+
+    Returns the number of hourly and daily rollups written.
+    """
+    results = PcbTestResult.objects.all()
+    rollups = ResultRollup.objects.all()
+    if since is not None:
+        since = bucket_start(since, ResultRollup.DAY)
+        results = results.filter(test_date__gte=since)
+        rollups = rollups.filter(bucket_start__gte=since)
+
+    with transaction.atomic():
+        rollups.delete()
+        hourly = [
+            ResultRollup(period=ResultRollup.HOUR, dimension=ResultRollup.ALL, key_id=0, **row)
+            for row in results.annotate(bucket_start=TruncHour('test_date')).values('bucket_start')
+            .annotate(**_counts()).order_by()
+        ]
+        for dimension, lookup in DIMENSION_LOOKUPS.items():
+            grouped = (results.annotate(bucket_start=TruncHour('test_date')).values('bucket_start', lookup)
+                       .annotate(**_counts()).order_by())
+            hourly.extend(
+                ResultRollup(period=ResultRollup.HOUR, dimension=dimension, key_id=row.pop(lookup), **row)
+                for row in grouped
+            )
+        ResultRollup.objects.bulk_create(hourly, batch_size=500)
+
+        daily = (
+            ResultRollup.objects.filter(period=ResultRollup.HOUR)
+            .filter(**({'bucket_start__gte': since} if since is not None else {}))
+            .annotate(day=TruncDay('bucket_start'))
+            .values('day', 'dimension', 'key_id')
+            .annotate(**{field: Sum(field) for field in COUNT_FIELDS})
+            .order_by()
+        )
+        daily = [
+            ResultRollup(period=ResultRollup.DAY, bucket_start=row.pop('day'), **row)
+            for row in daily
+        ]
+        ResultRollup.objects.bulk_create(daily, batch_size=500)
+    return len(hourly), len(daily)
+
+
+def daily_rollups(dimension=ResultRollup.ALL, days=7, key_ids=None):
+    """Daily rollups of a dimension for the last days, oldest first"""
+    since = bucket_start(timezone.now(), ResultRollup.DAY) - timedelta(days=days - 1)
+    rollups = ResultRollup.objects.filter(period=ResultRollup.DAY, dimension=dimension, bucket_start__gte=since)
+    if key_ids is not None:
+        rollups = rollups.filter(key_id__in=key_ids)
+    return rollups.order_by('bucket_start', 'key_id')
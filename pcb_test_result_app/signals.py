@@ -0,0 +1,114 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.models import Case, F, PositiveIntegerField, Value, When
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+
+from test_config_type_app.signals import steps_renumbered
+from .models import (
+    CurrentMeasurementResult,
+    FrequencyMeasurementResult,
+    InstructionResult,
+    MeasurementResult,
+    PcbTestResult,
+    ResistanceMeasurementResult,
+    VoltageMeasurementResult,
+    YesNoQuestionResult,
+)
+from .spc import reset_spc_statistics
+from .summary import count_new_result, refresh_result_counters
+
+
+# Proxy models send signals with their own class as sender
+STEP_RESULT_SENDERS = [
+    MeasurementResult,
+    VoltageMeasurementResult,
+    CurrentMeasurementResult,
+    ResistanceMeasurementResult,
+    FrequencyMeasurementResult,
+    YesNoQuestionResult,
+    InstructionResult,
+]
+
+# Set while a caller writes many rows and refreshes the counters itself
+_refresh_suspended = ContextVar('result_counter_refresh_suspended', default=False)
+
+
+@contextmanager
+def suspend_counter_refresh():
+    """Skip the per-row counter updates inside the block.
+
+    The caller must call refresh_result_counters once the rows are written.
+    """
+    token = _refresh_suspended.set(True)
+    try:
+        yield
+    finally:
+        _refresh_suspended.reset(token)
+
+
+def update_result_counters(sender, instance, created=False, **kwargs):
+    """Keep the summary counters of a test result in step with its result rows.
+
+    A new row is added to the counters with increments; a changed or
+    deleted row, which is rare, makes them be recounted.
+    """
+    if kwargs.get('raw') or _refresh_suspended.get():
+        return
+    if created:
+        count_new_result(instance)
+    else:
+        refresh_result_counters(instance.test_result_id)
+
+
+for sender in STEP_RESULT_SENDERS:
+    post_save.connect(update_result_counters, sender=sender, dispatch_uid=f'update_result_counters_save_{sender.__name__}')
+    post_delete.connect(update_result_counters, sender=sender, dispatch_uid=f'update_result_counters_delete_{sender.__name__}')
+
+
+# Proxy models of the measurements table send signals with their own class as sender
+MEASUREMENT_SENDERS = [
+    MeasurementResult,
+    VoltageMeasurementResult,
+    CurrentMeasurementResult,
+    ResistanceMeasurementResult,
+    FrequencyMeasurementResult,
+]
+
+
+def reset_measurement_statistics(sender, instance, **kwargs):
+    """Start the SPC statistics of a deleted measurement's parameter over"""
+    reset_spc_statistics(instance.test_result_id, [(instance.kind, instance.parameter_name)])
+
+
+for sender in MEASUREMENT_SENDERS:
+    post_delete.connect(reset_measurement_statistics, sender=sender,
+                        dispatch_uid=f'reset_measurement_statistics_{sender.__name__}')
+
+
+def remap_step_cursors(sender, test_config, order_map, **kwargs):
+    """Move the step cursors of the config's test results to the renumbered positions.
+
+    Each cursor still points at the same next step. Results pinned to a
+    published config version keep the step orders of that version.
+    """
+    old_orders = sorted(order_map)
+    end = max(order_map.values(), default=0) + 1
+    test_results = PcbTestResult.objects.filter(pcb__batch__test_config_type=test_config, config_version=None,
+                                                next_step_order__gt=0)
+    cases = []
+    for cursor in test_results.order_by().values_list('next_step_order', flat=True).distinct():
+        position = bisect_left(old_orders, cursor)
+        new_cursor = order_map[old_orders[position]] if position < len(old_orders) else end
+        if new_cursor != cursor:
+            cases.append(When(next_step_order=cursor, then=Value(new_cursor)))
+    if cases:
+        # One CASE over the old values, so no row is moved twice
+        test_results.update(next_step_order=Case(*cases, default=F('next_step_order'),
+                                                 output_field=PositiveIntegerField()),
+                            updated_at=timezone.now())
+
+
+steps_renumbered.connect(remap_step_cursors, dispatch_uid='remap_step_cursors')
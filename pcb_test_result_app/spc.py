@@ -0,0 +1,238 @@
+import math
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Q
+
+from .models import MeasurementResult, SpcStatistics
+from .regrade import measurement_steps
+
+
+SPC_CHUNK_SIZE = 50000  # Measured values read per chunk while refreshing statistics
+CHART_POINTS = 200  # Latest measurements shown on a control chart
+D2 = 1.128  # Bias constant of the mean moving range of two consecutive points
+
+# Western Electric rules: (name, points in the window, points that must lie
+# beyond the zone on the same side, zone in sigmas)
+WESTERN_ELECTRIC_RULES = [
+    ('rule_1', 1, 1, 3.0),  # One point beyond 3 sigma
+    ('rule_2', 3, 2, 2.0),  # Two of three beyond 2 sigma
+    ('rule_3', 5, 4, 1.0),  # Four of five beyond 1 sigma
+    ('rule_4', 8, 8, 0.0),  # Eight in a row on one side of the center line
+]
+LONGEST_RULE_WINDOW = max(window for name, window, needed, zone in WESTERN_ELECTRIC_RULES)
+
+
+def spc_parameters(test_config):
+    """The measured parameters of a config as {(kind, parameter name): (min, max)}.
+
+    A parameter measured by several steps takes the limits of the first one.
+    """
+    parameters = {}
+    for step in measurement_steps(test_config):
+        parameters.setdefault((step.step_type, step.parameter_name), (step.min_value, step.max_value))
+    return parameters
+
+
+def parameter_measurements(batch, kind, parameter_name):
+    """Measurements of one parameter within a batch"""
+    return MeasurementResult.objects.filter(test_result__pcb__batch=batch, kind=kind, parameter_name=parameter_name)
+
+
+def merge_values(stats, values):
+    """Fold an array of new values, in measurement order, into running statistics.
+
+    Count, mean and sum of squared deviations are merged with Chan's
+    parallel update, so the result is the same as computing them over all
+    values at once without keeping the old values around.
+    """
+    if not len(values):
+        return
+    count = len(values)
+    mean = float(values.mean())
+    sum_squares = float(((values - mean) ** 2).sum())
+    total = stats.count + count
+    delta = mean - stats.mean
+    stats.sum_squares += sum_squares + delta * delta * stats.count * count / total
+    stats.mean += delta * count / total
+    stats.count = total
+
+    moving_ranges = float(np.abs(np.diff(values)).sum())
+    if stats.last_value is not None:
+        moving_ranges += abs(float(values[0]) - stats.last_value)
+    stats.moving_range_sum += moving_ranges
+    stats.last_value = float(values[-1])
+
+
+def refresh_spc_statistics(test_config, batch, chunk_size=SPC_CHUNK_SIZE):
+    """Bring the SPC statistics of every parameter of a config in a batch up to date.
+
+    Only measurements recorded since the previous refresh are read, in
+    primary key chunks of bare values. Statistics dropped by
+    reset_spc_statistics are rebuilt from every measurement. Returns the
+    statistics by (kind, parameter name).
+    """
+    statistics = {}
+    for kind, parameter_name in spc_parameters(test_config):
+        key = {'test_config': test_config, 'batch': batch, 'kind': kind, 'parameter_name': parameter_name}
+        with transaction.atomic():
+            # Write before reading, so the transaction takes the write lock (waiting for it if need be)
+            # instead of failing to upgrade a read once another writer has committed
+            SpcStatistics.objects.bulk_create([SpcStatistics(**key)], ignore_conflicts=True)
+            stats = SpcStatistics.objects.get(**key)
+            rows = parameter_measurements(batch, kind, parameter_name).order_by('pk')
+            last_id = stats.last_measurement_id
+            while True:
+                chunk = list(rows.filter(pk__gt=last_id).values_list('pk', 'measured_value')[:chunk_size])
+                if not chunk:
+                    break
+                columns = np.array(chunk, dtype=np.float64)
+                merge_values(stats, columns[:, 1])
+                last_id = chunk[-1][0]
+            if last_id != stats.last_measurement_id:
+                stats.last_measurement_id = last_id
+                stats.save()
+        statistics[kind, parameter_name] = stats
+    return statistics
+
+
+def refresh_result_spc(test_results):
+    """Refresh the SPC statistics of the batches the given test results belong to"""
+    batches = {test_result.pcb.batch_id: test_result.pcb.batch for test_result in test_results}
+    for batch in batches.values():
+        refresh_spc_statistics(batch.test_config_type, batch)
+
+
+def reset_spc_statistics(test_result_id, parameters=None):
+    """Drop the SPC statistics of a test result's batch, or of some (kind, parameter name) pairs of it.
+
+    Running statistics can only take in new measurements, so a measurement
+    that was changed or deleted means starting them over; the next refresh
+    recounts them.
+    """
+    statistics = SpcStatistics.objects.filter(batch__pcbs__test_results=test_result_id)
+    if parameters is not None:
+        matching = Q()
+        for kind, parameter_name in parameters:
+            matching |= Q(kind=kind, parameter_name=parameter_name)
+        statistics = statistics.filter(matching)
+    statistics.delete()
+
+
+def stored_spc_statistics(test_config, batch):
+    """The statistics last refreshed for each parameter of a config in a batch, without writing.
+
+    A parameter not refreshed yet gets empty, unsaved statistics.
+    """
+    stored = {
+        (stats.kind, stats.parameter_name): stats
+        for stats in SpcStatistics.objects.filter(test_config=test_config, batch=batch)
+    }
+    return {
+        (kind, parameter_name): stored.get((kind, parameter_name)) or SpcStatistics(
+            test_config=test_config, batch=batch, kind=kind, parameter_name=parameter_name,
+        )
+        for kind, parameter_name in spc_parameters(test_config)
+    }
+
+
+def standard_deviation(stats):
+    """Sample standard deviation of all values, or None below two values"""
+    return math.sqrt(stats.sum_squares / (stats.count - 1)) if stats.count > 1 else None
+
+
+def within_sigma(stats):
+    """Short-term sigma estimated from the mean moving range, or None below two values"""
+    return stats.moving_range_sum / (stats.count - 1) / D2 if stats.count > 1 else None
+
+
+def capability(stats, lower_limit, upper_limit):
+    """Return (Cp, Cpk) of the statistics against the limits; None where undefined"""
+    sigma = within_sigma(stats)
+    if not sigma:
+        return None, None
+    cp = (upper_limit - lower_limit) / (6 * sigma) if lower_limit is not None and upper_limit is not None else None
+    distances = [distance for distance in (
+        upper_limit - stats.mean if upper_limit is not None else None,
+        stats.mean - lower_limit if lower_limit is not None else None,
+    ) if distance is not None]
+    cpk = min(distances) / (3 * sigma) if distances else None
+    return cp, cpk
+
+
+def _window_counts(flags, window):
+    """Number of set flags in the window ending at each point"""
+    totals = np.cumsum(flags, dtype=np.int64)
+    counts = totals.copy()
+    counts[window:] -= totals[:-window]
+    return counts
+
+
+def western_electric_violations(values, center, sigma):
+    """Return {rule name: boolean array} marking the points that complete a rule violation.
+
+    A point is marked when the window ending at it breaks the rule and the
+    point itself lies in the offending zone.
+    """
+    if not sigma:
+        return {name: np.zeros(len(values), dtype=bool) for name, window, needed, zone in WESTERN_ELECTRIC_RULES}
+    z = (np.asarray(values, dtype=np.float64) - center) / sigma
+    violations = {}
+    for name, window, needed, zone in WESTERN_ELECTRIC_RULES:
+        above = z > zone
+        below = z < -zone
+        violations[name] = (
+            (above & (_window_counts(above, window) >= needed)) |
+            (below & (_window_counts(below, window) >= needed))
+        )
+    return violations
+
+
+def control_chart(stats, points=CHART_POINTS):
+    """Individuals control chart of the latest measurements of a parameter.
+
+    The center line and limits come from the running statistics. Earlier
+    values are read along with the shown points so rules spanning several
+    points are also checked at the start of the chart.
+    """
+    rows = list(
+        parameter_measurements(stats.batch, stats.kind, stats.parameter_name)
+        .filter(pk__lte=stats.last_measurement_id)
+        .order_by('-pk')
+        .values_list('pk', 'measured_value')[:points + LONGEST_RULE_WINDOW - 1]
+    )
+    rows.reverse()
+    sigma = within_sigma(stats)
+    violations = western_electric_violations([value for pk, value in rows], stats.mean, sigma)
+    shown = max(len(rows) - points, 0)
+    return {
+        'center': stats.mean,
+        'upper_control_limit': stats.mean + 3 * sigma if sigma else None,
+        'lower_control_limit': stats.mean - 3 * sigma if sigma else None,
+        'points': [
+            {
+                'measurement_id': pk,
+                'value': value,
+                'rules': [name for name, flags in violations.items() if flags[index]],
+            }
+            for index, (pk, value) in enumerate(rows) if index >= shown
+        ],
+    }
+
+
+def spc_summary(stats, limits):
+    """JSON-ready statistics and capability of one parameter"""
+    lower_limit, upper_limit = limits
+    cp, cpk = capability(stats, lower_limit, upper_limit)
+    return {
+        'kind': stats.kind,
+        'parameter': stats.parameter_name,
+        'count': stats.count,
+        'mean': stats.mean if stats.count else None,
+        'std': standard_deviation(stats),
+        'sigma_within': within_sigma(stats),
+        'lower_limit': lower_limit,
+        'upper_limit': upper_limit,
+        'cp': cp,
+        'cpk': cpk,
+    }
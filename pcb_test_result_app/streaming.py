@@ -0,0 +1,235 @@
+import json
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+from django.db import transaction
+
+from batch_app.models import Pcb
+from test_config_type_app.config_cache import cached_version
+from .ingest import IngestError, grade_reading, is_failure, save_step_results, set_run_outcome, step_id
+from .models import PcbTestResult
+from .rollups import refresh_result_rollups
+from .spc import refresh_result_spc
+from .summary import refresh_result_counters
+
+
+STREAM_BATCH_SIZE = 50  # Records written per transaction by default
+MAX_STREAM_BATCH_SIZE = 200  # Largest micro-batch a client may ask for
+STREAM_MAX_DELAY = 0.2  # Seconds a record waits for its batch to fill before the partial batch is written
+MAX_OPEN_RUNS = 64  # Serials with an open test run kept in memory
+MAX_RECORD_BYTES = 64 * 1024  # Longest accepted NDJSON line
+
+
+class _Run:
+    """An open test run of one PCB within a stream"""
+
+    def __init__(self, pcb, technician):
+        version, compiled = cached_version(pcb.batch.test_config_type)
+        self.steps = compiled.by_id
+        self.test_result = PcbTestResult(pcb=pcb, technician=technician, config_version=version)
+        self.recorded = set()
+        self.failed = False
+
+
+def read_records(stream, max_bytes=MAX_RECORD_BYTES):
+    """Yield (line number, bytes or None) for each line of an NDJSON stream.
+
+    Lines are read one at a time so nothing beyond the current record is
+    buffered; a line longer than max_bytes is skipped and yielded as None.
+    """
+    number = 0
+    oversized = False
+    while True:
+        line = stream.readline(max_bytes)
+        if not line:
+            return
+        complete = line.endswith(b'\n')
+        if oversized:
+            # Still draining the rest of an oversized line
+            oversized = not complete
+            continue
+        number += 1
+        if not complete and len(line) >= max_bytes:
+            oversized = True
+            yield number, None
+        elif line.strip():
+            yield number, line
+
+
+class _Reader:
+    """Reads an iterator in a helper thread, at most one item ahead, so the next item can be waited for with a timeout"""
+    END = object()
+
+    def __init__(self, items):
+        self.queue = queue.Queue(maxsize=1)
+        self.stopped = threading.Event()
+        threading.Thread(target=self._read, args=(items,), daemon=True).start()
+
+    def _put(self, item, error=None):
+        while not self.stopped.is_set():
+            try:
+                self.queue.put((item, error), timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _read(self, items):
+        try:
+            for item in items:
+                if not self._put(item):
+                    return
+            self._put(self.END)
+        except Exception as e:
+            self._put(self.END, e)
+
+    def get(self, timeout=None):
+        """The next item, or END once the items are exhausted; raises queue.Empty after timeout seconds"""
+        item, error = self.queue.get(timeout=timeout)
+        if error is not None:
+            raise error
+        return item
+
+    def stop(self):
+        self.stopped.set()
+
+
+class StreamIngestor:
+    """Grades streamed fixture records and writes them in micro-batches.
+
+    Each serial number gets one PcbTestResult for the life of the stream,
+    until a record with "end": true closes it or it is evicted from the
+    bounded set of open runs. Each record is acknowledged once the
+    micro-batch holding it has been committed, so a client reading the acks
+    never runs more than one batch ahead of the database. A batch is
+    committed when it holds batch_size records, or once its first record
+    has waited max_delay seconds.
+    """
+
+    def __init__(self, technician, batch_size=STREAM_BATCH_SIZE, max_delay=STREAM_MAX_DELAY,
+                 max_open_runs=MAX_OPEN_RUNS):
+        self.technician = technician
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.max_open_runs = max_open_runs
+        self.runs = OrderedDict()  # serial number -> _Run, least recently used first
+        self.rows = []
+        self.acks = []  # (line number, run or None, error or None)
+        self.closing = []
+        self.pending_since = None
+
+    def ingest(self, records):
+        """Feed (line number, line) records and yield every ack, ending with those of close().
+
+        The records are read in a helper thread, so a partial batch is still
+        committed on time while the next line is slow to arrive.
+        """
+        reader = _Reader(records)
+        try:
+            while True:
+                try:
+                    record = reader.get(timeout=self.flush_delay())
+                except queue.Empty:
+                    yield from self.flush()
+                    continue
+                if record is _Reader.END:
+                    break
+                yield from self.feed(*record)
+        finally:
+            reader.stop()
+        yield from self.close()
+
+    def flush_delay(self):
+        """Seconds until the pending batch is due to be committed, or None when nothing is pending"""
+        if not self.acks:
+            return None
+        return max(self.pending_since + self.max_delay - time.monotonic(), 0)
+
+    def feed(self, number, line):
+        """Take one record and return the acks of any batch it completed"""
+        if not self.acks:
+            self.pending_since = time.monotonic()
+        try:
+            if line is None:
+                raise IngestError(f'Record is longer than {MAX_RECORD_BYTES} bytes.')
+            self._record(number, json.loads(line))
+        except (IngestError, UnicodeDecodeError, ValueError) as e:
+            self.acks.append((number, None, str(e)))
+        if len(self.rows) >= self.batch_size or len(self.acks) >= self.batch_size:
+            return self.flush()
+        return []
+
+    def close(self):
+        """Close every open run and return the remaining acks"""
+        self.closing.extend(self.runs.values())
+        self.runs.clear()
+        return self.flush()
+
+    def _record(self, number, record):
+        if not isinstance(record, dict):
+            raise IngestError('Record must be a JSON object.')
+        run = self._open_run(str(record.get('serial_number', '')).strip())
+        if record.get('end') is True:
+            self.runs.pop(run.test_result.pcb.serial_number)
+            self.closing.append(run)
+            self.acks.append((number, run, None))
+            return
+
+        step = run.steps.get(step_id(record))
+        if step is None:
+            raise IngestError('Unknown "step_id" for this PCB\'s test configuration.')
+        if step.id in run.recorded:
+            raise IngestError(f'Step {step.id} was already recorded for this run.')
+        row = grade_reading(run.test_result, step, record)
+        run.recorded.add(step.id)
+        run.failed = run.failed or is_failure(row)
+        self.rows.append(row)
+        self.acks.append((number, run, None))
+
+    def _open_run(self, serial_number):
+        """Return the open run of a serial number, starting one if needed"""
+        run = self.runs.get(serial_number)
+        if run is not None:
+            self.runs.move_to_end(serial_number)
+            return run
+
+        pcb = Pcb.objects.select_related('batch__test_config_type').filter(serial_number=serial_number).first()
+        if pcb is None:
+            raise IngestError(f'No PCB with serial number "{serial_number}".')
+        run = self.runs[serial_number] = _Run(pcb, self.technician)
+        if len(self.runs) > self.max_open_runs:
+            # The least recently used run is finished with whatever it has
+            self.closing.append(self.runs.popitem(last=False)[1])
+        return run
+
+    def flush(self):
+        """Commit the pending micro-batch and return its acks"""
+        # Runs by identity, as unsaved model instances are not hashable; runs
+        # that never recorded a step are not written at all
+        touched = {id(run): run for number, run, error in self.acks if run is not None}
+        touched.update((id(run), run) for run in self.closing)
+        touched = [run for run in touched.values() if run.recorded or run.test_result.pk]
+        if touched:
+            with transaction.atomic():
+                for run in touched:
+                    if run.test_result.pk is None:
+                        run.test_result.save()
+                save_step_results(self.rows)
+                for run in self.closing:
+                    if run.test_result.pk:
+                        set_run_outcome(run.test_result, run.steps, run.recorded, run.failed)
+                        run.test_result.save(update_fields=['result', 'next_step_order', 'updated_at'])
+                refresh_result_counters(PcbTestResult.objects.filter(pk__in=[run.test_result.pk for run in touched]))
+            refresh_result_rollups([run.test_result for run in self.closing
+                                    if run.test_result.pk and run.test_result.result != PcbTestResult.INCOMPLETE])
+            refresh_result_spc([run.test_result for run in self.closing if run.test_result.pk])
+
+        acks = [
+            {'line': number, 'ok': False, 'error': error} if error else
+            {'line': number, 'ok': True, 'test_result_id': run.test_result.pk}
+            for number, run, error in self.acks
+        ]
+        self.rows, self.acks, self.closing = [], [], []
+        return acks
@@ -0,0 +1,139 @@
+from django.db.models import Count, Exists, F, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from test_config_type_app.models import TestStep
+from .models import InstructionResult, MeasurementResult, PcbTestResult, YesNoQuestionResult
+
+
+# (name in test_counts, result model, rows of the category, rows that passed)
+SUMMARY_CATEGORIES = [
+    ('voltage', MeasurementResult, Q(kind=MeasurementResult.VOLTAGE), Q(passed=True)),
+    ('current', MeasurementResult, Q(kind=MeasurementResult.CURRENT), Q(passed=True)),
+    ('resistance', MeasurementResult, Q(kind=MeasurementResult.RESISTANCE), Q(passed=True)),
+    ('frequency', MeasurementResult, Q(kind=MeasurementResult.FREQUENCY), Q(passed=True)),
+    ('questions', YesNoQuestionResult, Q(), Q(passed=True)),
+    ('instructions', InstructionResult, Q(), Q(acknowledged=True)),
+]
+
+
+def _count_subquery(model, condition):
+    """Correlated COUNT of a result model's rows for the outer test result"""
+    counts = (
+        model.objects.filter(condition, test_result=OuterRef('pk'))
+        .order_by()
+        .values('test_result')
+        .annotate(count=Count('pk'))
+        .values('count')
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def summary_annotations():
+    """Return the <category>_total / <category>_passed annotations for PcbTestResult"""
+    annotations = {}
+    for name, model, condition, passed in SUMMARY_CATEGORIES:
+        annotations[f'{name}_total'] = _count_subquery(model, condition)
+        annotations[f'{name}_passed'] = _count_subquery(model, condition & passed)
+    return annotations
+
+
+def with_result_summary(queryset):
+    """Annotate a PcbTestResult queryset with per-category totals and passed counts.
+
+    All counts are computed by the database as part of the same SELECT, so
+    fetching a result together with its summary is a single round-trip.
+    """
+    return queryset.annotate(**summary_annotations())
+
+
+def get_result_summary(test_result):
+    """Return (test_counts, all_tests_passed) for a test result.
+
+    Uses the annotations from with_result_summary when present, otherwise
+    reads them with one query.
+    """
+    keys = list(summary_annotations())
+    if all(hasattr(test_result, key) for key in keys):
+        values = {key: getattr(test_result, key) for key in keys}
+    else:
+        values = with_result_summary(PcbTestResult.objects.filter(pk=test_result.pk)).values(*keys).get()
+
+    test_counts = {
+        name: {'total': values[f'{name}_total'], 'passed': values[f'{name}_passed']}
+        for name, model, condition, passed in SUMMARY_CATEGORIES
+    }
+    all_tests_passed = all(counts['passed'] == counts['total'] for counts in test_counts.values())
+    return test_counts, all_tests_passed
+
+
+# (result model, rows that passed) for every kind of step result
+STEP_RESULT_MODELS = [
+    (MeasurementResult, Q(passed=True)),
+    (YesNoQuestionResult, Q(passed=True)),
+    (InstructionResult, Q(acknowledged=True)),
+]
+
+
+def counter_updates():
+    """Return the update() expressions for the summary counters of PcbTestResult"""
+    totals = [_count_subquery(model, Q()) for model, passed in STEP_RESULT_MODELS]
+    passes = [_count_subquery(model, passed) for model, passed in STEP_RESULT_MODELS]
+    failures = [_count_subquery(model, ~passed) for model, passed in STEP_RESULT_MODELS]
+
+    # Lowest-order step with a failing result row for the outer test result
+    failing = [
+        Exists(model.objects.filter(~passed, test_step=OuterRef('pk'), test_result=OuterRef(OuterRef('pk'))))
+        for model, passed in STEP_RESULT_MODELS
+    ]
+    first_failed_step = (
+        TestStep.objects.filter(failing[0] | failing[1] | failing[2])
+        .order_by('order')
+        .values('pk')[:1]
+    )
+    return {
+        'total_steps': totals[0] + totals[1] + totals[2],
+        'passed_steps': passes[0] + passes[1] + passes[2],
+        'failed_steps': failures[0] + failures[1] + failures[2],
+        'first_failed_step': Subquery(first_failed_step),
+    }
+
+
+# Field that tells whether a row of each result model passed
+PASSED_FIELDS = {
+    MeasurementResult: 'passed',
+    YesNoQuestionResult: 'passed',
+    InstructionResult: 'acknowledged',
+}
+
+
+def count_new_result(result_row):
+    """Add a newly written result row to the counters of its test result.
+
+    One UPDATE of F() increments, for the execute view's one row per step.
+    The first failed step is only set when none is recorded yet, which is
+    right as steps are executed in order; writers that add or change rows
+    in any other order call refresh_result_counters instead.
+    """
+    passed = getattr(result_row, PASSED_FIELDS[result_row._meta.concrete_model])
+    updates = {'total_steps': F('total_steps') + 1}
+    if passed:
+        updates['passed_steps'] = F('passed_steps') + 1
+    else:
+        updates['failed_steps'] = F('failed_steps') + 1
+        if result_row.test_step_id is not None:
+            updates['first_failed_step'] = Coalesce(F('first_failed_step'), Value(result_row.test_step_id))
+    return PcbTestResult.objects.filter(pk=result_row.test_result_id).update(**updates, updated_at=timezone.now())
+
+
+def refresh_result_counters(test_results):
+    """Recompute the summary counters of the given test results from their rows.
+
+    Accepts a PcbTestResult queryset or a single primary key. The counters are
+    computed by the database inside one UPDATE statement, so they always match
+    the result rows committed in the same transaction. updated_at is set
+    too, as update() skips auto_now and incremental backups rely on it.
+    """
+    if not hasattr(test_results, 'update'):
+        test_results = PcbTestResult.objects.filter(pk=test_results)
+    return test_results.update(**counter_updates(), updated_at=timezone.now())
@@ -1,3 +1,988 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+from contextlib import closing
+from datetime import datetime
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import openpyxl
+
+from django.contrib.auth.models import Permission, User
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from batch_app.models import Batch, Pcb
+from pcb_type_app.models import PcbType
+from test_config_type_app.models import TestConfigType, TestStep
+from test_config_type_app.ordering import renumber_steps
+from test_config_type_app.versions import publish_version
+from .models import (
+    FrequencyMeasurementResult,
+    InstructionResult,
+    MeasurementResult,
+    PcbTestResult,
+    ResultRollup,
+    SpcStatistics,
+    VoltageMeasurementResult,
+    YesNoQuestionResult,
+)
+from .rollups import rebuild_rollups, refresh_result_rollups
+from .export import export_measurements
+from .progress import StepProgress
+from .management.commands.benchmark_test_execution import copy_database
+from .reports import csv_report, xlsx_report
+from .regrade import newly_failing_results, regrade_measurements
+from .spc import refresh_spc_statistics, standard_deviation, western_electric_violations
+from .streaming import StreamIngestor
+from .summary import get_result_summary
+from .views import PCBS_PER_PAGE, RESULTS_PER_PAGE, TYPEAHEAD_LIMIT
+
+
+def create_test_config(name, step_count):
+    """Create a test config alternating voltage, question and instruction steps"""
+    test_config = TestConfigType.objects.create(name=name)
+    for order in range(1, step_count + 1):
+        if order % 3 == 1:
+            TestStep.objects.create(test_config=test_config, step_type='VOLTAGE', order=order,
+                                    parameter_name=f'V{order}', min_value=1.0, max_value=2.0, unit='V')
+        elif order % 3 == 2:
+            TestStep.objects.create(test_config=test_config, step_type='QUESTION', order=order,
+                                    question_text=f'Question {order}?', required_answer=True)
+        else:
+            TestStep.objects.create(test_config=test_config, step_type='INSTRUCTION', order=order,
+                                    instruction_text=f'Instruction {order}')
+    return test_config
+
+
+class PcbTestExecuteStepsTests(TestCase):
+    # Queries allowed for one step submission: session, user, permissions,
+    # PCB with batch and config, test result with its config version, insert,
+    # completed entries, and the savepoint around the write (a transaction
+    # outside tests); the steps come from the compiled version in memory.
+    MAX_QUERIES_PER_STEP = 12
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('technician', password='secret')
+        cls.user.user_permissions.add(Permission.objects.get(codename='add_pcbtestresult'))
+        cls.pcb_type = PcbType.objects.create(name='Controller')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def create_pcb(self, step_count):
+        test_config = create_test_config(f'Config {step_count}', step_count)
+        batch = Batch.objects.create(name=f'Batch {step_count}', pcb_type=self.pcb_type,
+                                     test_config_type=test_config, hardware_version='1.0')
+        return Pcb.objects.create(serial_number=f'SN-{step_count}', batch=batch)
+
+    def submit_step(self, pcb, step):
+        data = {'step_id': step.id}
+        if step.step_type == 'VOLTAGE':
+            data['measured_value'] = '1.5'
+        elif step.step_type == 'QUESTION':
+            data['user_answer'] = 'true'
+        return self.client.post(reverse('pcb_test_execute_steps', args=[pcb.id]), data)
+
+    def count_step_queries(self, step_count):
+        pcb = self.create_pcb(step_count)
+        url = reverse('pcb_test_execute_steps', args=[pcb.id])
+        self.client.get(url)
+        steps = list(pcb.batch.test_config_type.steps.order_by('order'))
+        self.submit_step(pcb, steps[0])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.submit_step(pcb, steps[1])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['current_step'].id, steps[2].id)
+        # Start the next PCB with a fresh session so it gets its own result
+        self.client.logout()
+        self.client.force_login(self.user)
+        return len(queries)
+
+    def test_step_submission_query_count_is_bounded(self):
+        self.assertLessEqual(self.count_step_queries(6), self.MAX_QUERIES_PER_STEP)
+
+    def test_step_submission_query_count_does_not_grow_with_steps(self):
+        self.assertEqual(self.count_step_queries(6), self.count_step_queries(60))
+
+    def test_step_submission_increments_the_counters(self):
+        pcb = self.create_pcb(3)
+        steps = list(pcb.batch.test_config_type.steps.order_by('order'))
+        with CaptureQueriesContext(connection) as queries:
+            self.submit_step(pcb, steps[0])
+        counter_updates = [query['sql'] for query in queries
+                           if query['sql'].startswith('UPDATE "pcb_test_result_app_pcbtestresult"')
+                           and 'total_steps' in query['sql']]
+        self.assertEqual(len(counter_updates), 1)
+        self.assertNotIn('SELECT', counter_updates[0])
+        test_result = PcbTestResult.objects.get(pcb=pcb)
+        self.assertEqual((test_result.total_steps, test_result.passed_steps, test_result.failed_steps), (1, 1, 0))
+
+    def test_steps_advance_to_summary(self):
+        pcb = self.create_pcb(4)
+        steps = list(pcb.batch.test_config_type.steps.order_by('order'))
+        for index, step in enumerate(steps):
+            response = self.submit_step(pcb, step)
+            self.assertEqual(response.context['completed_steps'], index + 1)
+        self.assertTrue(response.context['is_summary_page'])
+        test_result = PcbTestResult.objects.get(pcb=pcb)
+        self.assertEqual(test_result.voltage_measurements.count(), 2)
+        self.assertEqual(test_result.yes_no_questions.count(), 1)
+        self.assertEqual(test_result.instructions.count(), 1)
+
+    def test_step_recorded_by_a_concurrent_submission_is_rolled_back(self):
+        pcb = self.create_pcb(3)
+        steps = list(pcb.batch.test_config_type.steps.order_by('order'))
+        self.client.get(reverse('pcb_test_execute_steps', args=[pcb.id]))
+        load = StepProgress.load
+
+        def load_then_lose_the_race(progress, test_result):
+            load(progress, test_result)
+            # The other submission moves the cursor after this one has read it
+            PcbTestResult.objects.filter(pk=test_result.pk).update(next_step_order=steps[0].order + 1)
+            return progress
+
+        with mock.patch.object(StepProgress, 'load', load_then_lose_the_race):
+            response = self.submit_step(pcb, steps[0])
+        self.assertEqual([str(message) for message in response.context['messages']],
+                         ['This step has already been recorded.'])
+        self.assertEqual(response.context['current_step'].id, steps[1].id)
+        test_result = PcbTestResult.objects.get(pcb=pcb)
+        self.assertFalse(test_result.voltage_measurements.exists())
+        self.assertEqual(test_result.total_steps, 0)
+
+    def test_step_from_another_config_is_rejected(self):
+        pcb = self.create_pcb(3)
+        other_step = create_test_config('Other', 1).steps.get()
+        self.client.get(reverse('pcb_test_execute_steps', args=[pcb.id]))
+        response = self.submit_step(pcb, other_step)
+        self.assertEqual(response.status_code, 404)
+
+    def test_steps_sharing_a_name_are_each_executed(self):
+        pcb = self.create_pcb(0)
+        test_config = pcb.batch.test_config_type
+        for order in (1, 2):
+            TestStep.objects.create(test_config=test_config, step_type='VOLTAGE', order=order,
+                                    parameter_name='VCC', min_value=1.0, max_value=2.0, unit='V')
+        steps = list(test_config.steps.order_by('order'))
+        response = self.submit_step(pcb, steps[0])
+        self.assertEqual(response.context['current_step'].id, steps[1].id)
+        response = self.submit_step(pcb, steps[1])
+        self.assertTrue(response.context['is_summary_page'])
+        test_result = PcbTestResult.objects.get(pcb=pcb)
+        self.assertEqual(
+            list(test_result.voltage_measurements.order_by('id').values_list('test_step', flat=True)),
+            [steps[0].id, steps[1].id],
+        )
+        self.assertEqual(test_result.next_step_order, 3)
+
+    def test_renumbering_steps_keeps_the_next_step(self):
+        pcb = self.create_pcb(3)
+        steps = list(pcb.batch.test_config_type.steps.order_by('order'))
+        self.submit_step(pcb, steps[0])
+        renumber_steps(pcb.batch.test_config_type)
+        publish_version(pcb.batch.test_config_type)
+        # The running test keeps the step orders of its own version
+        self.assertEqual(PcbTestResult.objects.get(pcb=pcb).next_step_order, 2)
+        response = self.client.get(reverse('pcb_test_execute_steps', args=[pcb.id]))
+        self.assertEqual(response.context['current_step'].id, steps[1].id)
+
+    def test_running_test_keeps_its_version_when_the_config_changes(self):
+        pcb = self.create_pcb(3)
+        test_config = pcb.batch.test_config_type
+        steps = list(test_config.steps.order_by('order'))
+        self.submit_step(pcb, steps[0])
+        test_config.steps.filter(pk=steps[1].pk).update(question_text='Changed?')
+        TestStep.objects.filter(pk=steps[2].pk).delete()
+        new_version = publish_version(test_config)
+        response = self.submit_step(pcb, steps[1])
+        self.assertEqual(response.context['current_step'].instruction_text, steps[2].instruction_text)
+        response = self.submit_step(pcb, steps[2])
+        self.assertTrue(response.context['is_summary_page'])
+        test_result = PcbTestResult.objects.get(pcb=pcb)
+        self.assertNotEqual(test_result.config_version, new_version)
+        self.assertEqual(test_result.yes_no_questions.get().question_text, 'Question 2?')
+        self.assertEqual(test_result.instructions.get().test_step_id, steps[2].id)
+
+    def test_resubmitted_step_is_not_recorded_twice(self):
+        pcb = self.create_pcb(3)
+        steps = list(pcb.batch.test_config_type.steps.order_by('order'))
+        self.submit_step(pcb, steps[0])
+        response = self.submit_step(pcb, steps[0])
+        self.assertEqual(response.context['current_step'].id, steps[1].id)
+        self.assertEqual(PcbTestResult.objects.get(pcb=pcb).voltage_measurements.count(), 1)
+
+
+class MeasurementResultTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user('technician', password='secret')
+        test_config = TestConfigType.objects.create(name='Config')
+        batch = Batch.objects.create(name='Batch', pcb_type=PcbType.objects.create(name='Controller'),
+                                     test_config_type=test_config, hardware_version='1.0')
+        pcb = Pcb.objects.create(serial_number='SN-1', batch=batch)
+        cls.test_result = PcbTestResult.objects.create(pcb=pcb, technician=user)
+
+    def test_kind_accessors_read_the_measurements_table(self):
+        VoltageMeasurementResult.objects.create(test_result=self.test_result, parameter_name='VCC',
+                                                measured_value=3.3, min_value=3.0, max_value=3.6, passed=True)
+        FrequencyMeasurementResult.objects.create(test_result=self.test_result, parameter_name='CLK',
+                                                  measured_value=9.0, min_value=10.0, max_value=12.0)
+        self.assertEqual(
+            list(self.test_result.measurements.order_by('id').values_list('kind', 'unit')),
+            [('VOLTAGE', 'V'), ('FREQUENCY', 'Hz')],
+        )
+        self.assertEqual(self.test_result.voltage_measurements.get().parameter_name, 'VCC')
+        self.assertEqual(self.test_result.frequency_measurements.get().parameter_name, 'CLK')
+        self.assertFalse(self.test_result.current_measurements.exists())
+        self.assertEqual(VoltageMeasurementResult.objects.count(), 1)
+
+    def test_result_summary_counts_every_category_in_one_query(self):
+        VoltageMeasurementResult.objects.create(test_result=self.test_result, parameter_name='VCC',
+                                                measured_value=3.3, min_value=3.0, max_value=3.6, passed=True)
+        FrequencyMeasurementResult.objects.create(test_result=self.test_result, parameter_name='CLK',
+                                                  measured_value=9.0, min_value=10.0, max_value=12.0)
+        YesNoQuestionResult.objects.create(test_result=self.test_result, question_text='OK?',
+                                           user_answer=True, required_answer=True, passed=True)
+        InstructionResult.objects.create(test_result=self.test_result, instruction_text='Plug in',
+                                         acknowledged=True)
+        with self.assertNumQueries(1):
+            test_counts, all_tests_passed = get_result_summary(self.test_result)
+        self.assertEqual(test_counts['voltage'], {'total': 1, 'passed': 1})
+        self.assertEqual(test_counts['current'], {'total': 0, 'passed': 0})
+        self.assertEqual(test_counts['frequency'], {'total': 1, 'passed': 0})
+        self.assertEqual(test_counts['questions'], {'total': 1, 'passed': 1})
+        self.assertEqual(test_counts['instructions'], {'total': 1, 'passed': 1})
+        self.assertFalse(all_tests_passed)
+
+    def test_summary_counters_follow_result_writes_and_deletes(self):
+        test_config = self.test_result.pcb.batch.test_config_type
+        step = TestStep.objects.create(test_config=test_config, step_type='QUESTION', order=1,
+                                       question_text='OK?', required_answer=True)
+        VoltageMeasurementResult.objects.create(test_result=self.test_result, parameter_name='VCC',
+                                                measured_value=3.3, min_value=3.0, max_value=3.6, passed=True)
+        question = YesNoQuestionResult.objects.create(test_result=self.test_result, test_step=step,
+                                                      question_text='OK?', user_answer=False,
+                                                      required_answer=True, passed=False)
+        # A stale in-memory copy saves only the fields it changed
+        self.test_result.notes = 'Checked'
+        self.test_result.save(update_fields=['notes', 'updated_at'])
+        self.test_result.refresh_from_db()
+        self.assertEqual((self.test_result.total_steps, self.test_result.passed_steps,
+                          self.test_result.failed_steps), (2, 1, 1))
+        self.assertEqual(self.test_result.first_failed_step, step)
+
+        question.delete()
+        self.test_result.refresh_from_db()
+        self.assertEqual((self.test_result.total_steps, self.test_result.passed_steps,
+                          self.test_result.failed_steps), (1, 1, 0))
+        self.assertIsNone(self.test_result.first_failed_step)
+
+
+class PcbTestResultListTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('viewer', password='secret')
+        cls.user.user_permissions.add(Permission.objects.get(codename='view_pcbtestresult'))
+        test_config = TestConfigType.objects.create(name='Config')
+        batch = Batch.objects.create(name='Batch', pcb_type=PcbType.objects.create(name='Controller'),
+                                     test_config_type=test_config, hardware_version='1.0')
+        pcb = Pcb.objects.create(serial_number='SN-1', batch=batch)
+        PcbTestResult.objects.bulk_create(
+            PcbTestResult(pcb=pcb, technician=cls.user) for _ in range(RESULTS_PER_PAGE * 2 + 5)
+        )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_list_is_paginated(self):
+        response = self.client.get(reverse('pcb_test_result_list'))
+        self.assertEqual(len(response.context['test_results']), RESULTS_PER_PAGE)
+        self.assertEqual(response.context['test_results'].paginator.num_pages, 3)
+
+    def test_keyset_paging_walks_the_same_rows_as_offset_paging(self):
+        expected = list(PcbTestResult.objects.order_by('-test_date', '-pk').values_list('pk', flat=True))
+        url = reverse('pcb_test_result_list')
+        seen = []
+        params = {'paging': 'keyset'}
+        while True:
+            page = self.client.get(url, params).context['test_results']
+            seen.extend(test_result.pk for test_result in page)
+            if not page.has_next:
+                break
+            params = {'paging': 'keyset', 'after': page.next_cursor}
+        self.assertEqual(seen, expected)
+
+        # Walking back from the last page returns the previous page
+        previous = self.client.get(url, {'paging': 'keyset', 'before': page.previous_cursor}).context['test_results']
+        self.assertEqual([test_result.pk for test_result in previous], expected[RESULTS_PER_PAGE:RESULTS_PER_PAGE * 2])
+
+
+class TypeaheadTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('viewer', password='secret')
+        cls.user.user_permissions.add(Permission.objects.get(codename='view_pcbtestresult'))
+        batch = Batch.objects.create(name='Batch', pcb_type=PcbType.objects.create(name='Controller'),
+                                     test_config_type=TestConfigType.objects.create(name='Config'),
+                                     hardware_version='1.0')
+        Pcb.objects.bulk_create(Pcb(serial_number=f'AB-{number:03d}', batch=batch)
+                                for number in range(TYPEAHEAD_LIMIT + 5))
+        Pcb.objects.create(serial_number='XY-001', batch=batch)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_pcb_typeahead_matches_serial_prefix_in_batches(self):
+        url = reverse('pcb_typeahead')
+        response = self.client.get(url, {'q': 'ab-'})
+        labels = [option['label'] for option in response.context['options']]
+        self.assertEqual(labels, [f'AB-{number:03d}' for number in range(TYPEAHEAD_LIMIT)])
+        self.assertTrue(response.context['more_url'])
+
+        response = self.client.get(response.context['more_url'])
+        labels = [option['label'] for option in response.context['options']]
+        self.assertEqual(labels, [f'AB-{number:03d}' for number in range(TYPEAHEAD_LIMIT, TYPEAHEAD_LIMIT + 5)])
+        self.assertFalse(response.context['more_url'])
+
+        response = self.client.get(url, {'q': 'XY'})
+        self.assertEqual([option['label'] for option in response.context['options']], ['XY-001'])
+
+    def test_pcb_typeahead_pages_through_serials_differing_in_case(self):
+        batch = Batch.objects.get()
+        Pcb.objects.bulk_create(Pcb(serial_number=f'CD-{number:03d}', batch=batch)
+                                for number in range(TYPEAHEAD_LIMIT - 1))
+        Pcb.objects.bulk_create([Pcb(serial_number='CD-ZZZ', batch=batch), Pcb(serial_number='cd-zzz', batch=batch)])
+        response = self.client.get(reverse('pcb_typeahead'), {'q': 'cd-'})
+        labels = [option['label'] for option in response.context['options']]
+        response = self.client.get(response.context['more_url'])
+        labels += [option['label'] for option in response.context['options']]
+        self.assertEqual(len(labels), TYPEAHEAD_LIMIT + 1)
+        self.assertEqual(set(labels[-2:]), {'CD-ZZZ', 'cd-zzz'})
+
+    def test_list_page_does_not_load_every_pcb(self):
+        pcb = Pcb.objects.get(serial_number='XY-001')
+        response = self.client.get(reverse('pcb_test_result_list'), {'pcb_id': pcb.id})
+        self.assertNotIn('pcbs', response.context)
+        self.assertEqual(response.context['pcb_label'], 'XY-001')
+
+
+class PcbPickerTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('technician', password='secret')
+        cls.user.user_permissions.add(Permission.objects.get(codename='add_pcbtestresult'))
+        cls.batch = Batch.objects.create(name='Batch', pcb_type=PcbType.objects.create(name='Controller'),
+                                         test_config_type=TestConfigType.objects.create(name='Config'),
+                                         hardware_version='1.0')
+        cls.passed, cls.failed, cls.untested = (
+            Pcb.objects.create(serial_number=serial, batch=cls.batch) for serial in ('SN-1', 'SN-2', 'SN-3')
+        )
+        PcbTestResult.objects.create(pcb=cls.passed, technician=cls.user, result=PcbTestResult.PASSED)
+        PcbTestResult.objects.create(pcb=cls.failed, technician=cls.user, result=PcbTestResult.FAILED)
+        PcbTestResult.objects.create(pcb=cls.untested, technician=cls.user)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def count_picker_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('pcb_test_result_create'), {'batch': self.batch.id})
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_picker_query_count_does_not_grow_with_pcbs(self):
+        before = self.count_picker_queries()
+        Pcb.objects.bulk_create(Pcb(serial_number=f'EXTRA-{number}', batch=self.batch)
+                                for number in range(PCBS_PER_PAGE * 2))
+        self.assertEqual(self.count_picker_queries(), before)
+
+    def test_status_filters(self):
+        url = reverse('pcb_test_result_create')
+        untested = self.client.get(url, {'status': 'untested'}).context['pcbs']
+        self.assertEqual([pcb.serial_number for pcb in untested], ['SN-3'])
+        failed = self.client.get(url, {'status': 'failed'}).context['pcbs']
+        self.assertEqual([pcb.serial_number for pcb in failed], ['SN-2'])
+
+    def test_scanned_serial_starts_the_test(self):
+        url = reverse('pcb_test_result_create')
+        response = self.client.post(url, {'serial_number': 'SN-2'})
+        self.assertRedirects(response, reverse('pcb_test_execute_steps', args=[self.failed.id]),
+                             fetch_redirect_response=False)
+        response = self.client.post(url, {'serial_number': 'UNKNOWN'})
+        self.assertRedirects(response, url)
+
+
+class TestRunIngestTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('fixture', password='secret')
+        cls.user.user_permissions.add(Permission.objects.get(codename='add_pcbtestresult'))
+        test_config = create_test_config('Config', 6)
+        batch = Batch.objects.create(name='Batch', pcb_type=PcbType.objects.create(name='Controller'),
+                                     test_config_type=test_config, hardware_version='1.0')
+        cls.pcb = Pcb.objects.create(serial_number='SN-1', batch=batch)
+        cls.steps = list(test_config.steps.order_by('order'))
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def post_run(self, readings):
+        return self.client.post(reverse('pcb_test_run_ingest'),
+                                json.dumps({'serial_number': 'SN-1', 'readings': readings}),
+                                content_type='application/json')
+
+    def test_post_without_csrf_token_is_rejected(self):
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.user)
+        body = json.dumps({'serial_number': 'SN-1', 'readings': self.readings()})
+        response = client.post(reverse('pcb_test_run_ingest'), body, content_type='application/json')
+        self.assertEqual(response.status_code, 403)
+        client.cookies['csrftoken'] = token = 'a' * 32
+        response = client.post(reverse('pcb_test_run_ingest'), body, content_type='application/json',
+                               HTTP_X_CSRFTOKEN=token)
+        self.assertEqual(response.status_code, 201)
+
+    def readings(self, voltage='1.5'):
+        readings = []
+        for step in self.steps:
+            if step.step_type == 'VOLTAGE':
+                readings.append({'step_id': step.id, 'value': voltage})
+            elif step.step_type == 'QUESTION':
+                readings.append({'step_id': step.id, 'answer': True})
+            else:
+                readings.append({'step_id': step.id})
+        return readings
+
+    def test_run_is_graded_and_counted(self):
+        readings = self.readings()
+        readings[0]['value'] = 5.0
+        response = self.post_run(readings)
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        self.assertEqual((data['result'], data['total_steps'], data['failed_steps']), ('FAILED', 6, 1))
+        test_result = PcbTestResult.objects.get(pk=data['test_result_id'])
+        self.assertEqual(test_result.first_failed_step, self.steps[0])
+        self.assertEqual(test_result.voltage_measurements.count(), 2)
+
+    def test_rejected_run_writes_nothing(self):
+        readings = self.readings()
+        readings[3]['value'] = 'high'
+        readings.append({'step_id': 0})
+        response = self.post_run(readings)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(response.json()['errors']), 2)
+        self.assertFalse(PcbTestResult.objects.exists())
+
+    def test_partial_run_is_incomplete(self):
+        data = self.post_run(self.readings()[:2]).json()
+        self.assertEqual(data['result'], 'INCOMPLETE')
+        self.assertEqual(PcbTestResult.objects.get().next_step_order, self.steps[2].order)
+
+
+class StreamIngestTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('fixture', password='secret')
+        cls.user.user_permissions.add(Permission.objects.get(codename='add_pcbtestresult'))
+        test_config = create_test_config('Config', 3)
+        batch = Batch.objects.create(name='Batch', pcb_type=PcbType.objects.create(name='Controller'),
+                                     test_config_type=test_config, hardware_version='1.0')
+        for serial in ('SN-1', 'SN-2'):
+            Pcb.objects.create(serial_number=serial, batch=batch)
+        cls.voltage, cls.question, cls.instruction = test_config.steps.order_by('order')
+
+    def records(self, serial, voltage=1.5):
+        return [
+            {'serial_number': serial, 'step_id': self.voltage.id, 'value': voltage},
+            {'serial_number': serial, 'step_id': self.question.id, 'answer': 'yes'},
+            {'serial_number': serial, 'step_id': self.instruction.id},
+        ]
+
+    def test_stream_acks_every_record_and_finishes_runs(self):
+        self.client.force_login(self.user)
+        records = self.records('SN-1') + self.records('SN-2', voltage=9.0) + [{'serial_number': 'SN-3'}]
+        body = ''.join(json.dumps(record) + '\n' for record in records) + 'not json\n'
+        response = self.client.post(reverse('pcb_test_stream_ingest'), body, content_type='application/x-ndjson')
+        acks = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([ack['line'] for ack in acks], list(range(1, 9)))
+        self.assertEqual([ack['ok'] for ack in acks], [True] * 6 + [False, False])
+        self.assertEqual(
+            dict(PcbTestResult.objects.values_list('pcb__serial_number', 'result')),
+            {'SN-1': PcbTestResult.PASSED, 'SN-2': PcbTestResult.FAILED},
+        )
+        self.assertEqual(PcbTestResult.objects.get(pcb__serial_number='SN-2').failed_steps, 1)
+
+    def test_partial_batch_is_acked_while_the_stream_is_slow(self):
+        records = self.records('SN-1')
+        acked = threading.Event()
+
+        def slow_stream():
+            yield 1, json.dumps(records[0])
+            # The next reading only comes once the first one is acked
+            self.assertTrue(acked.wait(timeout=5))
+            yield 2, json.dumps(records[1])
+
+        acks = []
+        for ack in StreamIngestor(self.user, max_delay=0.05).ingest(slow_stream()):
+            acks.append(ack)
+            acked.set()
+        self.assertEqual(acks[0], {'line': 1, 'ok': True, 'test_result_id': PcbTestResult.objects.get().pk})
+        self.assertEqual([ack['line'] for ack in acks], [1, 2])
+        self.assertEqual(PcbTestResult.objects.get().total_steps, 2)
+
+    def test_stream_checks_csrf_and_batch_size(self):
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.user)
+        body = ''.join(json.dumps(record) + '\n' for record in self.records('SN-1'))
+        url = reverse('pcb_test_stream_ingest')
+        self.assertEqual(client.post(url, body, content_type='application/x-ndjson').status_code, 403)
+        client.cookies['csrftoken'] = token = 'a' * 32
+        response = client.post(f'{url}?batch_size=0', body, content_type='application/x-ndjson',
+                               HTTP_X_CSRFTOKEN=token)
+        self.assertEqual(response.status_code, 400)
+        response = client.post(f'{url}?batch_size=50', body, content_type='application/x-ndjson',
+                               HTTP_X_CSRFTOKEN=token)
+        self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 3)
+
+    def test_records_are_written_in_micro_batches(self):
+        ingestor = StreamIngestor(self.user, batch_size=2)
+        records = self.records('SN-1')
+        self.assertEqual(ingestor.feed(1, json.dumps(records[0])), [])
+        self.assertEqual(len(ingestor.feed(2, json.dumps(records[1]))), 2)
+        self.assertEqual(PcbTestResult.objects.get().total_steps, 2)
+        self.assertEqual(len(ingestor.feed(3, json.dumps(records[2]))), 0)
+        self.assertEqual(len(ingestor.close()), 1)
+        self.assertEqual(PcbTestResult.objects.get().result, PcbTestResult.PASSED)
+
+
+class PcbTestResultUpdateTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('editor', password='secret')
+        cls.user.user_permissions.add(Permission.objects.get(codename='change_pcbtestresult'))
+        batch = Batch.objects.create(name='Batch', pcb_type=PcbType.objects.create(name='Controller'),
+                                     test_config_type=TestConfigType.objects.create(name='Config'),
+                                     hardware_version='1.0')
+        pcb = Pcb.objects.create(serial_number='SN-1', batch=batch)
+        cls.test_result = PcbTestResult.objects.create(pcb=pcb, technician=cls.user, notes='Original')
+        for number in range(50):
+            VoltageMeasurementResult.objects.create(test_result=cls.test_result, parameter_name=f'V{number}',
+                                                    measured_value=1.5, min_value=1.0, max_value=2.0, passed=True)
+            YesNoQuestionResult.objects.create(test_result=cls.test_result, question_text=f'Q{number}?',
+                                               user_answer=True, required_answer=True, passed=True)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.url = reverse('pcb_test_result_update', args=[self.test_result.pk])
+
+    def form_data(self):
+        """The update form as rendered, with every field left unchanged"""
+        response = self.client.get(self.url)
+        data = {'notes': 'Edited'}
+        for group in response.context['measurement_groups']:
+            prefix = group['prefix']
+            data[f'{prefix}_count'] = len(group['rows'])
+            for i, row in enumerate(group['rows']):
+                data.update({f'{prefix}_id_{i}': row.id, f'{prefix}_param_name_{i}': row.parameter_name,
+                             f'{prefix}_measured_{i}': row.measured_value, f'{prefix}_min_{i}': row.min_value,
+                             f'{prefix}_max_{i}': row.max_value, f'{prefix}_unit_{i}': row.unit})
+        questions = list(response.context['questions'])
+        data['question_count'] = len(questions)
+        for i, row in enumerate(questions):
+            data.update({f'question_id_{i}': row.id, f'question_text_{i}': row.question_text,
+                         f'question_user_answer_{i}': 'true', f'question_required_{i}': 'true'})
+        return data
+
+    def test_notes_only_post_keeps_result_rows(self):
+        self.client.post(self.url, {'notes': 'Edited'})
+        self.test_result.refresh_from_db()
+        self.assertEqual(self.test_result.notes, 'Edited')
+        self.assertEqual(self.test_result.total_steps, 100)
+
+    def test_only_changed_rows_are_written(self):
+        data = self.form_data()
+        data['voltage_measured_0'] = '5.0'
+        data['question_delete_1'] = 'on'
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(self.url, data)
+        writes = [query['sql'] for query in queries
+                  if query['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))
+                  and 'django_session' not in query['sql'] and 'resultrollup' not in query['sql']
+                  and 'spcstatistics' not in query['sql']]
+        # notes, one measurement UPDATE, one question DELETE, counters, overall result
+        self.assertEqual(len(writes), 5)
+        self.test_result.refresh_from_db()
+        self.assertEqual((self.test_result.total_steps, self.test_result.failed_steps), (99, 1))
+        self.assertEqual(self.test_result.result, PcbTestResult.FAILED)
+
+    def test_invalid_row_leaves_result_unchanged(self):
+        data = self.form_data()
+        data['voltage_measured_3'] = 'abc'
+        data['voltage_delete_0'] = 'on'
+        self.client.post(self.url, data)
+        self.test_result.refresh_from_db()
+        self.assertEqual(self.test_result.notes, 'Original')
+        self.assertEqual(self.test_result.voltage_measurements.count(), 50)
+
+
+class RegradeTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user('technician', password='secret')
+        cls.test_config = create_test_config('Config', 4)
+        batch = Batch.objects.create(name='Batch', pcb_type=PcbType.objects.create(name='Controller'),
+                                     test_config_type=cls.test_config, hardware_version='1.0')
+        cls.first, cls.second = cls.test_config.steps.filter(step_type='VOLTAGE').order_by('order')
+        cls.results = {}
+        for serial, values in (('SN-1', (1.2, 1.5)), ('SN-2', (1.9, 1.5)), ('SN-3', (2.5, 1.95))):
+            passed = all(value <= 2.0 for value in values)
+            test_result = PcbTestResult.objects.create(
+                pcb=Pcb.objects.create(serial_number=serial, batch=batch), technician=user,
+                result=PcbTestResult.PASSED if passed else PcbTestResult.FAILED,
+            )
+            for step, value in zip((cls.first, cls.second), values):
+                VoltageMeasurementResult.objects.create(
+                    test_result=test_result, test_step=step, parameter_name=step.parameter_name,
+                    measured_value=value, min_value=1.0, max_value=2.0, passed=value <= 2.0,
+                )
+            cls.results[serial] = test_result
+
+    def test_tightened_limit_finds_boards_that_would_now_fail(self):
+        run = regrade_measurements(self.test_config, {self.first.id: (1.0, 1.8)}, chunk_size=2)
+        self.assertEqual((run.measurements, run.failed_measurements, run.newly_failed_measurements), (6, 2, 1))
+        self.assertEqual(list(newly_failing_results(run)), [self.results['SN-2']])
+        self.assertEqual(run.results.get(test_result=self.results['SN-3']).newly_failed_measurements, 0)
+        # The stored grading is left as it was
+        self.assertEqual(VoltageMeasurementResult.objects.filter(passed=False).count(), 1)
+        self.assertEqual(self.results['SN-2'].measurements.get(test_step=self.first).max_value, 2.0)
+
+    def test_current_step_limits_are_used_by_default(self):
+        TestStep.objects.filter(pk=self.second.pk).update(min_value=1.6)
+        run = regrade_measurements(self.test_config)
+        self.assertEqual(run.newly_failed_results, 2)
+        self.assertEqual(run.limits[str(self.second.id)], [1.6, 2.0])
+
+
+class SpcTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('engineer', password='secret')
+        cls.user.user_permissions.add(Permission.objects.get(codename='view_pcbtestresult'))
+        cls.test_config = create_test_config('Config', 1)
+        cls.step = cls.test_config.steps.get()
+        cls.batch = Batch.objects.create(name='Batch', pcb_type=PcbType.objects.create(name='Controller'),
+                                         test_config_type=cls.test_config, hardware_version='1.0')
+        cls.test_result = PcbTestResult.objects.create(pcb=Pcb.objects.create(serial_number='SN-1', batch=cls.batch),
+                                                       technician=cls.user)
+
+    def record(self, values):
+        for value in values:
+            VoltageMeasurementResult.objects.create(test_result=self.test_result, test_step=self.step,
+                                                    parameter_name=self.step.parameter_name, measured_value=value,
+                                                    min_value=1.0, max_value=2.0, passed=1.0 <= value <= 2.0)
+
+    def test_statistics_are_refreshed_incrementally(self):
+        values = np.random.default_rng(1).normal(1.5, 0.1, 40)
+        self.record(values[:25])
+        refresh_spc_statistics(self.test_config, self.batch, chunk_size=10)
+        self.record(values[25:])
+        with CaptureQueriesContext(connection) as queries:
+            stats = refresh_spc_statistics(self.test_config, self.batch)[('VOLTAGE', 'V1')]
+        self.assertFalse([query for query in queries if 'measured_value' in query['sql'] and '"id" > 0' in query['sql']])
+        self.assertEqual(stats.count, 40)
+        self.assertAlmostEqual(stats.mean, values.mean())
+        self.assertAlmostEqual(standard_deviation(stats), values.std(ddof=1))
+        self.assertAlmostEqual(stats.moving_range_sum, np.abs(np.diff(values)).sum())
+
+    def test_western_electric_rules(self):
+        values = [0, 3.5, 0, 2.5, 2.5, 0, 1.5, 1.5, 1.5, 1.5] + [0.5] * 8
+        violations = western_electric_violations(values, 0.0, 1.0)
+        self.assertEqual(np.flatnonzero(violations['rule_1']).tolist(), [1])
+        self.assertEqual(np.flatnonzero(violations['rule_2']).tolist(), [3, 4])
+        self.assertIn(9, np.flatnonzero(violations['rule_3']).tolist())
+        self.assertEqual(np.flatnonzero(violations['rule_4']).tolist(), [13, 14, 15, 16, 17])
+
+    def test_changed_or_deleted_measurements_are_recounted(self):
+        self.record([1.0, 2.0, 3.0])
+        refresh_spc_statistics(self.test_config, self.batch)
+        MeasurementResult.objects.filter(measured_value=3.0).delete()
+        self.assertFalse(SpcStatistics.objects.exists())
+        stats = refresh_spc_statistics(self.test_config, self.batch)[('VOLTAGE', 'V1')]
+        self.assertEqual((stats.count, stats.mean), (2, 1.5))
+
+        editor = User.objects.create_user('editor', password='secret')
+        editor.user_permissions.add(Permission.objects.get(codename='change_pcbtestresult'))
+        self.client.force_login(editor)
+        rows = list(self.test_result.measurements.order_by('pk'))
+        data = {'notes': '', 'voltage_count': len(rows)}
+        for i, row in enumerate(rows):
+            data.update({f'voltage_id_{i}': row.id, f'voltage_param_name_{i}': row.parameter_name,
+                         f'voltage_measured_{i}': 2.0 if i == 0 else row.measured_value,
+                         f'voltage_min_{i}': row.min_value, f'voltage_max_{i}': row.max_value})
+        self.client.post(reverse('pcb_test_result_update', args=[self.test_result.pk]), data)
+        stats = SpcStatistics.objects.get(kind='VOLTAGE', parameter_name='V1')
+        self.assertEqual((stats.count, stats.mean), (2, 2.0))
+
+    def test_spc_endpoint_only_reads(self):
+        self.record([1.4, 1.6])
+        self.client.force_login(self.user)
+        data = self.client.get(reverse('pcb_test_spc', args=[self.test_config.pk]), {'batch': self.batch.pk}).json()
+        self.assertEqual(data['parameters'][0]['count'], 0)
+        self.assertFalse(SpcStatistics.objects.exists())
+
+    def test_spc_endpoint_reports_capability_and_chart(self):
+        self.record([1.4, 1.6] * 10)
+        call_command('refresh_spc_statistics', stdout=io.StringIO())
+        self.client.force_login(self.user)
+        data = self.client.get(reverse('pcb_test_spc', args=[self.test_config.pk]),
+                               {'batch': self.batch.pk, 'parameter': 'VOLTAGE:V1', 'points': 5}).json()
+        summary = data['parameters'][0]
+        self.assertEqual((summary['count'], summary['lower_limit'], summary['upper_limit']), (20, 1.0, 2.0))
+        self.assertAlmostEqual(summary['cpk'], 0.5 * 1.128 / 0.6)
+        self.assertEqual(len(data['chart']['points']), 5)
+
+
+class ResultRollupTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('qa', password='secret')
+        cls.test_config = create_test_config('Config', 1)
+        cls.batch = Batch.objects.create(name='Batch', pcb_type=PcbType.objects.create(name='Controller'),
+                                         test_config_type=cls.test_config, hardware_version='1.0')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def create_result(self, serial_number, result):
+        test_result = PcbTestResult.objects.create(
+            pcb=Pcb.objects.create(serial_number=serial_number, batch=self.batch), technician=self.user, result=result,
+        )
+        refresh_result_rollups([test_result])
+        return test_result
+
+    def rollup(self, period, dimension=ResultRollup.ALL, key_id=0):
+        return ResultRollup.objects.get(period=period, dimension=dimension, key_id=key_id)
+
+    def test_completing_and_signing_off_update_the_rollups(self):
+        self.create_result('SN-1', PcbTestResult.FAILED)
+        test_result = PcbTestResult.objects.create(pcb=Pcb.objects.create(serial_number='SN-2', batch=self.batch),
+                                                   technician=self.user)
+        VoltageMeasurementResult.objects.create(test_result=test_result, parameter_name='V1', measured_value=1.5,
+                                                min_value=1.0, max_value=2.0, passed=True)
+        self.client.post(reverse('pcb_test_result_complete', args=[test_result.pk]))
+        self.client.post(reverse('qa_signoff_pcb_test', args=[test_result.pk]))
+
+        for period in (ResultRollup.HOUR, ResultRollup.DAY):
+            totals = self.rollup(period)
+            self.assertEqual((totals.tested, totals.passed, totals.failed, totals.signed_off), (2, 1, 1, 1))
+        self.assertEqual(self.rollup(ResultRollup.DAY, ResultRollup.BATCH, self.batch.pk).passed, 1)
+        self.assertEqual(self.rollup(ResultRollup.DAY, ResultRollup.TECHNICIAN, self.user.pk).tested, 2)
+
+    def test_deleting_a_result_recounts_its_bucket(self):
+        test_result = self.create_result('SN-1', PcbTestResult.PASSED)
+        self.create_result('SN-2', PcbTestResult.PASSED)
+        test_result.delete()
+        refresh_result_rollups([test_result])
+        self.assertEqual(self.rollup(ResultRollup.DAY).tested, 1)
+
+    def test_rebuild_matches_incremental_rollups(self):
+        self.create_result('SN-1', PcbTestResult.PASSED)
+        self.create_result('SN-2', PcbTestResult.FAILED)
+        self.create_result('SN-3', PcbTestResult.INCOMPLETE)
+        fields = ('period', 'dimension', 'key_id', 'bucket_start', 'tested', 'passed', 'failed', 'signed_off')
+        incremental = sorted(ResultRollup.objects.values_list(*fields))
+        rebuild_rollups()
+        self.assertEqual(sorted(ResultRollup.objects.values_list(*fields)), incremental)
+
+    def test_home_page_shows_todays_rollups(self):
+        self.create_result('SN-1', PcbTestResult.PASSED)
+        response = self.client.get(reverse('home'))
+        self.assertEqual(response.context['today'].tested, 1)
+        self.assertContains(response, 'Batches tested today')
+        self.assertEqual(response.context['batch_rollups'][0].batch_name, 'Batch')
+
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+@unittest.skipUnless(pyarrow, 'pyarrow is not installed')
+class MeasurementExportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user('technician', password='secret')
+        cls.batch = Batch.objects.create(name='Batch', pcb_type=PcbType.objects.create(name='Controller'),
+                                         test_config_type=create_test_config('Config', 1), hardware_version='2.1')
+        cls.test_result = PcbTestResult.objects.create(pcb=Pcb.objects.create(serial_number='SN-1', batch=cls.batch),
+                                                       technician=user)
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def record(self, count):
+        for value in range(count):
+            VoltageMeasurementResult.objects.create(test_result=self.test_result, parameter_name='V1',
+                                                    measured_value=value, min_value=0.0, max_value=5.0,
+                                                    passed=value <= 5)
+
+    def test_parquet_export_has_a_row_group_per_chunk(self):
+        self.record(7)
+        path = os.path.join(self.directory.name, 'measurements.parquet')
+        written, watermark = export_measurements(path, 'parquet', chunk_size=3)
+        parquet_file = pyarrow.parquet.ParquetFile(path)
+        self.assertEqual((written, parquet_file.metadata.num_row_groups), (7, 3))
+        table = parquet_file.read()
+        ids = list(MeasurementResult.objects.order_by('pk').values_list('pk', flat=True))
+        self.assertEqual(table.column('measurement_id').to_pylist(), ids)
+        self.assertEqual(watermark['live_ids'], [[ids[0], ids[-1]]])
+        self.assertEqual(set(table.column('serial_number').to_pylist()), {'SN-1'})
+        self.assertEqual(table.column('hardware_version')[0].as_py(), '2.1')
+        self.assertEqual(table.column('passed').to_pylist().count(False), 1)
+        self.assertEqual(set(table.column('deleted').to_pylist()), {False})
+
+    def export(self, name, watermark):
+        path = os.path.join(self.directory.name, name)
+        call_command('export_measurements', path, watermark=watermark, stdout=io.StringIO())
+        return pyarrow.ipc.open_file(path).read_all().to_pylist() if os.path.exists(path) else None
+
+    def test_watermark_exports_only_new_measurements(self):
+        watermark = os.path.join(self.directory.name, 'watermark.json')
+        self.record(4)
+        first = self.export('first.arrow', watermark)
+        other = PcbTestResult.objects.create(pcb=Pcb.objects.create(serial_number='SN-2', batch=self.batch),
+                                             technician=self.test_result.technician)
+        VoltageMeasurementResult.objects.create(test_result=other, parameter_name='V1', measured_value=1.0,
+                                                min_value=0.0, max_value=5.0, passed=True)
+        second = self.export('second.arrow', watermark)
+
+        self.assertEqual((len(first), [row['serial_number'] for row in second]), (4, ['SN-2']))
+        self.assertIsNone(self.export('third.arrow', watermark))
+
+    def test_edited_and_deleted_measurements_are_exported_again(self):
+        watermark = os.path.join(self.directory.name, 'watermark.json')
+        self.record(4)
+        self.export('first.arrow', watermark)
+        first, second, *others = MeasurementResult.objects.order_by('pk')
+        self.client.force_login(User.objects.create_superuser('admin', password='secret'))
+        data = {'notes': '', 'voltage_count': 3}
+        for i, row in enumerate([first, *others]):
+            data.update({f'voltage_id_{i}': row.id, f'voltage_param_name_{i}': row.parameter_name,
+                         f'voltage_measured_{i}': 9.0 if i == 0 else row.measured_value,
+                         f'voltage_min_{i}': row.min_value, f'voltage_max_{i}': row.max_value})
+        self.client.post(reverse('pcb_test_result_update', args=[self.test_result.pk]), data)
+
+        rows = {row['measurement_id']: row for row in self.export('second.arrow', watermark)}
+        self.assertEqual(rows[first.pk]['measured_value'], 9.0)
+        self.assertFalse(rows[first.pk]['passed'])
+        self.assertTrue(rows[second.pk]['deleted'])
+        self.assertIsNone(rows[second.pk]['measured_value'])
+        self.assertEqual(set(rows) - {first.pk, second.pk}, {row.pk for row in others})
+
+
+class TestResultReportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('engineer', password='secret')
+        cls.user.user_permissions.add(Permission.objects.get(codename='view_pcbtestresult'))
+        batch = Batch.objects.create(name='Batch', pcb_type=PcbType.objects.create(name='Controller'),
+                                     test_config_type=create_test_config('Config', 1), hardware_version='1.0')
+        for index in range(5):
+            test_result = PcbTestResult.objects.create(
+                pcb=Pcb.objects.create(serial_number=f'SN-{index}', batch=batch), technician=cls.user,
+            )
+            VoltageMeasurementResult.objects.create(test_result=test_result, parameter_name='VCC',
+                                                    measured_value=3.0 + index / 10, min_value=3.0, max_value=3.6)
+            if index % 2:
+                FrequencyMeasurementResult.objects.create(test_result=test_result, parameter_name='CLK',
+                                                          measured_value=1e6, min_value=0, max_value=2e6)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_csv_export_pivots_measurements_and_keeps_the_list_filters(self):
+        response = self.client.get(reverse('pcb_test_result_export'), {'search': 'SN-3'})
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(rows[0][-2:], ['CLK (frequency)', 'VCC (voltage)'])
+        self.assertEqual(len(rows), 2)
+        self.assertEqual((rows[1][1], rows[1][-2:]), ('SN-3', ['1000000.0', '3.3']))
+
+    def test_queries_do_not_grow_with_the_number_of_results(self):
+        with CaptureQueriesContext(connection) as queries:
+            lines = list(csv_report(PcbTestResult.objects.order_by('pk'), chunk_size=2))
+        self.assertEqual(len(lines), 6)
+        # Parameter columns, the results, and the measurements of each chunk of two results
+        self.assertEqual(len(queries), 5)
+
+    def test_xlsx_export(self):
+        response = self.client.get(reverse('pcb_test_result_export'), {'format': 'xlsx'})
+        sheet = openpyxl.load_workbook(io.BytesIO(b''.join(response.streaming_content))).active
+        self.assertEqual(sheet.max_row, 6)
+        self.assertEqual(sheet.cell(row=2, column=2).value, 'SN-4')
+        self.assertIsInstance(sheet.cell(row=2, column=8).value, datetime)
+        self.assertEqual(sheet.cell(row=2, column=13).value, None)
+        self.assertEqual(sheet.cell(row=3, column=13).value, 1e6)
+
+    def test_text_starting_a_formula_is_quoted_in_csv_and_kept_as_text_in_xlsx(self):
+        test_result = PcbTestResult.objects.get(pcb__serial_number='SN-0')
+        Pcb.objects.filter(pk=test_result.pcb_id).update(serial_number='=HYPERLINK("http://example.com")')
+        VoltageMeasurementResult.objects.create(test_result=test_result, parameter_name='@SUM(A1)',
+                                                measured_value=-1.5, min_value=-2, max_value=0)
+        test_results = PcbTestResult.objects.filter(pk=test_result.pk)
+
+        rows = list(csv.reader(''.join(csv_report(test_results)).splitlines()))
+        self.assertEqual(rows[0][-2], "'@SUM(A1) (voltage)")
+        self.assertEqual((rows[1][1], rows[1][-2]), ('\'=HYPERLINK("http://example.com")', '-1.5'))
+        sheet = openpyxl.load_workbook(io.BytesIO(b''.join(xlsx_report(test_results)))).active
+        self.assertEqual(sheet.cell(row=1, column=13).value, '@SUM(A1) (voltage)')
+        self.assertEqual(sheet.cell(row=2, column=2).value, '=HYPERLINK("http://example.com")')
+        self.assertEqual(sheet.cell(row=2, column=2).data_type, 's')
+        self.assertEqual(sheet.cell(row=2, column=13).value, -1.5)
+
+
+class BenchmarkTestExecutionTests(TransactionTestCase):
+
+    def test_benchmark_runs_on_a_scratch_copy(self):
+        stdout = io.StringIO()
+        call_command('benchmark_test_execution', technicians=2, boards=2, steps=4, journal_mode='wal', stdout=stdout)
+        self.assertIn('Journal mode: wal', stdout.getvalue())
+        self.assertIn('step: 16 requests', stdout.getvalue())
+        self.assertIn('0 "database is locked" error(s), 0 other error(s)', stdout.getvalue())
+        self.assertFalse(PcbTestResult.objects.exists())
+        self.assertFalse(User.objects.exists())
+
+    def test_benchmark_cleans_up_a_given_database(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'benchmark.sqlite3')
+            copy_database(path)
+            call_command('benchmark_test_execution', technicians=2, boards=1, steps=2, database=path,
+                         stdout=io.StringIO())
+            with closing(sqlite3.connect(path)) as database:
+                self.assertEqual(database.execute('SELECT COUNT(*) FROM auth_user').fetchone(), (0,))
+                self.assertEqual(database.execute('SELECT COUNT(*) FROM batch_app_pcb').fetchone(), (0,))
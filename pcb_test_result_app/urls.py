@@ -3,6 +3,12 @@ from . import views
 
 urlpatterns = [
     path('', views.pcb_test_result_list, name='pcb_test_result_list'),
+    path('export/', views.pcb_test_result_export, name='pcb_test_result_export'),
+    path('typeahead/pcbs/', views.pcb_typeahead, name='pcb_typeahead'),
+    path('typeahead/technicians/', views.technician_typeahead, name='technician_typeahead'),
+    path('api/runs/', views.pcb_test_run_ingest, name='pcb_test_run_ingest'),
+    path('api/stream/', views.pcb_test_stream_ingest, name='pcb_test_stream_ingest'),
+    path('api/spc/<int:config_id>/', views.pcb_test_spc, name='pcb_test_spc'),
     path('create/', views.pcb_test_result_create, name='pcb_test_result_create'),
     path('execute/<int:pcb_id>/', views.pcb_test_execute_steps, name='pcb_test_execute_steps'),
     path('complete/<int:pk>/', views.pcb_test_complete, name='pcb_test_result_complete'),
@@ -1,18 +1,39 @@
+import json
+
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required, permission_required
 from django.contrib import messages
-from django.http import JsonResponse
-from django.db.models import Q
-from .models import PcbTestResult, VoltageMeasurementResult, CurrentMeasurementResult, ResistanceMeasurementResult, FrequencyMeasurementResult, YesNoQuestionResult, InstructionResult, QaSignoff
+from django.core.paginator import Paginator
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_POST
+from django.urls import reverse
+from django.utils.http import urlencode
+from django.db import transaction
+from django.db.models import OuterRef, Q, Subquery
+from .models import PcbTestResult, MeasurementResult, VoltageMeasurementResult, CurrentMeasurementResult, ResistanceMeasurementResult, FrequencyMeasurementResult, YesNoQuestionResult, InstructionResult, QaSignoff
+from .edits import MEASUREMENT_PREFIXES, apply_result_edits
+from .ingest import IngestError, ingest_test_run
+from .paging import keyset_page
+from .progress import StepAlreadyRecorded, StepProgress
+from .reports import report_response
+from .rollups import refresh_result_rollups
+from .spc import CHART_POINTS, control_chart, refresh_result_spc, spc_parameters, spc_summary, stored_spc_statistics
+from .streaming import MAX_STREAM_BATCH_SIZE, STREAM_BATCH_SIZE, StreamIngestor, read_records
+from .summary import get_result_summary, with_result_summary
 from batch_app.models import Pcb, Batch
-from test_config_type_app.models import TestConfigType, TestStep
+from test_config_type_app.models import TestConfigType
+from test_config_type_app.config_cache import cached_version
+from test_config_type_app.versions import compiled_version
 from django.contrib.auth.models import User, Group
 
 
-@login_required
-@permission_required('pcb_test_result_app.view_pcbtestresult', raise_exception=True)
-def pcb_test_result_list(request):
-    """Display list of PCB Test Results with search and filtering"""
+RESULTS_PER_PAGE = 25  # Test results shown per list page
+TYPEAHEAD_LIMIT = 20  # Matches returned per typeahead request
+PCBS_PER_PAGE = 50  # PCBs shown per page of the test PCB picker
+
+
+def filter_test_results(request):
+    """Return (test results, order_by) for the list's ordering and filter parameters"""
     # Get the ordering parameter from the request
     order_by = request.GET.get('order_by', '-test_date')  # Default to descending date
     
@@ -23,7 +44,8 @@ def pcb_test_result_list(request):
     if order_by not in valid_order_fields:
         order_by = '-test_date'  # Default if invalid field provided
     
-    test_results = PcbTestResult.objects.select_related('pcb', 'technician', 'qa_signoff', 'qa_signoff__qa_user').order_by(order_by)
+    # Order by id as well so pages are stable when test dates are equal
+    test_results = PcbTestResult.objects.order_by(order_by, '-pk')
     
     # Handle search/filter
     search_query = request.GET.get('search', '')
@@ -44,41 +66,164 @@ def pcb_test_result_list(request):
     if technician_id:
         test_results = test_results.filter(technician_id=technician_id)
     
-    # Get all PCBs and technicians for filter dropdowns
-    pcbs = Pcb.objects.all().order_by('serial_number')
-    technicians = User.objects.filter(groups__name='add_board_bringup_result').distinct().order_by('username')
+    return test_results, order_by
+
+
+@login_required
+@permission_required('pcb_test_result_app.view_pcbtestresult', raise_exception=True)
+def pcb_test_result_list(request):
+    """Display list of PCB Test Results with search and filtering"""
+    test_results, order_by = filter_test_results(request)
+    test_results = test_results.select_related('pcb', 'technician', 'qa_signoff', 'qa_signoff__qa_user')
+    search_query = request.GET.get('search', '')
+    pcb_id = request.GET.get('pcb_id', '')
+    technician_id = request.GET.get('technician_id', '')
+    
+    # Only the selected filter values are loaded; the typeahead endpoints serve the rest
+    pcb_label = Pcb.objects.filter(pk=pcb_id).values_list('serial_number', flat=True).first() if pcb_id.isdigit() else ''
+    technician_label = User.objects.filter(pk=technician_id).values_list('username', flat=True).first() if technician_id.isdigit() else ''
+    
+    # Pagination, with opt-in keyset paging when ordered by test date
+    keyset_paging = request.GET.get('paging') == 'keyset' and order_by in ['test_date', '-test_date']
+    if keyset_paging:
+        page_obj = keyset_page(
+            test_results,
+            RESULTS_PER_PAGE,
+            after=request.GET.get('after'),
+            before=request.GET.get('before'),
+            descending=order_by == '-test_date',
+        )
+    else:
+        paginator = Paginator(test_results, RESULTS_PER_PAGE)
+        page_number = request.GET.get('page')
+        page_obj = paginator.get_page(page_number)
     
     context = {
-        'test_results': test_results,
+        'test_results': page_obj,
+        'keyset_paging': keyset_paging,
         'search_query': search_query,
         'pcb_id': pcb_id,
         'technician_id': technician_id,
-        'pcbs': pcbs,
-        'technicians': technicians,
+        'pcb_label': pcb_label or '',
+        'technician_label': technician_label or '',
         'current_order': order_by,  # Pass current order to template
     }
     return render(request, 'pcb_test_result_app/pcb_test_result_list.html', context)
 
 
+
+@login_required
+@permission_required('pcb_test_result_app.view_pcbtestresult', raise_exception=True)
+def pcb_test_result_export(request):
+    """Download the filtered PCB Test Results as CSV or XLSX, one column per measured parameter"""
+    test_results, order_by = filter_test_results(request)
+    file_format = 'xlsx' if request.GET.get('format') == 'xlsx' else 'csv'
+    return report_response(test_results, file_format, 'pcb_test_results')
+
+def _typeahead_response(request, field, options, has_more, cursor):
+    """Render typeahead options, with a link to the next batch if there are more.
+
+    cursor holds the query parameters that continue after the last option.
+    """
+    more_url = ''
+    if has_more:
+        more_url = f"{request.path}?{urlencode({'q': request.GET.get('q', ''), **cursor})}"
+    return render(request, 'pcb_test_result_app/typeahead_options.html', {
+        'field': field,
+        'options': options,
+        'more_url': more_url,
+        'first_batch': not request.GET.get('after'),
+    })
+
+
+@login_required
+@permission_required('pcb_test_result_app.view_pcbtestresult', raise_exception=True)
+def pcb_typeahead(request):
+    """Return the PCBs whose serial number starts with the typed text"""
+    pcbs = Pcb.objects.serial_prefix(request.GET.get('q', '').strip())
+    after = request.GET.get('after', '').upper()
+    if after:
+        # Serials differing only in case share serial_upper, so the cursor is (serial_upper, pk)
+        try:
+            after_id = int(request.GET.get('after_id', ''))
+        except ValueError:
+            pcbs = pcbs.filter(serial_upper__gt=after)
+        else:
+            pcbs = pcbs.filter(Q(serial_upper__gt=after) | Q(serial_upper=after, pk__gt=after_id))
+    rows = list(pcbs.values_list('id', 'serial_number', 'serial_upper')[:TYPEAHEAD_LIMIT + 1])
+    has_more = len(rows) > TYPEAHEAD_LIMIT
+    rows = rows[:TYPEAHEAD_LIMIT]
+    options = [{'value': pk, 'label': serial_number} for pk, serial_number, serial_upper in rows]
+    cursor = {'after': rows[-1][2], 'after_id': rows[-1][0]} if rows else {}
+    return _typeahead_response(request, 'pcb_id', options, has_more, cursor)
+
+
+@login_required
+@permission_required('pcb_test_result_app.view_pcbtestresult', raise_exception=True)
+def technician_typeahead(request):
+    """Return the technicians whose username starts with the typed text"""
+    technicians = User.objects.filter(groups__name='add_board_bringup_result').order_by('username')
+    query = request.GET.get('q', '').strip()
+    if query:
+        technicians = technicians.filter(username__istartswith=query)
+    after = request.GET.get('after', '')
+    if after:
+        technicians = technicians.filter(username__gt=after)
+    rows = list(technicians.values_list('id', 'username')[:TYPEAHEAD_LIMIT + 1])
+    has_more = len(rows) > TYPEAHEAD_LIMIT
+    rows = rows[:TYPEAHEAD_LIMIT]
+    options = [{'value': pk, 'label': username} for pk, username in rows]
+    cursor = {'after': rows[-1][1]} if rows else {}
+    return _typeahead_response(request, 'technician_id', options, has_more, cursor)
+
+
 @login_required
 @permission_required('pcb_test_result_app.add_pcbtestresult', raise_exception=True)
 def pcb_test_result_create(request):
     """Create a new PCB Test Result - Step 1: Select PCB"""
     if request.method == 'POST':
         pcb_id = request.POST.get('pcb_id')
+        serial_number = request.POST.get('serial_number', '').strip()
         try:
-            pcb = get_object_or_404(Pcb, id=pcb_id)
+            if serial_number:
+                # Scanned or typed serial number
+                pcb = Pcb.objects.filter(serial_number=serial_number).first()
+                if pcb is None:
+                    messages.error(request, f'No PCB with serial number "{serial_number}" was found.')
+                    return redirect('pcb_test_result_create')
+            else:
+                pcb = get_object_or_404(Pcb, id=pcb_id)
             # Redirect to the first step of the test process
             return redirect('pcb_test_execute_steps', pcb_id=pcb.id)
         except Exception as e:
             messages.error(request, f'Error selecting PCB: {str(e)}')
             return redirect('pcb_test_result_create')
     
-    # GET request - show form to select PCB
-    batches = Batch.objects.all().prefetch_related('pcbs').order_by('-created_at')
+    # GET request - show the scan form and one page of PCBs to pick from
+    batches = Batch.objects.select_related('pcb_type').order_by('-created_at')
+    batch_id = request.GET.get('batch', '')
+    status = request.GET.get('status', '')
+    
+    # Latest finished test of each PCB, computed by the database
+    finished_results = PcbTestResult.objects.filter(pcb=OuterRef('pk')).exclude(result=PcbTestResult.INCOMPLETE)
+    pcbs = Pcb.objects.select_related('batch').annotate(
+        last_result=Subquery(finished_results.order_by('-test_date', '-pk').values('result')[:1])
+    ).order_by('serial_number')
+    if batch_id.isdigit():
+        pcbs = pcbs.filter(batch_id=batch_id)
+    if status == 'untested':
+        pcbs = pcbs.filter(last_result__isnull=True)
+    elif status == 'failed':
+        pcbs = pcbs.filter(last_result=PcbTestResult.FAILED)
+    
+    paginator = Paginator(pcbs, PCBS_PER_PAGE)
+    page_obj = paginator.get_page(request.GET.get('page'))
     
     context = {
         'batches': batches,
+        'batch_id': batch_id,
+        'status': status,
+        'pcbs': page_obj,
     }
     return render(request, 'pcb_test_result_app/pcb_test_select.html', context)
 
@@ -87,181 +232,167 @@ def pcb_test_result_create(request):
 @permission_required('pcb_test_result_app.add_pcbtestresult', raise_exception=True)
 def pcb_test_execute_steps(request, pcb_id):
     """Execute test steps for a specific PCB based on its test configuration"""
-    pcb = get_object_or_404(Pcb, id=pcb_id)
+    pcb = get_object_or_404(Pcb.objects.select_related('batch__test_config_type'), id=pcb_id)
     test_config = pcb.batch.test_config_type
-    test_steps = test_config.steps.all().order_by('order')
     
     # If no results exist, create a new test result
     if 'current_test_result_id' not in request.session:
         test_result = PcbTestResult.objects.create(
             pcb=pcb,
-            technician=request.user
+            technician=request.user,
+            config_version=cached_version(test_config)[0]
         )
         request.session['current_test_result_id'] = test_result.id
     else:
         test_result_id = request.session['current_test_result_id']
         try:
-            test_result = PcbTestResult.objects.get(id=test_result_id)
+            test_result = PcbTestResult.objects.select_related('config_version').get(id=test_result_id)
         except PcbTestResult.DoesNotExist:
             # If the test result was deleted or session is invalid, create a new one
             test_result = PcbTestResult.objects.create(
                 pcb=pcb,
-                technician=request.user
+                technician=request.user,
+                config_version=cached_version(test_config)[0]
             )
             request.session['current_test_result_id'] = test_result.id
+        if test_result.config_version is None:
+            # Started before configs were versioned
+            test_result.config_version = cached_version(test_config)[0]
+            test_result.save(update_fields=['config_version', 'updated_at'])
+    
+    # The steps and limits come from the version the test started with
+    compiled = compiled_version(test_result.config_version)
+    progress = StepProgress(compiled.steps)
+    progress.load(test_result)
     
     # Process any submitted step before displaying the next one
     if request.method == 'POST':
         step_id = request.POST.get('step_id')
-        step = get_object_or_404(TestStep, id=step_id)
+        step = progress.get_step(step_id)
+        step_result = None
         
-        # Process the step result
-        if step.step_type == 'VOLTAGE':
-            measured_value = request.POST.get('measured_value')
-            if measured_value:
-                try:
-                    measured_value = float(measured_value)
-                    passed = step.min_value <= measured_value <= step.max_value
-                    VoltageMeasurementResult.objects.create(
-                        test_result=test_result,
-                        parameter_name=step.parameter_name,
-                        measured_value=measured_value,
-                        unit=step.unit or 'V',
-                        min_value=step.min_value,
-                        max_value=step.max_value,
-                        passed=passed
-                    )
-                except ValueError:
-                    messages.error(request, f'Invalid voltage value: {measured_value}')
-        elif step.step_type == 'CURRENT':
-            measured_value = request.POST.get('measured_value')
-            if measured_value:
-                try:
-                    measured_value = float(measured_value)
-                    passed = step.min_value <= measured_value <= step.max_value
-                    CurrentMeasurementResult.objects.create(
-                        test_result=test_result,
-                        parameter_name=step.parameter_name,
-                        measured_value=measured_value,
-                        unit=step.unit or 'A',
-                        min_value=step.min_value,
-                        max_value=step.max_value,
-                        passed=passed
-                    )
-                except ValueError:
-                    messages.error(request, f'Invalid current value: {measured_value}')
-        elif step.step_type == 'RESISTANCE':
-            measured_value = request.POST.get('measured_value')
-            if measured_value:
-                try:
-                    measured_value = float(measured_value)
-                    passed = step.min_value <= measured_value <= step.max_value
-                    ResistanceMeasurementResult.objects.create(
-                        test_result=test_result,
-                        parameter_name=step.parameter_name,
-                        measured_value=measured_value,
-                        unit=step.unit or 'Ω',
-                        min_value=step.min_value,
-                        max_value=step.max_value,
-                        passed=passed
-                    )
-                except ValueError:
-                    messages.error(request, f'Invalid resistance value: {measured_value}')
-        elif step.step_type == 'FREQUENCY':
-            measured_value = request.POST.get('measured_value')
-            if measured_value:
-                try:
-                    measured_value = float(measured_value)
-                    passed = step.min_value <= measured_value <= step.max_value
-                    FrequencyMeasurementResult.objects.create(
+        # The result row and the cursor move are one write; a second submission of
+        # the same step loses the race on the cursor and is rolled back
+        try:
+            with transaction.atomic():
+                # Process the step result
+                if step != progress.next_step:
+                    # The step was already recorded, e.g. the form was submitted twice
+                    messages.warning(request, 'This step has already been recorded.')
+                elif step.step_type == 'VOLTAGE':
+                    measured_value = request.POST.get('measured_value')
+                    if measured_value:
+                        try:
+                            measured_value = float(measured_value)
+                            passed = step.min_value <= measured_value <= step.max_value
+                            step_result = VoltageMeasurementResult.objects.create(
+                                test_result=test_result,
+                                test_step_id=step.id,
+                                parameter_name=step.parameter_name,
+                                measured_value=measured_value,
+                                unit=step.unit or 'V',
+                                min_value=step.min_value,
+                                max_value=step.max_value,
+                                passed=passed
+                            )
+                        except ValueError:
+                            messages.error(request, f'Invalid voltage value: {measured_value}')
+                elif step.step_type == 'CURRENT':
+                    measured_value = request.POST.get('measured_value')
+                    if measured_value:
+                        try:
+                            measured_value = float(measured_value)
+                            passed = step.min_value <= measured_value <= step.max_value
+                            step_result = CurrentMeasurementResult.objects.create(
+                                test_result=test_result,
+                                test_step_id=step.id,
+                                parameter_name=step.parameter_name,
+                                measured_value=measured_value,
+                                unit=step.unit or 'A',
+                                min_value=step.min_value,
+                                max_value=step.max_value,
+                                passed=passed
+                            )
+                        except ValueError:
+                            messages.error(request, f'Invalid current value: {measured_value}')
+                elif step.step_type == 'RESISTANCE':
+                    measured_value = request.POST.get('measured_value')
+                    if measured_value:
+                        try:
+                            measured_value = float(measured_value)
+                            passed = step.min_value <= measured_value <= step.max_value
+                            step_result = ResistanceMeasurementResult.objects.create(
+                                test_result=test_result,
+                                test_step_id=step.id,
+                                parameter_name=step.parameter_name,
+                                measured_value=measured_value,
+                                unit=step.unit or 'Ω',
+                                min_value=step.min_value,
+                                max_value=step.max_value,
+                                passed=passed
+                            )
+                        except ValueError:
+                            messages.error(request, f'Invalid resistance value: {measured_value}')
+                elif step.step_type == 'FREQUENCY':
+                    measured_value = request.POST.get('measured_value')
+                    if measured_value:
+                        try:
+                            measured_value = float(measured_value)
+                            passed = step.min_value <= measured_value <= step.max_value
+                            step_result = FrequencyMeasurementResult.objects.create(
+                                test_result=test_result,
+                                test_step_id=step.id,
+                                parameter_name=step.parameter_name,
+                                measured_value=measured_value,
+                                unit=step.unit or 'Hz',
+                                min_value=step.min_value,
+                                max_value=step.max_value,
+                                passed=passed
+                            )
+                        except ValueError:
+                            messages.error(request, f'Invalid frequency value: {measured_value}')
+                elif step.step_type == 'QUESTION':
+                    user_answer = request.POST.get('user_answer')
+                    if user_answer:  # Check if not empty string, None, or False
+                        user_bool = user_answer.lower() in ['true', '1', 'yes']  # Handle various true values
+                        required_bool = step.required_answer
+                        passed = user_bool == required_bool
+                        step_result = YesNoQuestionResult.objects.create(
+                            test_result=test_result,
+                            test_step_id=step.id,
+                            question_text=step.question_text,
+                            user_answer=user_bool,
+                            required_answer=required_bool,
+                            passed=passed
+                        )
+                elif step.step_type == 'INSTRUCTION':
+                    # For instructions, acknowledge completion
+                    step_result = InstructionResult.objects.create(
                         test_result=test_result,
-                        parameter_name=step.parameter_name,
-                        measured_value=measured_value,
-                        unit=step.unit or 'Hz',
-                        min_value=step.min_value,
-                        max_value=step.max_value,
-                        passed=passed
+                        test_step_id=step.id,
+                        instruction_text=step.instruction_text,
+                        acknowledged=True  # Instruction is acknowledged when user proceeds to next step
                     )
-                except ValueError:
-                    messages.error(request, f'Invalid frequency value: {measured_value}')
-        elif step.step_type == 'QUESTION':
-            user_answer = request.POST.get('user_answer')
-            if user_answer:  # Check if not empty string, None, or False
-                user_bool = user_answer.lower() in ['true', '1', 'yes']  # Handle various true values
-                required_bool = step.required_answer
-                passed = user_bool == required_bool
-                YesNoQuestionResult.objects.create(
-                    test_result=test_result,
-                    question_text=step.question_text,
-                    user_answer=user_bool,
-                    required_answer=required_bool,
-                    passed=passed
-                )
-        elif step.step_type == 'INSTRUCTION':
-            # For instructions, acknowledge completion
-            InstructionResult.objects.create(
-                test_result=test_result,
-                instruction_text=step.instruction_text,
-                acknowledged=True  # Instruction is acknowledged when user proceeds to next step
-            )
+        
+                if step_result is not None:
+                    progress.advance(test_result, step)
+        except StepAlreadyRecorded:
+            messages.warning(request, 'This step has already been recorded.')
+            test_result.refresh_from_db()
+            progress.load(test_result)
     
     # Find the next uncompleted step
-    completed_step_ids = []
-    
-    # Check voltage measurements
-    completed_voltage_measurements = test_result.voltage_measurements.values_list('parameter_name', flat=True)
-    completed_step_ids.extend(test_steps.filter(
-        step_type='VOLTAGE',
-        parameter_name__in=completed_voltage_measurements
-    ).values_list('id', flat=True))
-    
-    # Check current measurements
-    completed_current_measurements = test_result.current_measurements.values_list('parameter_name', flat=True)
-    completed_step_ids.extend(test_steps.filter(
-        step_type='CURRENT',
-        parameter_name__in=completed_current_measurements
-    ).values_list('id', flat=True))
-    
-    # Check resistance measurements
-    completed_resistance_measurements = test_result.resistance_measurements.values_list('parameter_name', flat=True)
-    completed_step_ids.extend(test_steps.filter(
-        step_type='RESISTANCE',
-        parameter_name__in=completed_resistance_measurements
-    ).values_list('id', flat=True))
-    
-    # Check frequency measurements
-    completed_frequency_measurements = test_result.frequency_measurements.values_list('parameter_name', flat=True)
-    completed_step_ids.extend(test_steps.filter(
-        step_type='FREQUENCY',
-        parameter_name__in=completed_frequency_measurements
-    ).values_list('id', flat=True))
-    
-    # Check yes/no questions
-    completed_questions = test_result.yes_no_questions.values_list('question_text', flat=True)
-    completed_step_ids.extend(test_steps.filter(
-        step_type='QUESTION',
-        question_text__in=completed_questions
-    ).values_list('id', flat=True))
-    
-    # Check instructions
-    completed_instructions = test_result.instructions.values_list('instruction_text', flat=True)
-    completed_step_ids.extend(test_steps.filter(
-        step_type='INSTRUCTION',
-        instruction_text__in=completed_instructions
-    ).values_list('id', flat=True))
-    
-    # Get the next step to display
-    next_step = test_steps.exclude(id__in=completed_step_ids).order_by('order').first()
+    next_step = progress.next_step
     
     # Check if this is the last step
-    is_last_step = len(completed_step_ids) + 1 == test_steps.count()
+    is_last_step = progress.is_last_step
     
     # If this is the last step and notes were submitted, save them
     if request.method == 'POST' and is_last_step:
         test_notes = request.POST.get('test_notes', '').strip()
         if test_notes:
             test_result.notes = test_notes
-            test_result.save()
+            test_result.save(update_fields=['notes', 'updated_at'])
     
     if next_step is None:
         # All steps completed, show the summary page
@@ -269,26 +400,20 @@ def pcb_test_execute_steps(request, pcb_id):
         context = {
             'pcb': pcb,
             'test_result': test_result,
-            'total_steps': test_steps.count(),
-            'completed_steps': len(completed_step_ids),
+            'total_steps': progress.total_steps,
+            'completed_steps': progress.completed_steps,
+            'steps': progress.steps,
             'is_summary_page': True,
         }
         return render(request, 'pcb_test_result_app/pcb_test_execute.html', context)
     
-    # Calculate progress percentage
-    total_steps_count = test_steps.count()
-    completed_steps_count = len(completed_step_ids)
-    progress_percentage = 0
-    if total_steps_count > 0:
-        progress_percentage = int(((completed_steps_count + 1) / total_steps_count) * 100)
-    
     context = {
         'pcb': pcb,
         'test_result': test_result,
         'current_step': next_step,
-        'total_steps': total_steps_count,
-        'completed_steps': completed_steps_count,
-        'progress_percentage': progress_percentage,
+        'total_steps': progress.total_steps,
+        'completed_steps': progress.completed_steps,
+        'progress_percentage': progress.progress_percentage,
     }
     return render(request, 'pcb_test_result_app/pcb_test_execute.html', context)
 
@@ -311,7 +436,7 @@ def pcb_test_results_by_pcb(request, pcb_serial_number):
 @permission_required('pcb_test_result_app.view_pcbtestresult', raise_exception=True)
 def pcb_test_result_detail(request, pk):
     """View details of a specific PCB Test Result"""
-    test_result = get_object_or_404(PcbTestResult, pk=pk)
+    test_result = get_object_or_404(with_result_summary(PcbTestResult.objects.select_related('qa_signoff')), pk=pk)
     
     # Get QA signoff if it exists
     try:
@@ -320,57 +445,14 @@ def pcb_test_result_detail(request, pk):
         qa_signoff = None
     
     # Check if all tests have passed
-    all_tests_passed = True
-    
-    # Check voltage measurements
-    total_voltage = test_result.voltage_measurements.count()
-    passed_voltage = test_result.voltage_measurements.filter(passed=True).count()
-    if passed_voltage != total_voltage:
-        all_tests_passed = False
-    
-    # Check current measurements
-    total_current = test_result.current_measurements.count()
-    passed_current = test_result.current_measurements.filter(passed=True).count()
-    if passed_current != total_current:
-        all_tests_passed = False
-    
-    # Check resistance measurements
-    total_resistance = test_result.resistance_measurements.count()
-    passed_resistance = test_result.resistance_measurements.filter(passed=True).count()
-    if passed_resistance != total_resistance:
-        all_tests_passed = False
-    
-    # Check frequency measurements
-    total_frequency = test_result.frequency_measurements.count()
-    passed_frequency = test_result.frequency_measurements.filter(passed=True).count()
-    if passed_frequency != total_frequency:
-        all_tests_passed = False
-    
-    # Check yes/no questions
-    total_questions = test_result.yes_no_questions.count()
-    passed_questions = test_result.yes_no_questions.filter(passed=True).count()
-    if passed_questions != total_questions:
-        all_tests_passed = False
-    
-    # Check instructions
-    total_instructions = test_result.instructions.count()
-    passed_instructions = test_result.instructions.filter(acknowledged=True).count()
-    if passed_instructions != total_instructions:
-        all_tests_passed = False
+    test_counts, all_tests_passed = get_result_summary(test_result)
     
     context = {
         'test_result': test_result,
         'qa_signoff': qa_signoff,
         'can_qa_signoff': request.user.groups.filter(name='qa_signoff_board_bringup_result').exists() or request.user.is_superuser,
         'all_tests_passed': all_tests_passed,
-        'test_counts': {
-            'voltage': {'total': total_voltage, 'passed': passed_voltage},
-            'current': {'total': total_current, 'passed': passed_current},
-            'resistance': {'total': total_resistance, 'passed': passed_resistance},
-            'frequency': {'total': total_frequency, 'passed': passed_frequency},
-            'questions': {'total': total_questions, 'passed': passed_questions},
-            'instructions': {'total': total_instructions, 'passed': passed_instructions},
-        }
+        'test_counts': test_counts,
     }
     return render(request, 'pcb_test_result_app/pcb_test_result_detail.html', context)
 
@@ -379,7 +461,7 @@ def pcb_test_result_detail(request, pk):
 @permission_required('pcb_test_result_app.change_pcbtestresult', raise_exception=True)
 def pcb_test_result_update(request, pk):
     """Update an existing PCB Test Result"""
-    test_result = get_object_or_404(PcbTestResult, pk=pk)
+    test_result = get_object_or_404(PcbTestResult.objects.select_related('pcb__batch'), pk=pk)
     
     # Handle AJAX request for JSON data
     if request.GET.get('format') == 'json':
@@ -393,42 +475,38 @@ def pcb_test_result_update(request, pk):
         notes = request.POST.get('notes', '')
         
         try:
-            test_result.notes = notes
-            test_result.save()
-            
-            # Clear existing results
-            test_result.voltage_measurements.all().delete()
-            test_result.current_measurements.all().delete()
-            test_result.resistance_measurements.all().delete()
-            test_result.frequency_measurements.all().delete()
-            test_result.yes_no_questions.all().delete()
-            test_result.instructions.all().delete()
-            
-            # Process measurement results
-            process_measurement_results(test_result, request.POST)
-            
-            # Process yes/no question results
-            process_yes_no_question_results(test_result, request.POST)
-            
-            # Process instruction results
-            process_instruction_results(test_result, request.POST)
-            
-            # Determine overall result
-            determine_overall_result(test_result)
+            # Notes, result rows and overall result are saved together or not at all
+            with transaction.atomic():
+                test_result.notes = notes
+                test_result.save(update_fields=['notes', 'updated_at'])
+                
+                # Write only the result rows that were changed
+                apply_result_edits(test_result, request.POST)
+                
+                # Determine overall result
+                determine_overall_result(test_result)
+            refresh_result_rollups([test_result])
+            refresh_result_spc([test_result])
             
             messages.success(request, f'Test Result for PCB "{test_result.pcb.serial_number}" updated successfully.')
             return redirect('pcb_test_result_detail', pk=test_result.pk)
         except Exception as e:
             messages.error(request, f'Error updating test result: {str(e)}')
-            return redirect('pcb_test_result_list')
+            return redirect('pcb_test_result_update', pk=test_result.pk)
     
-    # GET request - show form with existing data
-    # Get all PCBs for the dropdown
-    pcbs = Pcb.objects.all().order_by('serial_number')
+    # GET request - show form with existing data, measurements grouped by kind
+    measurements = list(test_result.measurements.order_by('pk'))
+    measurement_groups = []
+    for prefix, kind in MEASUREMENT_PREFIXES.items():
+        rows = [row for row in measurements if row.kind == kind]
+        if rows:
+            measurement_groups.append({'prefix': prefix, 'label': dict(MeasurementResult.KIND_CHOICES)[kind], 'rows': rows})
     
     context = {
         'test_result': test_result,
-        'pcbs': pcbs,
+        'measurement_groups': measurement_groups,
+        'questions': test_result.yes_no_questions.order_by('pk'),
+        'instructions': test_result.instructions.order_by('pk'),
     }
     return render(request, 'pcb_test_result_app/pcb_test_result_update.html', context)
 
@@ -437,217 +515,131 @@ def pcb_test_result_update(request, pk):
 @permission_required('pcb_test_result_app.delete_pcbtestresult', raise_exception=True)
 def pcb_test_result_delete(request, pk):
     """Delete a PCB Test Result"""
-    test_result = get_object_or_404(PcbTestResult, pk=pk)
+    test_result = get_object_or_404(PcbTestResult.objects.select_related('pcb__batch'), pk=pk)
     
     if request.method == 'POST':
         # Form submitted from modal, proceed with deletion without additional confirmation
         # since we already validate in the frontend modal
         test_result_notes = test_result.notes
         test_result.delete()
+        refresh_result_rollups([test_result])
+        refresh_result_spc([test_result])
         messages.success(request, f'Test Result for PCB "{test_result.pcb.serial_number}" deleted successfully.')
         return redirect('pcb_test_result_list')
     
     return redirect('pcb_test_result_list')
 
 
-def process_measurement_results(test_result, post_data):
-    """Process measurement results from POST data"""
-    # Process voltage measurements
-    voltage_count = int(post_data.get('voltage_count', 0))
-    for i in range(voltage_count):
-        param_name = post_data.get(f'voltage_param_name_{i}')
-        measured_value = post_data.get(f'voltage_measured_{i}')
-        min_value = post_data.get(f'voltage_min_{i}')
-        max_value = post_data.get(f'voltage_max_{i}')
-        unit = post_data.get(f'voltage_unit_{i}', 'V')
-        
-        if param_name and measured_value not in [None, ''] and min_value not in [None, ''] and max_value not in [None, '']:
-            try:
-                measured_value = float(measured_value)
-                min_value = float(min_value)
-                max_value = float(max_value)
-                passed = min_value <= measured_value <= max_value
-                
-                VoltageMeasurementResult.objects.create(
-                    test_result=test_result,
-                    parameter_name=param_name,
-                    measured_value=measured_value,
-                    unit=unit,
-                    min_value=min_value,
-                    max_value=max_value,
-                    passed=passed
-                )
-            except ValueError:
-                # Skip invalid values
-                pass
-
-    # Process current measurements
-    current_count = int(post_data.get('current_count', 0))
-    for i in range(current_count):
-        param_name = post_data.get(f'current_param_name_{i}')
-        measured_value = post_data.get(f'current_measured_{i}')
-        min_value = post_data.get(f'current_min_{i}')
-        max_value = post_data.get(f'current_max_{i}')
-        unit = post_data.get(f'current_unit_{i}', 'A')
-        
-        if param_name and measured_value not in [None, ''] and min_value not in [None, ''] and max_value not in [None, '']:
-            try:
-                measured_value = float(measured_value)
-                min_value = float(min_value)
-                max_value = float(max_value)
-                passed = min_value <= measured_value <= max_value
-                
-                CurrentMeasurementResult.objects.create(
-                    test_result=test_result,
-                    parameter_name=param_name,
-                    measured_value=measured_value,
-                    unit=unit,
-                    min_value=min_value,
-                    max_value=max_value,
-                    passed=passed
-                )
-            except ValueError:
-                # Skip invalid values
-                pass
-
-    # Process resistance measurements
-    resistance_count = int(post_data.get('resistance_count', 0))
-    for i in range(resistance_count):
-        param_name = post_data.get(f'resistance_param_name_{i}')
-        measured_value = post_data.get(f'resistance_measured_{i}')
-        min_value = post_data.get(f'resistance_min_{i}')
-        max_value = post_data.get(f'resistance_max_{i}')
-        unit = post_data.get(f'resistance_unit_{i}', 'Ω')
-        
-        if param_name and measured_value not in [None, ''] and min_value not in [None, ''] and max_value not in [None, '']:
-            try:
-                measured_value = float(measured_value)
-                min_value = float(min_value)
-                max_value = float(max_value)
-                passed = min_value <= measured_value <= max_value
-                
-                ResistanceMeasurementResult.objects.create(
-                    test_result=test_result,
-                    parameter_name=param_name,
-                    measured_value=measured_value,
-                    unit=unit,
-                    min_value=min_value,
-                    max_value=max_value,
-                    passed=passed
-                )
-            except ValueError:
-                # Skip invalid values
-                pass
-
-    # Process frequency measurements
-    frequency_count = int(post_data.get('frequency_count', 0))
-    for i in range(frequency_count):
-        param_name = post_data.get(f'frequency_param_name_{i}')
-        measured_value = post_data.get(f'frequency_measured_{i}')
-        min_value = post_data.get(f'frequency_min_{i}')
-        max_value = post_data.get(f'frequency_max_{i}')
-        unit = post_data.get(f'frequency_unit_{i}', 'Hz')
-        
-        if param_name and measured_value not in [None, ''] and min_value not in [None, ''] and max_value not in [None, '']:
-            try:
-                measured_value = float(measured_value)
-                min_value = float(min_value)
-                max_value = float(max_value)
-                passed = min_value <= measured_value <= max_value
-                
-                FrequencyMeasurementResult.objects.create(
-                    test_result=test_result,
-                    parameter_name=param_name,
-                    measured_value=measured_value,
-                    unit=unit,
-                    min_value=min_value,
-                    max_value=max_value,
-                    passed=passed
-                )
-            except ValueError:
-                # Skip invalid values
-                pass
-
-
-def process_yes_no_question_results(test_result, post_data):
-    """Process yes/no question results from POST data"""
-    question_count = int(post_data.get('question_count', 0))
-    for i in range(question_count):
-        question_text = post_data.get(f'question_text_{i}')
-        user_answer = post_data.get(f'question_user_answer_{i}')
-        required_answer = post_data.get(f'question_required_{i}')
-        
-        if question_text and user_answer is not None and required_answer is not None:
-            try:
-                user_bool = user_answer == 'true' or user_answer == 'True' or user_answer == '1'
-                required_bool = required_answer == 'true' or required_answer == 'True' or required_answer == '1'
-                passed = user_bool == required_bool
-                
-                YesNoQuestionResult.objects.create(
-                    test_result=test_result,
-                    question_text=question_text,
-                    user_answer=user_bool,
-                    required_answer=required_bool,
-                    passed=passed
-                )
-            except ValueError:
-                # Skip invalid values
-                pass
-
-
-def process_instruction_results(test_result, post_data):
-    """Process instruction results from POST data"""
-    instruction_count = int(post_data.get('instruction_count', 0))
-    for i in range(instruction_count):
-        instruction_text = post_data.get(f'instruction_text_{i}')
-        acknowledged = post_data.get(f'instruction_acknowledged_{i}')
-        
-        if instruction_text and acknowledged is not None:
-            try:
-                ack_bool = acknowledged == 'true' or acknowledged == 'True' or acknowledged == '1'
-                
-                InstructionResult.objects.create(
-                    test_result=test_result,
-                    instruction_text=instruction_text,
-                    acknowledged=ack_bool
-                )
-            except ValueError:
-                # Skip invalid values
-                pass
+def _read_json_body(request):
+    """Parse a JSON request body, returning (data, error response)"""
+    if request.content_type != 'application/json':
+        return None, JsonResponse({'success': False, 'errors': ['Content-Type must be application/json.']}, status=415)
+    try:
+        return json.loads(request.body), None
+    except (UnicodeDecodeError, ValueError):
+        return None, JsonResponse({'success': False, 'errors': ['Request body is not valid JSON.']}, status=400)
+
+
+@require_POST
+@login_required
+@permission_required('pcb_test_result_app.add_pcbtestresult', raise_exception=True)
+def pcb_test_run_ingest(request):
+    """Record a whole test run posted as JSON by an automated test fixture"""
+    # CSRF is checked as for any post made with the session cookie: the
+    # fixture sends its csrftoken cookie back in the X-CSRFToken header
+    data, error_response = _read_json_body(request)
+    if error_response:
+        return error_response
+    if not isinstance(data, dict):
+        return JsonResponse({'success': False, 'errors': ['Expected a JSON object.']}, status=400)
+    
+    serial_number = str(data.get('serial_number', '')).strip()
+    pcb = Pcb.objects.select_related('batch__test_config_type').filter(serial_number=serial_number).first()
+    if pcb is None:
+        return JsonResponse({'success': False, 'errors': [f'No PCB with serial number "{serial_number}".']}, status=404)
+    
+    try:
+        test_result = ingest_test_run(pcb, request.user, data.get('readings'), str(data.get('notes') or ''))
+    except IngestError as e:
+        return JsonResponse({'success': False, 'errors': e.errors}, status=400)
+    
+    return JsonResponse({
+        'success': True,
+        'test_result_id': test_result.id,
+        'result': test_result.result,
+        'total_steps': test_result.total_steps,
+        'passed_steps': test_result.passed_steps,
+        'failed_steps': test_result.failed_steps,
+    }, status=201)
+
+
+@require_POST
+@login_required
+@permission_required('pcb_test_result_app.add_pcbtestresult', raise_exception=True)
+def pcb_test_stream_ingest(request):
+    """Record newline-delimited JSON readings streamed by a test fixture"""
+    # CSRF is checked as for pcb_test_run_ingest, with the X-CSRFToken header
+    if request.content_type != 'application/x-ndjson':
+        return JsonResponse({'success': False, 'errors': ['Content-Type must be application/x-ndjson.']}, status=415)
+    # Records are committed in micro-batches of this many, or sooner when the stream is slow
+    try:
+        batch_size = int(request.GET.get('batch_size', STREAM_BATCH_SIZE))
+    except ValueError:
+        batch_size = 0
+    if not 1 <= batch_size <= MAX_STREAM_BATCH_SIZE:
+        return JsonResponse({'success': False,
+                             'errors': [f'batch_size must be between 1 and {MAX_STREAM_BATCH_SIZE}.']}, status=400)
+    
+    def acknowledgements():
+        # Records are read from the request only as fast as batches are
+        # committed, so a slow database slows the client down
+        ingestor = StreamIngestor(request.user, batch_size=batch_size)
+        for ack in ingestor.ingest(read_records(request)):
+            yield json.dumps(ack) + '\n'
+    
+    return StreamingHttpResponse(acknowledgements(), content_type='application/x-ndjson')
+
+
+@login_required
+@permission_required('pcb_test_result_app.view_pcbtestresult', raise_exception=True)
+def pcb_test_spc(request, config_id):
+    """SPC statistics of a test config's measured parameters in a batch, as JSON"""
+    test_config = get_object_or_404(TestConfigType, pk=config_id)
+    try:
+        batch_id = int(request.GET.get('batch', ''))
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'A numeric "batch" parameter is required.'}, status=400)
+    batch = get_object_or_404(Batch, pk=batch_id, test_config_type=test_config)
+    
+    # Read only; the statistics are refreshed when results are written
+    parameters = spc_parameters(test_config)
+    statistics = stored_spc_statistics(test_config, batch)
+    data = {
+        'test_config_id': test_config.pk,
+        'batch_id': batch.pk,
+        'parameters': [spc_summary(statistics[key], limits) for key, limits in parameters.items()],
+    }
+    
+    # Control chart of one parameter, given as KIND:name
+    parameter = request.GET.get('parameter')
+    if parameter:
+        kind, _, parameter_name = parameter.partition(':')
+        stats = statistics.get((kind, parameter_name))
+        if stats is None:
+            return JsonResponse({'success': False, 'error': f'Unknown parameter "{parameter}".'}, status=404)
+        try:
+            points = min(int(request.GET.get('points', CHART_POINTS)), CHART_POINTS * 10)
+        except ValueError:
+            points = CHART_POINTS
+        data['chart'] = control_chart(stats, max(points, 1))
+    return JsonResponse(data)
 
 
 def determine_overall_result(test_result):
     """Determine the overall test result based on individual measurements and questions"""
-    # Get all measurement results
-    voltage_results = test_result.voltage_measurements.all()
-    current_results = test_result.current_measurements.all()
-    resistance_results = test_result.resistance_measurements.all()
-    frequency_results = test_result.frequency_measurements.all()
-    question_results = test_result.yes_no_questions.all()
-    instruction_results = test_result.instructions.all()
-    
-    # Check if any results failed
-    all_passed = True
-    
-    # Check measurements
-    for result in list(voltage_results) + list(current_results) + list(resistance_results) + list(frequency_results):
-        if not result.passed:
-            all_passed = False
-            break
-    
-    # Check questions
-    if all_passed:
-        for result in question_results:
-            if not result.passed:
-                all_passed = False
-                break
-    
-    # Check instructions
-    if all_passed:
-        for result in instruction_results:
-            if not result.acknowledged:
-                all_passed = False
-                break
+    # Read the summary counters kept up to date with the result rows
+    test_result.refresh_from_db(fields=PcbTestResult.COUNTER_FIELDS)
+    all_passed = test_result.failed_steps == 0
     
     # Update test result
     if all_passed:
@@ -655,24 +647,26 @@ def determine_overall_result(test_result):
     else:
         test_result.result = PcbTestResult.FAILED
     
-    test_result.save()
+    test_result.save(update_fields=['result', 'updated_at'])
 
 
 @login_required
 @permission_required('pcb_test_result_app.add_pcbtestresult', raise_exception=True)
 def pcb_test_complete(request, pk):
     """Complete the test after summary view"""
-    test_result = get_object_or_404(PcbTestResult, pk=pk)
+    test_result = get_object_or_404(PcbTestResult.objects.select_related('pcb__batch'), pk=pk)
     
     if request.method == 'POST':
         # Get notes from the summary page
         test_notes = request.POST.get('test_notes', '').strip()
         if test_notes:
             test_result.notes = test_notes
-            test_result.save()
+            test_result.save(update_fields=['notes', 'updated_at'])
         
         # Determine overall result
         determine_overall_result(test_result)
+        refresh_result_rollups([test_result])
+        refresh_result_spc([test_result])
         
         # Clear the session variable
         if 'current_test_result_id' in request.session:
@@ -729,7 +723,7 @@ def qa_signoff_pcb_test(request, pk):
         messages.error(request, "You don't have permission to perform QA signoffs.")
         return redirect('pcb_test_result_list')
     
-    test_result = get_object_or_404(PcbTestResult, pk=pk)
+    test_result = get_object_or_404(with_result_summary(PcbTestResult.objects.select_related('pcb__batch', 'qa_signoff')), pk=pk)
     pcb = test_result.pcb
     
     if not test_result:
@@ -742,34 +736,11 @@ def qa_signoff_pcb_test(request, pk):
     except QaSignoff.DoesNotExist:
         existing_signoff = None
     
+    # Check if all tests have passed
+    test_counts, all_tests_passed = get_result_summary(test_result)
+    
     if request.method == 'POST' and not existing_signoff:
-        # Check if all steps passed
-        all_passed = True
-        
-        # Check measurements
-        for measurement in (list(test_result.voltage_measurements.all()) +
-                           list(test_result.current_measurements.all()) +
-                           list(test_result.resistance_measurements.all()) +
-                           list(test_result.frequency_measurements.all())):
-            if not measurement.passed:
-                all_passed = False
-                break
-        
-        # Check questions
-        if all_passed:
-            for question in test_result.yes_no_questions.all():
-                if not question.passed:
-                    all_passed = False
-                    break
-        
-        # Check instructions
-        if all_passed:
-            for instruction in test_result.instructions.all():
-                if not instruction.acknowledged:
-                    all_passed = False
-                    break
-        
-        if not all_passed:
+        if test_result.failed_steps:
             messages.error(request, "Cannot sign off: Not all test steps have passed.")
         else:
             # Create QA signoff
@@ -780,61 +751,16 @@ def qa_signoff_pcb_test(request, pk):
                 qa_notes=qa_notes if qa_notes else None,
                 is_signed_off=True
             )
+            refresh_result_rollups([test_result])
             messages.success(request, f"Successfully signed off on test result for {pcb.serial_number}")
             return redirect('pcb_test_result_detail', pk=test_result.pk)
     
-    # Check if all tests have passed
-    all_tests_passed = True
-    
-    # Check voltage measurements
-    total_voltage = test_result.voltage_measurements.count()
-    passed_voltage = test_result.voltage_measurements.filter(passed=True).count()
-    if passed_voltage != total_voltage:
-        all_tests_passed = False
-    
-    # Check current measurements
-    total_current = test_result.current_measurements.count()
-    passed_current = test_result.current_measurements.filter(passed=True).count()
-    if passed_current != total_current:
-        all_tests_passed = False
-    
-    # Check resistance measurements
-    total_resistance = test_result.resistance_measurements.count()
-    passed_resistance = test_result.resistance_measurements.filter(passed=True).count()
-    if passed_resistance != total_resistance:
-        all_tests_passed = False
-    
-    # Check frequency measurements
-    total_frequency = test_result.frequency_measurements.count()
-    passed_frequency = test_result.frequency_measurements.filter(passed=True).count()
-    if passed_frequency != total_frequency:
-        all_tests_passed = False
-    
-    # Check yes/no questions
-    total_questions = test_result.yes_no_questions.count()
-    passed_questions = test_result.yes_no_questions.filter(passed=True).count()
-    if passed_questions != total_questions:
-        all_tests_passed = False
-    
-    # Check instructions
-    total_instructions = test_result.instructions.count()
-    passed_instructions = test_result.instructions.filter(acknowledged=True).count()
-    if passed_instructions != total_instructions:
-        all_tests_passed = False
-
     context = {
         'pcb': pcb,
         'test_result': test_result,
         'existing_signoff': existing_signoff,
         'all_tests_passed': all_tests_passed,
-        'test_counts': {
-            'voltage': {'total': total_voltage, 'passed': passed_voltage},
-            'current': {'total': total_current, 'passed': passed_current},
-            'resistance': {'total': total_resistance, 'passed': passed_resistance},
-            'frequency': {'total': total_frequency, 'passed': passed_frequency},
-            'questions': {'total': total_questions, 'passed': passed_questions},
-            'instructions': {'total': total_instructions, 'passed': passed_instructions},
-        }
+        'test_counts': test_counts,
     }
     return render(request, 'pcb_test_result_app/qa_signoff_pcb_test.html', context)
 
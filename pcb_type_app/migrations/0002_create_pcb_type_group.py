@@ -5,6 +5,7 @@ from django.contrib.contenttypes.models import ContentType
 
 def create_pcb_type_group(apps, schema_editor):
     """Create the mng_pcb_type group and assign permissions"""
+    db_alias = schema_editor.connection.alias
     # We need to use the historical version of the models
     Group = apps.get_model('auth', 'Group')
     Permission = apps.get_model('auth', 'Permission')
@@ -12,13 +13,13 @@ def create_pcb_type_group(apps, schema_editor):
     PcbType = apps.get_model('pcb_type_app', 'PcbType')
 
     # Get the content type for PcbType model
-    pcb_type_content_type = ContentType.objects.get_for_model(PcbType)
+    pcb_type_content_type = ContentType.objects.db_manager(db_alias).get_for_model(PcbType)
 
     # Create the group
-    pcb_group, created = Group.objects.get_or_create(name='mng_pcb_type')
+    pcb_group, created = Group.objects.using(db_alias).get_or_create(name='mng_pcb_type')
 
     # Get the permissions
-    permissions = Permission.objects.filter(
+    permissions = Permission.objects.using(db_alias).filter(
         content_type=pcb_type_content_type,
         codename__in=['add_pcbtype', 'change_pcbtype', 'delete_pcbtype', 'view_pcbtype']
     )
@@ -30,8 +31,9 @@ def create_pcb_type_group(apps, schema_editor):
 
 def remove_pcb_type_group(apps, schema_editor):
     """Remove the mng_pcb_type group"""
+    db_alias = schema_editor.connection.alias
     Group = apps.get_model('auth', 'Group')
-    pcb_group = Group.objects.filter(name='mng_pcb_type')
+    pcb_group = Group.objects.using(db_alias).filter(name='mng_pcb_type')
     if pcb_group.exists():
         pcb_group.delete()
 
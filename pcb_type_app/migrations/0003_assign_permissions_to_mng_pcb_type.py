@@ -5,6 +5,7 @@ from django.contrib.contenttypes.models import ContentType
 
 def assign_permissions_to_group(apps, schema_editor):
     """Assign permissions to the mng_pcb_type group"""
+    db_alias = schema_editor.connection.alias
     # Get the Group and Permission models as they exist at the time of this migration
     Group = apps.get_model('auth', 'Group')
     Permission = apps.get_model('auth', 'Permission')
@@ -13,16 +14,16 @@ def assign_permissions_to_group(apps, schema_editor):
 
     # Get the content type for PcbType model
     try:
-        pcb_type_content_type = ContentType.objects.get(app_label='pcb_type_app', model='pcbtype')
+        pcb_type_content_type = ContentType.objects.using(db_alias).get(app_label='pcb_type_app', model='pcbtype')
     except ContentType.DoesNotExist:
         # If ContentType doesn't exist yet, try to get it by looking for the model
-        pcb_type_content_type = ContentType.objects.get_for_model(PcbType)
+        pcb_type_content_type = ContentType.objects.db_manager(db_alias).get_for_model(PcbType)
 
     # Get or create the group
-    pcb_group, created = Group.objects.get_or_create(name='mng_pcb_type')
+    pcb_group, created = Group.objects.using(db_alias).get_or_create(name='mng_pcb_type')
 
     # Get all permissions for the PcbType model
-    pcb_permissions = Permission.objects.filter(content_type=pcb_type_content_type)
+    pcb_permissions = Permission.objects.using(db_alias).filter(content_type=pcb_type_content_type)
 
     # Add all permissions to the group
     for perm in pcb_permissions:
@@ -31,8 +32,9 @@ def assign_permissions_to_group(apps, schema_editor):
 
 def remove_permissions_from_group(apps, schema_editor):
     """Remove permissions from the mng_pcb_type group"""
+    db_alias = schema_editor.connection.alias
     Group = apps.get_model('auth', 'Group')
-    pcb_group = Group.objects.filter(name='mng_pcb_type').first()
+    pcb_group = Group.objects.using(db_alias).filter(name='mng_pcb_type').first()
     if pcb_group:
         pcb_group.permissions.clear()
 
@@ -11,8 +11,21 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'moduletrack.settings')
 django.setup()
 
-def restore_db_from_backup(backup_file):
-    """Restore the database from a backup file"""
+def restore_db_from_backup(backup_id=None):
+    """Restore the database from a backup made by backup_database, the latest by default.
+
+    The backup is loaded into a staging database file that replaces the
+    database once it is complete, so the site keeps serving the old data
+    meanwhile.
+    """
+    try:
+        args = [backup_id] if backup_id else []
+        management.call_command('restore_database', *args, interactive=False)
+    except Exception as e:
+        print(f"Error restoring database: {e}")
+
+def restore_db_from_json(backup_file):
+    """Restore the database from a JSON dump made by the old dumpdata backups"""
     try:
         # First, flush the database to remove all existing data
         management.call_command('flush', interactive=False)
@@ -25,13 +38,15 @@ def restore_db_from_backup(backup_file):
         print(f"Error restoring database: {e}")
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Usage: python restore_backup.py <backup_file.json>")
-        sys.exit(1)
-    
-    backup_file = sys.argv[1]
-    if not os.path.exists(backup_file):
-        print(f"Backup file does not exist: {backup_file}")
+    if len(sys.argv) > 2:
+        print("Usage: python restore_backup.py [backup_id | old_backup_file.json]")
         sys.exit(1)
     
-    restore_db_from_backup(backup_file)
\ No newline at end of file
+    backup = sys.argv[1] if len(sys.argv) == 2 else None
+    if backup and backup.endswith('.json'):
+        if not os.path.exists(backup):
+            print(f"Backup file does not exist: {backup}")
+            sys.exit(1)
+        restore_db_from_json(backup)
+    else:
+        restore_db_from_backup(backup)
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import TestConfigType, TestStep
+from .models import TestConfigType, TestConfigVersion, TestStep
+from .versions import publish_version
 
 
 class TestStepInline(admin.TabularInline):
@@ -17,10 +18,35 @@ class TestConfigTypeAdmin(admin.ModelAdmin):
     readonly_fields = ['created_at', 'updated_at']
     inlines = [TestStepInline]
 
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        publish_version(form.instance)
+
 
 @admin.register(TestStep)
 class TestStepAdmin(admin.ModelAdmin):
     list_display = ['test_config', 'order', 'step_type', 'parameter_name', 'question_text', 'instruction_text']
     list_filter = ['step_type', 'test_config']
     search_fields = ['test_config__name', 'parameter_name', 'question_text', 'instruction_text']
-    ordering = ['test_config', 'order']
\ No newline at end of file
+    ordering = ['test_config', 'order']
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        publish_version(obj.test_config)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        publish_version(obj.test_config)
+
+
+@admin.register(TestConfigVersion)
+class TestConfigVersionAdmin(admin.ModelAdmin):
+    list_display = ['test_config', 'number', 'published_at']
+    list_filter = ['test_config']
+    readonly_fields = ['test_config', 'number', 'limit_table', 'published_at']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -3,4 +3,7 @@ from django.apps import AppConfig
 
 class TestConfigTypeAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'test_config_type_app'
\ No newline at end of file
+    name = 'test_config_type_app'
+    
+    def ready(self):
+        import test_config_type_app.config_cache  # Drop cached configs when they change
@@ -0,0 +1,115 @@
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from .models import TestConfigType, TestConfigVersion, TestStep
+from .versions import compiled_version, current_version
+
+
+DEFAULT_CACHE_SIZE = 128  # Test configs kept per process unless TEST_CONFIG_CACHE_SIZE is set
+STAMP_KEY = 'test_config_stamp:{}'
+
+
+def _shared_cache():
+    """The cache shared by all worker processes, or None when only this process is kept current"""
+    alias = getattr(settings, 'TEST_CONFIG_CACHE_BACKEND', None)
+    return caches[alias] if alias else None
+
+
+class ConfigCache:
+    """Per-process LRU of the current version of each test config, with its compiled steps.
+
+    Entries are stored once the transaction that loaded them commits, each
+    with the config's version stamp. Saving or deleting
+    a config, one of its steps or a version sets a new stamp, so the next
+    lookup reloads the entry. With TEST_CONFIG_CACHE_BACKEND naming a
+    shared cache, the stamps live there and a change made by one worker
+    process is seen by all of them; the stamp is read on every lookup,
+    which is a cache hit rather than a database query.
+    """
+
+    def __init__(self, max_size=None):
+        self.max_size = max_size
+        self.entries = OrderedDict()  # config id -> (stamp, version, compiled version)
+        self.local_stamps = {}
+
+    def stamp(self, config_id):
+        """The current version stamp of a config"""
+        shared = _shared_cache()
+        if shared is None:
+            return self.local_stamps.setdefault(config_id, uuid.uuid4().hex)
+        key = STAMP_KEY.format(config_id)
+        stamp = shared.get(key)
+        if stamp is None:
+            # Never stamped, or evicted: start a stamp no local entry can match
+            shared.add(key, uuid.uuid4().hex, timeout=None)
+            stamp = shared.get(key)
+        return stamp
+
+    def invalidate(self, config_id):
+        """Give a config a new stamp so every cached copy of it is reloaded"""
+        self.entries.pop(config_id, None)
+        self.local_stamps[config_id] = uuid.uuid4().hex
+        shared = _shared_cache()
+        if shared is not None:
+            # Other processes must not reload before the change is committed
+            transaction.on_commit(
+                lambda: shared.set(STAMP_KEY.format(config_id), uuid.uuid4().hex, timeout=None)
+            )
+
+    def get(self, test_config):
+        """Return (current TestConfigVersion, CompiledVersion) of a test config"""
+        stamp = self.stamp(test_config.pk)
+        entry = self.entries.get(test_config.pk)
+        if entry is not None and entry[0] == stamp:
+            self.entries.move_to_end(test_config.pk)
+            return entry[1], entry[2]
+
+        version = current_version(test_config)
+        if self.stamp(test_config.pk) != stamp:
+            # Changed while loading, e.g. by publishing its first version
+            stamp = self.stamp(test_config.pk)
+            version = current_version(test_config)
+        compiled = compiled_version(version)
+        # Only committed data is kept: a version published by a transaction
+        # that rolls back must not outlive it. Stamped as of before the load,
+        # so any later change reloads it.
+        transaction.on_commit(lambda: self._store(test_config.pk, (stamp, version, compiled)))
+        return version, compiled
+
+    def _store(self, config_id, entry):
+        self.entries[config_id] = entry
+        self.entries.move_to_end(config_id)
+        max_size = self.max_size or getattr(settings, 'TEST_CONFIG_CACHE_SIZE', DEFAULT_CACHE_SIZE)
+        while len(self.entries) > max_size:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+        self.local_stamps.clear()
+
+
+config_cache = ConfigCache()
+
+
+def cached_version(test_config):
+    """Return (current TestConfigVersion, CompiledVersion) of a test config from the process cache"""
+    return config_cache.get(test_config)
+
+
+def invalidate_config(sender, instance, **kwargs):
+    """Drops the cached copies of the config a saved or deleted object belongs to"""
+    if kwargs.get('raw'):
+        return
+    config_id = instance.pk if sender is TestConfigType else instance.test_config_id
+    if config_id is not None:
+        config_cache.invalidate(config_id)
+
+
+for sender in (TestConfigType, TestStep, TestConfigVersion):
+    post_save.connect(invalidate_config, sender=sender, dispatch_uid=f'invalidate_config_save_{sender.__name__}')
+    post_delete.connect(invalidate_config, sender=sender, dispatch_uid=f'invalidate_config_delete_{sender.__name__}')
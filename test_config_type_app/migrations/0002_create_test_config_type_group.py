@@ -5,6 +5,7 @@ from django.contrib.contenttypes.models import ContentType
 
 def create_test_config_type_group(apps, schema_editor):
     """Create the mng_test_config_type group and assign permissions"""
+    db_alias = schema_editor.connection.alias
     # We need to use the historical version of the models
     Group = apps.get_model('auth', 'Group')
     Permission = apps.get_model('auth', 'Permission')
@@ -12,13 +13,13 @@ def create_test_config_type_group(apps, schema_editor):
     TestConfigType = apps.get_model('test_config_type_app', 'TestConfigType')
 
     # Get the content type for TestConfigType model
-    test_config_type_content_type = ContentType.objects.get_for_model(TestConfigType)
+    test_config_type_content_type = ContentType.objects.db_manager(db_alias).get_for_model(TestConfigType)
 
     # Create the group
-    test_config_group, created = Group.objects.get_or_create(name='mng_test_config_type')
+    test_config_group, created = Group.objects.using(db_alias).get_or_create(name='mng_test_config_type')
 
     # Get the permissions
-    permissions = Permission.objects.filter(
+    permissions = Permission.objects.using(db_alias).filter(
         content_type=test_config_type_content_type,
         codename__in=['add_testconfigtype', 'change_testconfigtype', 'delete_testconfigtype', 'view_testconfigtype']
     )
@@ -30,8 +31,9 @@ def create_test_config_type_group(apps, schema_editor):
 
 def remove_test_config_type_group(apps, schema_editor):
     """Remove the mng_test_config_type group"""
+    db_alias = schema_editor.connection.alias
     Group = apps.get_model('auth', 'Group')
-    test_config_group = Group.objects.filter(name='mng_test_config_type')
+    test_config_group = Group.objects.using(db_alias).filter(name='mng_test_config_type')
     if test_config_group.exists():
         test_config_group.delete()
 
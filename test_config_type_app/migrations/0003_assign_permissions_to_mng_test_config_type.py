@@ -5,6 +5,7 @@ from django.contrib.contenttypes.models import ContentType
 
 def assign_permissions_to_group(apps, schema_editor):
     """Assign permissions to the mng_test_config_type group"""
+    db_alias = schema_editor.connection.alias
     # Get the Group and Permission models as they exist at the time of this migration
     Group = apps.get_model('auth', 'Group')
     Permission = apps.get_model('auth', 'Permission')
@@ -13,16 +14,16 @@ def assign_permissions_to_group(apps, schema_editor):
 
     # Get the content type for TestConfigType model
     try:
-        test_config_type_content_type = ContentType.objects.get(app_label='test_config_type_app', model='testconfigtype')
+        test_config_type_content_type = ContentType.objects.using(db_alias).get(app_label='test_config_type_app', model='testconfigtype')
     except ContentType.DoesNotExist:
         # If ContentType doesn't exist yet, try to get it by looking for the model
-        test_config_type_content_type = ContentType.objects.get_for_model(TestConfigType)
+        test_config_type_content_type = ContentType.objects.db_manager(db_alias).get_for_model(TestConfigType)
 
     # Get or create the group
-    test_config_group, created = Group.objects.get_or_create(name='mng_test_config_type')
+    test_config_group, created = Group.objects.using(db_alias).get_or_create(name='mng_test_config_type')
 
     # Get all permissions for the TestConfigType model
-    test_config_permissions = Permission.objects.filter(content_type=test_config_type_content_type)
+    test_config_permissions = Permission.objects.using(db_alias).filter(content_type=test_config_type_content_type)
 
     # Add all permissions for the TestConfigType to the group
     for perm in test_config_permissions:
@@ -32,13 +33,13 @@ def assign_permissions_to_group(apps, schema_editor):
     try:
         TestStep = apps.get_model('test_config_type_app', 'TestStep')
         try:
-            test_step_content_type = ContentType.objects.get(app_label='test_config_type_app', model='teststep')
+            test_step_content_type = ContentType.objects.using(db_alias).get(app_label='test_config_type_app', model='teststep')
         except ContentType.DoesNotExist:
             # If ContentType doesn't exist yet, try to get it by looking for the model
-            test_step_content_type = ContentType.objects.get_for_model(TestStep)
+            test_step_content_type = ContentType.objects.db_manager(db_alias).get_for_model(TestStep)
 
         # Get all permissions for the TestStep model
-        test_step_permissions = Permission.objects.filter(content_type=test_step_content_type)
+        test_step_permissions = Permission.objects.using(db_alias).filter(content_type=test_step_content_type)
         
         # Add all permissions for the TestStep to the group
         for perm in test_step_permissions:
@@ -50,8 +51,9 @@ def assign_permissions_to_group(apps, schema_editor):
 
 def remove_permissions_from_group(apps, schema_editor):
     """Remove permissions from the mng_test_config_type group"""
+    db_alias = schema_editor.connection.alias
     Group = apps.get_model('auth', 'Group')
-    test_config_group = Group.objects.filter(name='mng_test_config_type').first()
+    test_config_group = Group.objects.using(db_alias).filter(name='mng_test_config_type').first()
     if test_config_group:
         test_config_group.permissions.clear()
 
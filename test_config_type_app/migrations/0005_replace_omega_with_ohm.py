@@ -5,10 +5,11 @@ from django.db import migrations
 
 def replace_omega_with_ohm(apps, schema_editor):
     """Replace Ω with ohm in the database"""
+    db_alias = schema_editor.connection.alias
     TestStep = apps.get_model('test_config_type_app', 'TestStep')
     
     # Update all resistance measurements to use 'ohm' instead of 'Ω'
-    resistance_steps = TestStep.objects.filter(unit='Ω')
+    resistance_steps = TestStep.objects.using(db_alias).filter(unit='Ω')
     for step in resistance_steps:
         step.unit = 'ohm'
         step.save()
@@ -16,10 +17,11 @@ def replace_omega_with_ohm(apps, schema_editor):
 
 def reverse_replace_omega_with_ohm(apps, schema_editor):
     """Reverse the replacement of ohm with Ω"""
+    db_alias = schema_editor.connection.alias
     TestStep = apps.get_model('test_config_type_app', 'TestStep')
     
     # Update all resistance measurements to use 'Ω' instead of 'ohm'
-    resistance_steps = TestStep.objects.filter(unit='ohm')
+    resistance_steps = TestStep.objects.using(db_alias).filter(unit='ohm')
     for step in resistance_steps:
         step.unit = 'Ω'
         step.save()
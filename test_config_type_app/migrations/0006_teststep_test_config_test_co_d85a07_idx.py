@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('test_config_type_app', '0005_replace_omega_with_ohm'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='teststep',
+            index=models.Index(fields=['test_config', 'order'], name='test_config_test_co_d85a07_idx'),
+        ),
+    ]
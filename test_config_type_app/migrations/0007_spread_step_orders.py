@@ -0,0 +1,51 @@
+from bisect import bisect_left
+
+from django.db import migrations
+
+
+ORDER_GAP = 1024
+
+
+def renumber(apps, using, gap):
+    """Number the steps of every config gap apart, moving result step cursors along"""
+    TestStep = apps.get_model('test_config_type_app', 'TestStep')
+    PcbTestResult = apps.get_model('pcb_test_result_app', 'PcbTestResult')
+
+    config_ids = TestStep.objects.using(using).order_by().values_list('test_config_id', flat=True).distinct()
+    for config_id in config_ids:
+        steps = list(TestStep.objects.using(using).filter(test_config_id=config_id).order_by('order', 'id'))
+        old_orders = [step.order for step in steps]
+        for index, step in enumerate(steps):
+            step.order = (index + 1) * gap
+        TestStep.objects.using(using).bulk_update(steps, ['order'])
+
+        # A cursor points at the first step whose order is not below it
+        end = len(steps) * gap + 1
+        test_results = list(
+            PcbTestResult.objects.using(using).filter(pcb__batch__test_config_type_id=config_id, next_step_order__gt=0)
+            .only('id', 'next_step_order')
+        )
+        for test_result in test_results:
+            position = bisect_left(old_orders, test_result.next_step_order)
+            test_result.next_step_order = steps[position].order if position < len(steps) else end
+        PcbTestResult.objects.using(using).bulk_update(test_results, ['next_step_order'], batch_size=500)
+
+
+def spread_step_orders(apps, schema_editor):
+    renumber(apps, schema_editor.connection.alias, ORDER_GAP)
+
+
+def compact_step_orders(apps, schema_editor):
+    renumber(apps, schema_editor.connection.alias, 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('test_config_type_app', '0006_teststep_test_config_test_co_d85a07_idx'),
+        ('pcb_test_result_app', '0013_pcbtestresult_pcb_test_re_test_da_70e9c8_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(spread_step_orders, compact_step_orders),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('test_config_type_app', '0007_spread_step_orders'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='teststep',
+            name='test_config_test_co_d85a07_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='teststep',
+            constraint=models.UniqueConstraint(fields=('test_config', 'order'), name='unique_step_order_per_config'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('test_config_type_app', '0008_remove_teststep_test_config_test_co_d85a07_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TestConfigVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveIntegerField()),
+                ('limit_table', models.JSONField()),
+                ('published_at', models.DateTimeField(auto_now_add=True)),
+                ('test_config', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='versions', to='test_config_type_app.testconfigtype')),
+            ],
+            options={
+                'verbose_name': 'Test Config Version',
+                'verbose_name_plural': 'Test Config Versions',
+                'ordering': ['test_config', '-number'],
+                'constraints': [models.UniqueConstraint(fields=('test_config', 'number'), name='unique_version_number_per_config')],
+            },
+        ),
+    ]
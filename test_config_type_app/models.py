@@ -27,6 +27,10 @@ class TestStep(models.Model):
         ('INSTRUCTION', 'Instruction/User Action'),
     ]
     
+    # Positions are spaced ORDER_GAP apart so a step can be moved between two
+    # others by rewriting only its own row (see ordering.move_step)
+    ORDER_GAP = 1024
+    
     test_config = models.ForeignKey(TestConfigType, on_delete=models.CASCADE, related_name='steps')
     step_type = models.CharField(max_length=20, choices=STEP_TYPES)
     order = models.PositiveIntegerField()
@@ -67,4 +71,35 @@ class TestStep(models.Model):
     class Meta:
         verbose_name = "Test Step"
         verbose_name_plural = "Test Steps"
-        ordering = ['test_config', 'order']
\ No newline at end of file
+        ordering = ['test_config', 'order']
+        constraints = [
+            models.UniqueConstraint(fields=['test_config', 'order'], name='unique_step_order_per_config'),
+        ]
+
+
+class TestConfigVersion(models.Model):
+    """An immutable snapshot of the steps of a test config, as tests run against it.
+
+    limit_table holds one row per step, in step order, with the values listed
+    in versions.LIMIT_TABLE_FIELDS.
+    """
+    test_config = models.ForeignKey(TestConfigType, on_delete=models.CASCADE, related_name='versions')
+    number = models.PositiveIntegerField()
+    limit_table = models.JSONField()
+    published_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.test_config.name} v{self.number}"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Published test config versions cannot be changed.")
+        super().save(*args, **kwargs)
+
+    class Meta:
+        verbose_name = "Test Config Version"
+        verbose_name_plural = "Test Config Versions"
+        ordering = ['test_config', '-number']
+        constraints = [
+            models.UniqueConstraint(fields=['test_config', 'number'], name='unique_version_number_per_config'),
+        ]
@@ -0,0 +1,81 @@
+from django.db import transaction
+from django.db.models import F, Max
+from django.utils import timezone
+
+from .models import TestStep
+from .signals import steps_renumbered
+
+
+def write_positions(steps, positions):
+    """Give each step its new position with two UPDATE statements.
+
+    All rows are first shifted above every old and new position, so no
+    intermediate state breaks the unique (test_config, order) constraint.
+    """
+    steps = list(steps)
+    if not steps:
+        return
+    offset = max(max(step.order for step in steps), max(positions)) + 1
+    # update() and bulk_update() skip auto_now, so the change is stamped here
+    TestStep.objects.filter(pk__in=[step.pk for step in steps]).update(order=F('order') + offset,
+                                                                       updated_at=timezone.now())
+    for step, position in zip(steps, positions):
+        step.order = position
+    TestStep.objects.bulk_update(steps, ['order'])
+
+
+def renumber_steps(test_config):
+    """Spread the steps of a config ORDER_GAP apart again, keeping their sequence"""
+    with transaction.atomic():
+        steps = list(TestStep.objects.filter(test_config=test_config).order_by('order'))
+        old_orders = [step.order for step in steps]
+        write_positions(steps, [(index + 1) * TestStep.ORDER_GAP for index in range(len(steps))])
+        order_map = {old: step.order for old, step in zip(old_orders, steps)}
+        steps_renumbered.send(sender=test_config.__class__, test_config=test_config, order_map=order_map)
+
+
+def next_position(test_config):
+    """Position after the last step of a config"""
+    last = TestStep.objects.filter(test_config=test_config).aggregate(last=Max('order'))['last']
+    return (last or 0) + TestStep.ORDER_GAP
+
+
+def _position_between(low, high):
+    position = (low + high) // 2
+    return position if low < position < high else None
+
+
+def _target_position(step, direction):
+    """Position that places a step past its neighbour, or (None, has neighbour)"""
+    steps = TestStep.objects.filter(test_config_id=step.test_config_id)
+    if direction == 'up':
+        # The two steps above, nearest first, found with the (test_config, order) index
+        neighbours = list(steps.filter(order__lt=step.order).order_by('-order').values_list('order', flat=True)[:2])
+        if not neighbours:
+            return None, False
+        low = neighbours[1] if len(neighbours) > 1 else -1
+        return _position_between(low, neighbours[0]), True
+    neighbours = list(steps.filter(order__gt=step.order).order_by('order').values_list('order', flat=True)[:2])
+    if not neighbours:
+        return None, False
+    high = neighbours[1] if len(neighbours) > 1 else neighbours[0] + 2 * TestStep.ORDER_GAP
+    return _position_between(neighbours[0], high), True
+
+
+def move_step(step, direction):
+    """Move a step one place up or down, returning False if it is already at that end.
+
+    Only the moved step's row is written. The config is renumbered first in
+    the rare case that there is no free position left between the neighbours.
+    """
+    with transaction.atomic():
+        position, has_neighbour = _target_position(step, direction)
+        if not has_neighbour:
+            return False
+        if position is None:
+            renumber_steps(step.test_config)
+            step.refresh_from_db(fields=['order'])
+            position, has_neighbour = _target_position(step, direction)
+        step.order = position
+        step.save(update_fields=['order', 'updated_at'])
+    return True
@@ -0,0 +1,6 @@
+from django.dispatch import Signal
+
+
+# Sent with test_config and order_map ({old order: new order}) after the
+# steps of a config were renumbered without changing their sequence
+steps_renumbered = Signal()
@@ -0,0 +1,230 @@
+from unittest import mock
+
+from django.contrib.auth.models import Permission, User
+from django.db import DatabaseError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from batch_app.models import Batch, Pcb
+from pcb_test_result_app.models import PcbTestResult, VoltageMeasurementResult
+from pcb_type_app.models import PcbType
+from .config_cache import ConfigCache, cached_version, config_cache
+from .models import TestConfigType, TestStep
+from .ordering import move_step
+from .versions import compiled_version, publish_version
+from .views import create_associated_steps
+
+
+def step_form_data(step_count):
+    """POST data for a config form with alternating voltage and question steps"""
+    data = {}
+    for index in range(step_count):
+        if index % 2:
+            data.update({f'step_type_{index}': 'QUESTION', f'question_text_{index}': f'Question {index}?',
+                         f'question_required_{index}': 'true'})
+        else:
+            data.update({f'step_type_{index}': 'VOLTAGE', f'voltage_param_name_{index}': f'V{index}',
+                         f'voltage_min_{index}': '1.0', f'voltage_max_{index}': '2.0'})
+    return data
+
+
+class TestStepBenchmarkTests(TestCase):
+    """Query counts for writing steps must not grow with the number of steps"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('engineer', password='secret')
+        cls.user.user_permissions.add(Permission.objects.get(codename='change_testconfigtype'))
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def count_create_queries(self, step_count):
+        test_config = TestConfigType.objects.create(name=f'Create {step_count}')
+        with CaptureQueriesContext(connection) as queries:
+            create_associated_steps(test_config, step_form_data(step_count))
+        self.assertEqual(test_config.steps.count(), step_count)
+        return len(queries)
+
+    def count_reorder_queries(self, step_count):
+        test_config = TestConfigType.objects.create(name=f'Reorder {step_count}')
+        create_associated_steps(test_config, step_form_data(step_count))
+        step_ids = list(test_config.steps.order_by('-order').values_list('id', flat=True))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('reorder_test_steps', args=[test_config.pk]),
+                                        {'new_order': ','.join(map(str, step_ids))})
+        self.assertTrue(response.json()['success'])
+        self.assertEqual(list(test_config.steps.order_by('order').values_list('id', flat=True)), step_ids)
+        return len(queries)
+
+    def test_step_creation_query_count_is_constant(self):
+        self.assertEqual(self.count_create_queries(5), self.count_create_queries(60))
+
+    def test_reorder_query_count_is_constant(self):
+        self.assertEqual(self.count_reorder_queries(5), self.count_reorder_queries(150))
+
+
+class ReorderTestStepsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('engineer', password='secret')
+        cls.user.user_permissions.add(Permission.objects.get(codename='change_testconfigtype'))
+        cls.test_config = TestConfigType.objects.create(name='Config')
+        create_associated_steps(cls.test_config, step_form_data(3))
+        cls.other_step = TestStep.objects.create(test_config=TestConfigType.objects.create(name='Other'),
+                                                 step_type='INSTRUCTION', order=1, instruction_text='Plug in')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def reorder(self, step_ids):
+        return self.client.post(reverse('reorder_test_steps', args=[self.test_config.pk]),
+                                {'new_order': ','.join(map(str, step_ids))}).json()
+
+    def test_incomplete_or_foreign_orders_are_rejected(self):
+        first, second, third = self.test_config.steps.order_by('order').values_list('id', flat=True)
+        for step_ids in ([third, second], [third, second, first, first], [third, second, self.other_step.id]):
+            self.assertFalse(self.reorder(step_ids)['success'])
+        self.assertEqual(list(self.test_config.steps.order_by('order').values_list('id', flat=True)),
+                         [first, second, third])
+
+
+class MoveTestStepTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('engineer', password='secret')
+        cls.user.user_permissions.add(Permission.objects.get(codename='change_testconfigtype'))
+
+    def create_config(self, orders):
+        test_config = TestConfigType.objects.create(name=f'Config {orders}')
+        for order in orders:
+            TestStep.objects.create(test_config=test_config, step_type='INSTRUCTION', order=order,
+                                    instruction_text=f'Step {order}')
+        return test_config
+
+    def sequence(self, test_config):
+        return list(test_config.steps.order_by('order').values_list('instruction_text', flat=True))
+
+    def test_move_writes_only_the_moved_step(self):
+        test_config = TestConfigType.objects.create(name='Config')
+        create_associated_steps(test_config, step_form_data(5))
+        steps = list(test_config.steps.order_by('order'))
+        self.client.force_login(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('move_test_step', args=[test_config.pk, steps[3].pk]),
+                                        {'direction': 'up'})
+        self.assertTrue(response.json()['success'])
+        self.assertEqual(len([query for query in queries if query['sql'].startswith('UPDATE "test_config')]), 1)
+        self.assertEqual(list(test_config.steps.order_by('order')), [steps[0], steps[1], steps[3], steps[2], steps[4]])
+
+    def test_failed_publish_rolls_back_the_move(self):
+        test_config = self.create_config([1024, 2048])
+        last = test_config.steps.get(order=2048)
+        self.client.force_login(self.user)
+        with mock.patch('test_config_type_app.views.publish_version', side_effect=DatabaseError('Disk full')):
+            response = self.client.post(reverse('move_test_step', args=[test_config.pk, last.pk]), {'direction': 'up'})
+        self.assertFalse(response.json()['success'])
+        self.assertEqual(self.sequence(test_config), ['Step 1024', 'Step 2048'])
+
+    def test_move_renumbers_when_there_is_no_gap(self):
+        test_config = self.create_config([1, 2, 3])
+        last = test_config.steps.get(order=3)
+        self.assertTrue(move_step(last, 'up'))
+        self.assertEqual(self.sequence(test_config), ['Step 1', 'Step 3', 'Step 2'])
+        self.assertTrue(move_step(test_config.steps.get(instruction_text='Step 1'), 'down'))
+        self.assertEqual(self.sequence(test_config), ['Step 3', 'Step 1', 'Step 2'])
+        self.assertFalse(move_step(test_config.steps.get(instruction_text='Step 2'), 'down'))
+
+
+class UpdateTestConfigTypeTests(TestCase):
+
+    def test_edit_keeps_the_rows_of_unchanged_steps(self):
+        user = User.objects.create_user('engineer', password='secret')
+        user.user_permissions.add(Permission.objects.get(codename='change_testconfigtype'))
+        test_config = TestConfigType.objects.create(name='Config')
+        create_associated_steps(test_config, step_form_data(3))
+        voltage, question, last_voltage = test_config.steps.order_by('order')
+        batch = Batch.objects.create(name='Batch', pcb_type=PcbType.objects.create(name='Controller'),
+                                     test_config_type=test_config, hardware_version='1.0')
+        test_result = PcbTestResult.objects.create(pcb=Pcb.objects.create(serial_number='SN-1', batch=batch),
+                                                   technician=user)
+        VoltageMeasurementResult.objects.create(test_result=test_result, test_step=voltage, parameter_name='V0',
+                                                measured_value=5.0, min_value=1.0, max_value=2.0, passed=False)
+
+        # Drop the question, widen V0 and add an instruction at the end
+        data = {key: value for key, value in step_form_data(3).items() if not key.endswith('_1')}
+        data.update({'name': 'Config', 'voltage_max_0': '6.0', 'step_type_3': 'INSTRUCTION',
+                     'instruction_text_3': 'Unplug'})
+        self.client.force_login(user)
+        self.client.post(reverse('test_config_type_update', args=[test_config.pk]), data)
+
+        steps = list(test_config.steps.order_by('order'))
+        self.assertEqual([step.pk for step in steps[:2]], [voltage.pk, last_voltage.pk])
+        self.assertEqual((steps[0].max_value, steps[2].instruction_text), (6.0, 'Unplug'))
+        self.assertFalse(TestStep.objects.filter(pk=question.pk).exists())
+        test_result.refresh_from_db()
+        self.assertEqual(test_result.first_failed_step_id, voltage.pk)
+
+
+class TestConfigVersionTests(TestCase):
+
+    def test_versions_are_published_only_for_changed_steps(self):
+        test_config = TestConfigType.objects.create(name='Config')
+        create_associated_steps(test_config, step_form_data(2))
+        first = publish_version(test_config)
+        self.assertEqual(publish_version(test_config), first)
+        test_config.steps.filter(step_type='VOLTAGE').update(max_value=3.0)
+        second = publish_version(test_config)
+        self.assertEqual(second.number, 2)
+        self.assertEqual([step.max_value for step in compiled_version(first).steps], [2.0, None])
+        self.assertEqual([step.max_value for step in compiled_version(second).steps], [3.0, None])
+        with self.assertRaises(ValueError):
+            first.save()
+
+
+class ConfigCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.test_config = TestConfigType.objects.create(name='Config')
+        create_associated_steps(cls.test_config, step_form_data(2))
+        publish_version(cls.test_config)
+
+    def setUp(self):
+        config_cache.clear()
+
+    def test_cached_config_is_reloaded_after_a_step_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            version, compiled = cached_version(self.test_config)
+        with self.assertNumQueries(0):
+            self.assertEqual(cached_version(self.test_config), (version, compiled))
+        step = self.test_config.steps.get(step_type='VOLTAGE')
+        step.max_value = 3.0
+        step.save()
+        self.assertNotIn(self.test_config.pk, config_cache.entries)
+        publish_version(self.test_config)
+        version, compiled = cached_version(self.test_config)
+        self.assertEqual(version.number, 2)
+        self.assertEqual(compiled.by_id[step.id].max_value, 3.0)
+
+    @override_settings(
+        CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                'configs': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'configs'}},
+        TEST_CONFIG_CACHE_BACKEND='configs',
+    )
+    def test_shared_stamp_invalidates_other_processes_on_commit(self):
+        this_process, other_process = ConfigCache(), ConfigCache()
+        with self.captureOnCommitCallbacks(execute=True):
+            other_process.get(self.test_config)
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            this_process.invalidate(self.test_config.pk)
+        # Not seen by other processes until the change commits
+        with self.assertNumQueries(0):
+            other_process.get(self.test_config)
+        for callback in callbacks:
+            callback()
+        with self.assertNumQueries(1):
+            other_process.get(self.test_config)
@@ -0,0 +1,91 @@
+from collections import OrderedDict
+
+from django.db import IntegrityError, transaction
+
+from .models import TestConfigVersion, TestStep
+
+
+# Values stored for each step in a version's limit table, in this order
+LIMIT_TABLE_FIELDS = (
+    'id', 'order', 'step_type', 'parameter_name', 'min_value', 'max_value', 'unit',
+    'question_text', 'required_answer', 'instruction_text',
+)
+STEP_TYPE_LABELS = dict(TestStep.STEP_TYPES)
+MAX_COMPILED_VERSIONS = 256  # Compiled limit tables kept per process
+
+
+class CompiledStep:
+    """A step of a published config version, read from its limit table"""
+
+    __slots__ = LIMIT_TABLE_FIELDS
+
+    def __init__(self, values):
+        for field, value in zip(LIMIT_TABLE_FIELDS, values):
+            setattr(self, field, value)
+
+    def get_step_type_display(self):
+        return STEP_TYPE_LABELS.get(self.step_type, self.step_type)
+
+    def __repr__(self):
+        return f'<CompiledStep {self.id}: {self.step_type}>'
+
+
+class CompiledVersion:
+    """The steps of a version in order, and by id"""
+
+    def __init__(self, version):
+        self.version_id = version.pk
+        self.steps = tuple(CompiledStep(values) for values in version.limit_table)
+        self.by_id = {step.id: step for step in self.steps}
+
+
+# Versions never change, so a compiled table stays valid for the life of the
+# process. The key includes published_at because ids can be reused after a
+# rolled back insert.
+_compiled = OrderedDict()
+
+
+def compiled_version(version):
+    """Return the CompiledVersion of a TestConfigVersion, compiling it once per process"""
+    key = (version.pk, version.published_at)
+    compiled = _compiled.get(key)
+    if compiled is None:
+        compiled = _compiled[key] = CompiledVersion(version)
+        if len(_compiled) > MAX_COMPILED_VERSIONS:
+            _compiled.popitem(last=False)
+    else:
+        _compiled.move_to_end(key)
+    return compiled
+
+
+def compile_limit_table(test_config):
+    """Build the limit table of the current steps of a config"""
+    steps = TestStep.objects.filter(test_config=test_config).order_by('order')
+    return [list(values) for values in steps.values_list(*LIMIT_TABLE_FIELDS)]
+
+
+def publish_version(test_config):
+    """Publish the current steps of a config as a new version.
+
+    Returns the latest version unchanged when its steps are already current.
+    """
+    limit_table = compile_limit_table(test_config)
+    latest = test_config.versions.order_by('-number').first()
+    if latest is not None and latest.limit_table == limit_table:
+        return latest
+    try:
+        with transaction.atomic():
+            return TestConfigVersion.objects.create(
+                test_config=test_config,
+                number=latest.number + 1 if latest else 1,
+                limit_table=limit_table,
+            )
+    except IntegrityError:
+        # Published at the same moment by another request
+        return test_config.versions.order_by('-number').first()
+
+
+def current_version(test_config):
+    """Return the latest published version of a config, publishing one if there is none"""
+    latest = test_config.versions.order_by('-number').first()
+    return latest if latest is not None else publish_version(test_config)
@@ -3,8 +3,11 @@ from django.contrib.auth.decorators import login_required, permission_required
 from django.contrib import messages
 from django.core.paginator import Paginator
 from django.http import JsonResponse
+from django.db import transaction
 from django.db.models import Q
 from .models import TestConfigType, TestStep
+from .ordering import move_step, write_positions
+from .versions import publish_version
 
 
 @login_required
@@ -46,10 +49,12 @@ def test_config_type_create(request):
             messages.error(request, 'A Test Config Type with this name already exists.')
             return redirect('test_config_type_list')
         
-        test_config = TestConfigType.objects.create(name=name, description=description)
-        
-        # Create associated steps from form data
-        create_associated_steps(test_config, request.POST)
+        with transaction.atomic():
+            test_config = TestConfigType.objects.create(name=name, description=description)
+            
+            # Create associated steps from form data
+            create_associated_steps(test_config, request.POST)
+            publish_version(test_config)
         
         messages.success(request, f'Test Config Type "{test_config.name}" created successfully.')
         return redirect('test_config_type_list')
@@ -72,16 +77,16 @@ def test_config_type_update(request, pk):
             messages.error(request, 'A Test Config Type with this name already exists.')
             return redirect('test_config_type_list')
         
-        test_config.name = name
-        test_config.description = description
-        test_config.save()
-        
-        # Update associated steps
-        # First, clear all existing related steps
-        test_config.steps.all().delete()
-        
-        # Then create new ones from form data
-        create_associated_steps(test_config, request.POST)
+        with transaction.atomic():
+            test_config.name = name
+            test_config.description = description
+            test_config.save()
+            
+            # Update associated steps in place, so results keep their step links
+            update_associated_steps(test_config, request.POST)
+            
+            # Tests already running keep the version they started with
+            publish_version(test_config)
         
         messages.success(request, f'Test Config Type "{test_config.name}" updated successfully.')
         return redirect('test_config_type_list')
@@ -158,14 +163,21 @@ def reorder_test_steps(request, pk):
             # Parse the new order (comma-separated list of step IDs)
             step_ids = [int(id) for id in new_order.split(',')]
             
-            # Update the order of each step
-            for index, step_id in enumerate(step_ids):
-                try:
-                    step = TestStep.objects.get(id=step_id, test_config=test_config)
-                    step.order = index + 1
-                    step.save()
-                except TestStep.DoesNotExist:
-                    return JsonResponse({'success': False, 'error': f'Step {step_id} not found'})
+            # The new order must list every step of this config exactly once
+            steps = {step.id: step for step in TestStep.objects.filter(test_config=test_config)}
+            if len(step_ids) != len(set(step_ids)):
+                return JsonResponse({'success': False, 'error': 'A step is listed more than once'})
+            unknown = [step_id for step_id in step_ids if step_id not in steps]
+            if unknown:
+                return JsonResponse({'success': False, 'error': f'Step {unknown[0]} not found'})
+            if len(step_ids) != len(steps):
+                return JsonResponse({'success': False, 'error': 'The new order must include every step'})
+            
+            # Write all new positions together, spaced for later single-row moves
+            with transaction.atomic():
+                write_positions([steps[step_id] for step_id in step_ids],
+                                [(index + 1) * TestStep.ORDER_GAP for index in range(len(step_ids))])
+                publish_version(test_config)
             
             return JsonResponse({'success': True, 'message': 'Steps reordered successfully'})
         except Exception as e:
@@ -189,37 +201,13 @@ def move_test_step(request, pk, step_id):
             if direction not in ['up', 'down']:
                 return JsonResponse({'success': False, 'error': 'Invalid direction'})
             
-            # Get all steps for this test config ordered by current order
-            steps = list(TestStep.objects.filter(test_config=test_config).order_by('order'))
-            
-            # Find the current index of the step
-            current_index = None
-            for i, s in enumerate(steps):
-                if s.id == step.id:
-                    current_index = i
-                    break
-            
-            if current_index is None:
-                return JsonResponse({'success': False, 'error': 'Step not found'})
-            
-            # Calculate new index based on direction
-            if direction == 'up' and current_index > 0:
-                # Swap with previous step
-                prev_step = steps[current_index - 1]
-                # Swap orders
-                step.order, prev_step.order = prev_step.order, step.order
-                step.save()
-                prev_step.save()
-            elif direction == 'down' and current_index < len(steps) - 1:
-                # Swap with next step
-                next_step = steps[current_index + 1]
-                # Swap orders
-                step.order, next_step.order = next_step.order, step.order
-                step.save()
-                next_step.save()
-            else:
-                # Already at the top/bottom, nothing to do
-                return JsonResponse({'success': True, 'message': 'Step is already at the boundary'})
+            # Place the step between its new neighbours, writing only its own row,
+            # and publish the new order in the same transaction
+            with transaction.atomic():
+                if not move_step(step, direction):
+                    # Already at the top/bottom, nothing to do
+                    return JsonResponse({'success': True, 'message': 'Step is already at the boundary'})
+                publish_version(test_config)
             
             return JsonResponse({'success': True, 'message': f'Step moved {direction} successfully'})
         except Exception as e:
@@ -230,6 +218,48 @@ def move_test_step(request, pk, step_id):
 
 def create_associated_steps(test_config, post_data):
     """Helper function to create associated steps from POST data"""
+    TestStep.objects.bulk_create(build_steps(test_config, post_data))
+
+
+# Fields a step edit may change; the step type and its name identify the step
+STEP_VALUE_FIELDS = ['min_value', 'max_value', 'unit', 'required_answer']
+
+
+def step_key(step):
+    """What identifies a step across edits of its config: its type and name"""
+    return step.step_type, step.parameter_name or step.question_text or step.instruction_text
+
+
+def update_associated_steps(test_config, post_data):
+    """Bring the steps of a config in line with POST data, keeping the rows of unchanged steps.
+
+    Submitted steps are matched to existing ones by step_key, in order.
+    Matched steps are updated in place, so results and config versions
+    that refer to them keep pointing at the same rows; only steps removed
+    from the form are deleted and only new ones are inserted.
+    """
+    existing = {}
+    for step in test_config.steps.order_by('order'):
+        existing.setdefault(step_key(step), []).append(step)
+    kept, created = [], []
+    for step in build_steps(test_config, post_data):
+        matches = existing.get(step_key(step))
+        if matches:
+            current = matches.pop(0)
+            for field in STEP_VALUE_FIELDS:
+                setattr(current, field, getattr(step, field))
+            kept.append((current, step.order))
+        else:
+            created.append(step)
+    TestStep.objects.filter(pk__in=[step.pk for steps in existing.values() for step in steps]).delete()
+    if kept:
+        write_positions([step for step, order in kept], [order for step, order in kept])
+        TestStep.objects.bulk_update([step for step, order in kept], STEP_VALUE_FIELDS)
+    TestStep.objects.bulk_create(created)
+
+
+def build_steps(test_config, post_data):
+    """Unsaved TestSteps for the steps in POST data, positioned ORDER_GAP apart"""
     # Get all step-related field indices to determine the sequence
     step_indices = set()
     
@@ -242,7 +272,8 @@ def create_associated_steps(test_config, post_data):
     # Sort indices to maintain order
     sorted_indices = sorted(step_indices, key=int)
     
-    # Create steps based on the order they appear
+    # Build steps based on the order they appear, then insert them together
+    steps = []
     for i, idx in enumerate(sorted_indices, start=1):
         step_type = post_data.get(f'step_type_{idx}')
         
@@ -256,15 +287,15 @@ def create_associated_steps(test_config, post_data):
                 try:
                     min_val = float(min_val)
                     max_val = float(max_val)
-                    TestStep.objects.create(
+                    steps.append(TestStep(
                         test_config=test_config,
                         step_type=step_type,
-                        order=i,
+                        order=i * TestStep.ORDER_GAP,
                         parameter_name=param_name,
                         min_value=min_val,
                         max_value=max_val,
                         unit=unit
-                    )
+                    ))
                 except ValueError:
                     # Skip invalid values
                     pass
@@ -279,15 +310,15 @@ def create_associated_steps(test_config, post_data):
                 try:
                     min_val = float(min_val)
                     max_val = float(max_val)
-                    TestStep.objects.create(
+                    steps.append(TestStep(
                         test_config=test_config,
                         step_type=step_type,
-                        order=i,
+                        order=i * TestStep.ORDER_GAP,
                         parameter_name=param_name,
                         min_value=min_val,
                         max_value=max_val,
                         unit=unit
-                    )
+                    ))
                 except ValueError:
                     # Skip invalid values
                     pass
@@ -302,15 +333,15 @@ def create_associated_steps(test_config, post_data):
                 try:
                     min_val = float(min_val)
                     max_val = float(max_val)
-                    TestStep.objects.create(
+                    steps.append(TestStep(
                         test_config=test_config,
                         step_type=step_type,
-                        order=i,
+                        order=i * TestStep.ORDER_GAP,
                         parameter_name=param_name,
                         min_value=min_val,
                         max_value=max_val,
                         unit=unit
-                    )
+                    ))
                 except ValueError:
                     # Skip invalid values
                     pass
@@ -325,15 +356,15 @@ def create_associated_steps(test_config, post_data):
                 try:
                     min_val = float(min_val)
                     max_val = float(max_val)
-                    TestStep.objects.create(
+                    steps.append(TestStep(
                         test_config=test_config,
                         step_type=step_type,
-                        order=i,
+                        order=i * TestStep.ORDER_GAP,
                         parameter_name=param_name,
                         min_value=min_val,
                         max_value=max_val,
                         unit=unit
-                    )
+                    ))
                 except ValueError:
                     # Skip invalid values
                     pass
@@ -344,21 +375,23 @@ def create_associated_steps(test_config, post_data):
             
             if question_text:
                 required_bool = required_answer == 'true' or required_answer == 'True' or required_answer == '1'
-                TestStep.objects.create(
+                steps.append(TestStep(
                     test_config=test_config,
                     step_type=step_type,
-                    order=i,
+                    order=i * TestStep.ORDER_GAP,
                     question_text=question_text,
                     required_answer=required_bool
-                )
+                ))
         
         elif step_type == 'INSTRUCTION':
             instruction_text = post_data.get(f'instruction_text_{idx}')
             
             if instruction_text:
-                TestStep.objects.create(
+                steps.append(TestStep(
                     test_config=test_config,
                     step_type=step_type,
-                    order=i,
+                    order=i * TestStep.ORDER_GAP,
                     instruction_text=instruction_text
-                )
\ No newline at end of file
+                ))
+    
+    return steps